@@ -1,7 +1,10 @@
 import streamlit as st
 import matplotlib.pyplot as plt
 import numpy as np
+from datetime import date, timedelta
 from matplotlib.ticker import FixedLocator
+from config import analytics_dashboard_days
+from Database.Analytics import get_analytics
 
 # st.set_page_config(page_title="Dashboard ", layout="wide")
 
@@ -42,6 +45,24 @@ def main():
             'PROF. SHUBHANKAR': 89
         }
         
+        # Replace the sample data with attendance computed by the analytics engine when duckdb is available
+        # and attendance has been recorded in the selected range
+        date_range = st.date_input("Date range", [date.today() - timedelta(days=analytics_dashboard_days), date.today()])
+        analytics = get_analytics()
+        if analytics is not None and len(date_range) == 2:
+            # One list of percentages per course, one value per semester
+            for course_type, chart_data in (("Postgraduate", post_graduation_data), ("Undergraduate", under_graduation_data)):
+                course_df = analytics.course_attendance(course_type, *date_range)
+                if not course_df.empty:
+                    by_semester = course_df.pivot_table(index='Name', columns='Semester', values='Percentage').fillna(0).round()
+                    # 'Semester 10' after 'Semester 9', not after 'Semester 1'
+                    by_semester = by_semester[sorted(by_semester.columns, key=lambda s: (len(s), s))]
+                    chart_data.clear()
+                    chart_data.update({name: row.tolist() for name, row in by_semester.iterrows()})
+            teacher_df = analytics.teacher_attendance(*date_range)
+            if not teacher_df.empty:
+                teachers_attendance = dict(zip(teacher_df['Teacher'], teacher_df['Percentage'].round()))
+        
         # Function to create a bar chart
         def create_bar_chart(data, title, ylabel, xlabel, size=(10, 6)):
             fig, ax = plt.subplots(figsize=size)
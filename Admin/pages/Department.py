@@ -1,17 +1,16 @@
 import streamlit as st
 import pandas as pd
-import sqlite3
 from io import BytesIO
 import base64
 import xlsxwriter
 import time
-from config import db_path
+from Database.Connection import get_connection
 # st.set_page_config(layout="wide")
 
 
 def main():
     # Connect to the SQLite database
-    conn = sqlite3.connect(db_path)
+    conn = get_connection()
     
     
     
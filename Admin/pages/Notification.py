@@ -3,12 +3,12 @@ import sqlite3
 import pandas as pd
 from datetime import datetime
 import base64
-from config import db_path
+from Database.Connection import get_connection
 
 # st.set_page_config(layout="wide")
 def main ():
     # Initialize connection to SQLite database
-    conn = sqlite3.connect(db_path)
+    conn = get_connection()
     c = conn.cursor()
     
     # Function to fetch departments
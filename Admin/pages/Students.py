@@ -1,21 +1,29 @@
 import streamlit as st
 import pandas as pd
-import sqlite3
 from io import BytesIO
 import base64
 import xlsxwriter
 from datetime import datetime
-from config import db_path
+from config import saved_faces_directory1, profile_list_page_size
+from Database.Connection import get_connection, transaction
+from Media.Store import put_image, release_image, set_profile_image, get_thumbnail
+from Face.Enroll import enroll_directory
+from Face.Gallery import get_gallery
 
 # st.set_page_config(layout="wide")
 def main():
     # Connect to the SQLite database
-    conn = sqlite3.connect(db_path)
+    conn = get_connection()
     
-    # Function to fetch data from the database
+    # Function to fetch data from the database. Photos are not read here, only their ImageID,
+    # the thumbnails are fetched for the rows on screen.
     @st.cache_data
     def fetch_data():
-        query = "SELECT * FROM Students"
+        query = """
+            SELECT StudentID, ImageID, FirstName, MiddleName, LastName, RollNo, RegNo, DepartmentID, CourseId,
+                   AdmissionDate, NameInHindi, Caste, DOB, Gender, FatherName, MotherName, Phone, Email, Session
+            FROM Students
+        """
         df = pd.read_sql(query, conn)
         return df
     
@@ -35,26 +43,27 @@ def main():
     def add_student(details, image):
         try:
             details["StudentID"] = generate_student_id()
-            columns = ", ".join(details.keys()) + ", Image"
-            placeholders = ", ".join("?" * len(details)) + ", ?"
+            details["ImageID"] = put_image(conn, image)
+            columns = ", ".join(details.keys())
+            placeholders = ", ".join("?" * len(details))
             query = f"INSERT INTO Students ({columns}) VALUES ({placeholders})"
-            conn.execute(query, list(details.values()) + [image])
+            conn.execute(query, list(details.values()))
             conn.commit()
             st.success("Student added successfully!")
         except Exception as e:
+            conn.rollback()
             st.error(f"Error adding student: {e}")
     
-    # Function to update a student's details
+    # Function to update a student's details. The details and the image are written in one transaction,
+    # which is rolled back on an error so the pooled connection never keeps the write lock.
     def update_student(student_id, details, image=None):
         set_clause = ", ".join(f"{k} = ?" for k in details.keys())
         try:
-            if image:
-                query = f"UPDATE Students SET {set_clause}, Image = ? WHERE StudentID = ?"
-                conn.execute(query, list(details.values()) + [image, student_id])
-            else:
+            with transaction() as conn:
                 query = f"UPDATE Students SET {set_clause} WHERE StudentID = ?"
                 conn.execute(query, list(details.values()) + [student_id])
-            conn.commit()
+                if image:
+                    set_profile_image("Students", student_id, image)
             st.success("Student details updated successfully!")
         except Exception as e:
             st.error(f"Error updating student: {e}")
@@ -62,9 +71,11 @@ def main():
     # Function to delete a student
     def delete_student(student_id):
         try:
-            query = "DELETE FROM Students WHERE StudentID = ?"
-            conn.execute(query, (student_id,))
-            conn.commit()
+            with transaction() as conn:
+                row = conn.execute("SELECT ImageID FROM Students WHERE StudentID = ?", (student_id,)).fetchone()
+                query = "DELETE FROM Students WHERE StudentID = ?"
+                conn.execute(query, (student_id,))
+                release_image(conn, row[0] if row else None)
             st.warning("Student deleted successfully!")
         except Exception as e:
             st.error(f"Error deleting student: {e}")
@@ -78,16 +89,16 @@ def main():
         output.seek(0)  # Move the cursor to the start of the stream
         return output.getvalue()
     
-    # Function to display Image from binary data and make it clickable
-    def display_image(image_data, student_id):
-        if image_data:
-            encoded_image = base64.b64encode(image_data).decode()
-            href = f"data:image/png;base64,{encoded_image}"
-            return f'<a href="{href}" target="_blank"><img src="{href}" width="50" height="50"/></a>'
+    # Function to display the thumbnail of a student's image from the media store
+    def display_image(image_id, student_id):
+        thumbnail = get_thumbnail(image_id)
+        if thumbnail:
+            encoded_image = base64.b64encode(thumbnail).decode()
+            return f'<img src="data:image/jpeg;base64,{encoded_image}" width="50" height="50"/>'
         return "No Image"
     
     # Tabs for List View and Grid View
-    tab1, tab2 = st.tabs(["List View", "Grid View"])
+    tab1, tab2, tab3 = st.tabs(["List View", "Grid View", "Face Enrollment"])
     
     # List View
     with tab1:
@@ -101,15 +112,15 @@ def main():
         df['AdmissionDate'] = pd.to_datetime(df['AdmissionDate']).dt.date
         df['DOB'] = pd.to_datetime(df['DOB']).dt.date
     
-        # Check if 'Image' column exists
-        if 'Image' in df.columns:
-            df['Image'] = df.apply(lambda row: display_image(row['Image'], row['StudentID']), axis=1)
-        else:
-            st.error("The 'Image' column does not exist in the database. Please check the schema.")
-    
         if search_term:
             df = df[df['FirstName'].str.contains(search_term, case=False, na=False)]
     
+        # One page of students at a time, only the thumbnails of that page are fetched
+        page_count = max(1, (len(df) + profile_list_page_size - 1) // profile_list_page_size)
+        page = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1, key="students_page")
+        df = df.iloc[(page - 1) * profile_list_page_size:page * profile_list_page_size].copy()
+        df['Image'] = df.apply(lambda row: display_image(row['ImageID'], row['StudentID']), axis=1)
+    
         # Select columns to display
         columns_to_display = ['StudentID', 'Image', 'FirstName', 'MiddleName', 'LastName', 'RollNo', 'RegNo', 'DepartmentID', 'CourseId', 'AdmissionDate', 'Gender', 'Phone', 'Email']
         df = df[columns_to_display]
@@ -231,5 +242,24 @@ def main():
         # Grid view to be implemented here, similar logic as the list view
         pass
     
-    conn.close()
+    # Bulk face enrollment: encodes every new photo dropped into SavedFaces using all CPU cores
+    with tab3:
+        st.write(f"Photos are read from `{saved_faces_directory1}` and must be named `<StudentID>.jpg` with exactly one face.")
+        if st.button("Enroll New Photos"):
+            progress_bar = st.progress(0.0, text="Starting workers...")
+    
+            def update_progress(done, total, filename, error):
+                progress_bar.progress(done / total, text=f"{done}/{total} {filename}")
+    
+            try:
+                report = enroll_directory(saved_faces_directory1, progress=update_progress)
+                get_gallery(saved_faces_directory1).refresh()
+                st.success(f"Enrolled {report['enrolled']} photos in {report['seconds']}s. "
+                           f"The gallery now has {report['gallery_size']} faces.")
+                if report["failed"]:
+                    st.warning(f"{len(report['failed'])} photos could not be enrolled.")
+                    st.table(pd.DataFrame(report["failed"], columns=["Photo", "Reason"]))
+            except Exception as e:
+                st.error(f"Error enrolling photos: {e}")
+    
     
\ No newline at end of file
@@ -1,22 +1,28 @@
 import streamlit as st
 import pandas as pd
-import sqlite3
 from io import BytesIO
 import base64
 import xlsxwriter
 from datetime import datetime
-from config import db_path
+from config import profile_list_page_size
+from Database.Connection import get_connection, transaction
+from Media.Store import put_image, release_image, set_profile_image, get_thumbnail
 
 # st.set_page_config(layout="wide")
 def main():
     # Connect to the SQLite database
-    conn = sqlite3.connect(db_path)
+    conn = get_connection()
     
-    # Function to fetch data from the database
+    # Function to fetch data from the database. Photos are not read here, only their ImageID,
+    # the thumbnails are fetched for the rows and cards on screen.
     @st.cache_data
     def fetch_data():
         try:
-            query = "SELECT * FROM Teachers"
+            query = """
+                SELECT TeacherID, ImageID, FirstName, MiddleName, LastName, Qualification, Gender, Phone, Email,
+                       JoiningDate, Status, NameInHindi, Caste, DOB, FatherName, MotherName
+                FROM Teachers
+            """
             df = pd.read_sql(query, conn)
             return df
         except Exception as e:
@@ -43,26 +49,27 @@ def main():
     def add_teacher(details, image):
         try:
             details["TeacherID"] = generate_teacher_id()
-            columns = ", ".join(details.keys()) + ", Image"
-            placeholders = ", ".join("?" * len(details)) + ", ?"
+            details["ImageID"] = put_image(conn, image)
+            columns = ", ".join(details.keys())
+            placeholders = ", ".join("?" * len(details))
             query = f"INSERT INTO Teachers ({columns}) VALUES ({placeholders})"
-            conn.execute(query, list(details.values()) + [image])
+            conn.execute(query, list(details.values()))
             conn.commit()
             st.success("Teacher added successfully!")
         except Exception as e:
+            conn.rollback()
             st.error(f"Error adding teacher: {e}")
     
-    # Function to update a teacher's details
+    # Function to update a teacher's details. The details and the image are written in one transaction,
+    # which is rolled back on an error so the pooled connection never keeps the write lock.
     def update_teacher(teacher_id, details, image=None):
         set_clause = ", ".join(f"{k} = ?" for k in details.keys())
         try:
-            if image:
-                query = f"UPDATE Teachers SET {set_clause}, Image = ? WHERE TeacherID = ?"
-                conn.execute(query, list(details.values()) + [image, teacher_id])
-            else:
+            with transaction() as conn:
                 query = f"UPDATE Teachers SET {set_clause} WHERE TeacherID = ?"
                 conn.execute(query, list(details.values()) + [teacher_id])
-            conn.commit()
+                if image:
+                    set_profile_image("Teachers", teacher_id, image)
             st.success("Teacher details updated successfully!")
         except Exception as e:
             st.error(f"Error updating teacher: {e}")
@@ -70,9 +77,11 @@ def main():
     # Function to delete a teacher
     def delete_teacher(teacher_id):
         try:
-            query = "DELETE FROM Teachers WHERE TeacherID = ?"
-            conn.execute(query, (teacher_id,))
-            conn.commit()
+            with transaction() as conn:
+                row = conn.execute("SELECT ImageID FROM Teachers WHERE TeacherID = ?", (teacher_id,)).fetchone()
+                query = "DELETE FROM Teachers WHERE TeacherID = ?"
+                conn.execute(query, (teacher_id,))
+                release_image(conn, row[0] if row else None)
             st.warning("Teacher deleted successfully!")
         except Exception as e:
             st.error(f"Error deleting teacher: {e}")
@@ -86,12 +95,12 @@ def main():
         output.seek(0)  # Move the cursor to the start of the stream
         return output.getvalue()
     
-    # Function to display Image from binary data and make it clickable
-    def display_image(image_data, teacher_id):
-        if image_data:
-            encoded_image = base64.b64encode(image_data).decode()
-            href = f"data:image/png;base64,{encoded_image}"
-            return f'<a href="{href}" target="_blank"><img src="{href}" width="50" height="50"/></a>'
+    # Function to display the thumbnail of a teacher's image from the media store
+    def display_image(image_id, teacher_id):
+        thumbnail = get_thumbnail(image_id)
+        if thumbnail:
+            encoded_image = base64.b64encode(thumbnail).decode()
+            return f'<img src="data:image/jpeg;base64,{encoded_image}" width="50" height="50"/>'
         return "No Image"
     
     # Tabs for List View and Grid View
@@ -116,14 +125,15 @@ def main():
         except Exception as e:
             st.warning(f"Error parsing 'DOB': {e}")
     
-        # Check if 'Image' column exists
-        if 'Image' in df.columns:
-            df['Image'] = df.apply(lambda row: display_image(row['Image'], row['TeacherID']), axis=1)
-        else:
-            st.error("The 'Image' column does not exist in the database. Please check the schema.")
-    
         if search_term:
             df = df[df['FirstName'].str.contains(search_term, case=False, na=False)]
+        export_df = df.drop(columns='ImageID')
+    
+        # One page of teachers at a time, only the thumbnails of that page are fetched
+        page_count = max(1, (len(df) + profile_list_page_size - 1) // profile_list_page_size)
+        page = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1, key="teachers_page")
+        df = df.iloc[(page - 1) * profile_list_page_size:page * profile_list_page_size].copy()
+        df['Image'] = df.apply(lambda row: display_image(row['ImageID'], row['TeacherID']), axis=1)
     
         # Select columns to display
         columns_to_display = ['TeacherID', 'Image', 'FirstName', 'MiddleName', 'LastName', 'Qualification', 'Gender', 'Phone', 'Email', 'JoiningDate']
@@ -141,7 +151,7 @@ def main():
             st.experimental_rerun()
     
         if col3.button("Export to XLS"):
-            excel_data = export_to_excel(df)
+            excel_data = export_to_excel(export_df)
             st.download_button(label="Download XLS", data=excel_data, file_name='Teachers.xlsx', mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
     
         if st.session_state.get('show_add_form', False):
@@ -248,13 +258,20 @@ def main():
         
         grid_col1, grid_col2 = st.columns(2)
         
+        # Function to get the <img> tag of a teacher's photo, scaled down to size pixels before it is sent
+        def image_tag(image_id, size):
+            thumbnail = get_thumbnail(image_id, size)
+            if not thumbnail:
+                return "<p>No Image</p>"
+            return f'<img src="data:image/jpeg;base64,{base64.b64encode(thumbnail).decode()}" style="width: {size}px; height: {size}px; border-radius: 50%; object-fit: cover;" alt="Teacher Image"/>'
+        
         def display_teacher_card(teacher):
             st.markdown(
                 f"""
                 <div style="border: 1px solid #ddd; border-radius: 10px; padding: 10px; margin-bottom: 10px; text-align: center;">
                     <h3>{teacher['FirstName']} {teacher['LastName']}</h3>
                     <p>ID: {teacher['TeacherID']}</p>
-                    <img src="data:image/png;base64,{base64.b64encode(teacher['Image']).decode()}" style="width: 100px; height: 100px; border-radius: 50%; object-fit: cover;" alt="Teacher Image"/>
+                    {image_tag(teacher['ImageID'], 100)}
                     <p>{teacher['Email']}</p>
                     <p>{teacher['Phone']}</p>
                     <button style="padding: 5px 10px; background-color: #4CAF50; color: white; border: none; border-radius: 5px;" onclick="window.location.href='?teacher_id={teacher['TeacherID']}'">Read More</button>
@@ -269,7 +286,7 @@ def main():
                 <div style="border: 1px solid #ddd; border-radius: 10px; padding: 20px; margin-bottom: 10px;">
                     <h2>{teacher['FirstName']} {teacher['LastName']}</h2>
                     <p><strong>Teacher ID:</strong> {teacher['TeacherID']}</p>
-                    <img src="data:image/png;base64,{base64.b64encode(teacher['Image']).decode()}" style="width: 150px; height: 150px; border-radius: 50%; object-fit: cover;" alt="Teacher Image"/>
+                    {image_tag(teacher['ImageID'], 150)}
                     <p><strong>Email:</strong> {teacher['Email']}</p>
                     <p><strong>Phone:</strong> {teacher['Phone']}</p>
                     <p><strong>Qualification:</strong> {teacher['Qualification']}</p>
@@ -0,0 +1,239 @@
+import sys
+import time
+import argparse
+import threading
+from datetime import date, timedelta
+from config import db_path, analytics_snapshot_seconds, analytics_threads, analytics_retry_seconds, class_late_minutes
+from Database.Archive import archive_files, archive_glob, archive_source
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+# Tables the dashboards read and the columns they need, copied into DuckDB's columnar storage by refresh().
+# Only these columns are copied, so photos and logs never leave university.db.
+TABLES = {
+    "AttendanceDaily": ("Date", "PersonType", "PersonId", "CourseID", "Subject", "Classes", "Present"),
+    "TeacherAttendance": ("TeacherId", "ClassID", "CourseID", "Date", "InTime"),
+    "Routine": ("RoutineID", "CourseID", "Subject", "DayOfWeek", "StartTime", "TeacherName"),
+    "Courses": ("CourseID", "Name", "Type", "Semester"),
+    "Teachers": ("TeacherID", "FirstName", "MiddleName", "LastName"),
+}
+
+# One row per calendar day between two dates with its weekday name, to expand the weekly Routine into the
+# class slots that were scheduled in a date range
+DAYS = """
+    days AS (
+        SELECT CAST(d AS DATE) AS Day, dayname(d) AS DayOfWeek
+        FROM generate_series(CAST(? AS DATE), CAST(? AS DATE), INTERVAL 1 DAY) t(d)
+    )
+"""
+
+
+# Runs the dashboards' group-by queries on DuckDB instead of sqlite3 cursors. university.db is attached
+# read-only through DuckDB's sqlite scanner, so DuckDB never takes SQLite's write lock.
+# With analytics_snapshot_seconds > 0 the tables are copied into DuckDB's in-memory columnar storage and
+# recopied when the copy is older than that, the aggregations then run vectorised over columns and take
+# milliseconds even over millions of rows. With 0 the queries read university.db live through views.
+# The sqlite columns are read as text (sqlite_all_varchar, and columns declared without a type are cast) since
+# SQLite does not enforce column types and one odd value would fail the whole scan, the queries cast what they
+# compute with.
+class AnalyticsEngine:
+    def __init__(self, path=db_path, snapshot_seconds=analytics_snapshot_seconds, threads=analytics_threads):
+        self.path = path
+        self.snapshot_seconds = snapshot_seconds
+        self.refreshed_at = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._conn = duckdb.connect(":memory:")
+        self._conn.execute(f"SET threads = {int(threads)}")
+        self._conn.execute("INSTALL sqlite")
+        self._conn.execute("LOAD sqlite")
+        self._conn.execute("SET sqlite_all_varchar = true")
+        self._conn.execute(f"ATTACH '{path.replace(chr(39), chr(39) * 2)}' AS uni (TYPE SQLITE, READ_ONLY)")
+        self.refresh()
+
+    # Function to point the table names at university.db again: a fresh columnar copy, or live views.
+    # An attendance table with archived months also reads the Parquet archive (Database/Archive.py).
+    def refresh(self):
+        with self._lock:
+            for table, columns in TABLES.items():
+                kind = "TABLE" if self.snapshot_seconds else "VIEW"
+                select = ", ".join(f"CAST({column} AS VARCHAR) AS {column}" for column in columns)
+                source = f"SELECT {select} FROM uni.{table}"
+                if archive_files(table):
+                    source += f" UNION ALL SELECT {select} FROM {archive_source([archive_glob(table)])}"
+                self._conn.execute(f"CREATE OR REPLACE {kind} main.{table} AS {source}")
+            self.refreshed_at = time.monotonic()
+
+    def _cursor(self):
+        if self.snapshot_seconds and time.monotonic() - self.refreshed_at > self.snapshot_seconds:
+            self.refresh()
+        cursor = getattr(self._local, "cursor", None)
+        if cursor is None:
+            cursor = self._local.cursor = self._conn.cursor()
+        return cursor
+
+    # Function to run a query and return a pandas DataFrame, or a pyarrow Table with arrow=True
+    def query(self, sql, params=None, arrow=False):
+        result = self._cursor().execute(sql, params or [])
+        return result.fetch_arrow_table() if arrow else result.df()
+
+    # Function to get the attendance percentage of every course of a type ("Undergraduate" or "Postgraduate")
+    # per semester between two dates. Columns: Name, Semester, Percentage.
+    def course_attendance(self, course_type, start_date, end_date):
+        return self.query("""
+            SELECT c.Name, c.Semester,
+                   100.0 * SUM(TRY_CAST(d.Present AS BIGINT)) / SUM(TRY_CAST(d.Classes AS BIGINT)) AS Percentage
+            FROM AttendanceDaily d
+            JOIN Courses c ON c.CourseID = d.CourseID
+            WHERE d.PersonType = 'Student' AND c.Type = ? AND d.Date BETWEEN ? AND ?
+            GROUP BY c.Name, c.Semester
+            ORDER BY c.Name, c.Semester
+        """, [course_type, str(start_date), str(end_date)])
+
+    # Function to get every teacher's classes taken as a percentage of the classes scheduled for them between
+    # two dates. Routine names teachers by full name, which is matched with extra spaces squeezed out.
+    # Columns: Teacher, Taken, Scheduled, Percentage.
+    def teacher_attendance(self, start_date, end_date):
+        return self.query(f"""
+            WITH {DAYS},
+            teachers AS (
+                SELECT TeacherID,
+                       regexp_replace(trim(concat_ws(' ', FirstName, MiddleName, LastName)), '\\s+', ' ', 'g') AS Teacher
+                FROM Teachers
+            ),
+            scheduled AS (
+                SELECT regexp_replace(trim(r.TeacherName), '\\s+', ' ', 'g') AS Teacher, COUNT(*) AS Scheduled
+                FROM Routine r JOIN days USING (DayOfWeek)
+                GROUP BY 1
+            ),
+            taken AS (
+                SELECT TeacherId, COUNT(*) AS Taken
+                FROM TeacherAttendance
+                WHERE Date BETWEEN ? AND ?
+                GROUP BY TeacherId
+            )
+            SELECT t.Teacher, COALESCE(k.Taken, 0) AS Taken, s.Scheduled,
+                   LEAST(100.0, 100.0 * COALESCE(k.Taken, 0) / s.Scheduled) AS Percentage
+            FROM teachers t
+            JOIN scheduled s ON upper(s.Teacher) = upper(t.Teacher)
+            LEFT JOIN taken k ON k.TeacherId = t.TeacherID
+            ORDER BY t.Teacher
+        """, [str(start_date), str(end_date), str(start_date), str(end_date)])
+
+    # Function to get one teacher's classes per course between two dates: scheduled slots, classes taken and
+    # how many of those started more than class_late_minutes after the routine start time.
+    # Columns: Subject, Class_Taken, Delayed_Class, Total_Class.
+    def teacher_classes(self, teacher_id, teacher_name, start_date, end_date, late_minutes=class_late_minutes):
+        return self.query(f"""
+            WITH {DAYS},
+            scheduled AS (
+                SELECT r.CourseID, COUNT(*) AS Total_Class
+                FROM Routine r JOIN days USING (DayOfWeek)
+                WHERE upper(regexp_replace(trim(r.TeacherName), '\\s+', ' ', 'g')) = upper(regexp_replace(trim(?), '\\s+', ' ', 'g'))
+                GROUP BY r.CourseID
+            ),
+            taken AS (
+                -- ClassID is the RoutineID followed by the date as YYYYMMDD
+                SELECT t.CourseID, COUNT(*) AS Class_Taken,
+                       COUNT(*) FILTER (WHERE TRY_CAST(substr(t.InTime, 12, 8) AS TIME)
+                                        > TRY_CAST(r.StartTime || ':00' AS TIME) + INTERVAL (?) MINUTE) AS Delayed_Class
+                FROM TeacherAttendance t
+                LEFT JOIN Routine r ON r.RoutineID = left(t.ClassID, length(t.ClassID) - 8)
+                WHERE t.TeacherId = ? AND t.Date BETWEEN ? AND ?
+                GROUP BY t.CourseID
+            )
+            SELECT COALESCE(s.CourseID, k.CourseID) AS Subject,
+                   COALESCE(k.Class_Taken, 0) AS Class_Taken,
+                   COALESCE(k.Delayed_Class, 0) AS Delayed_Class,
+                   COALESCE(s.Total_Class, 0) AS Total_Class
+            FROM scheduled s FULL JOIN taken k ON k.CourseID = s.CourseID
+            ORDER BY Subject
+        """, [str(start_date), str(end_date), teacher_name, int(late_minutes), teacher_id, str(start_date), str(end_date)])
+
+    # Function to get every subject's attendance over all students between two dates, with the number of class
+    # slots the routine scheduled for the subject in that range. Columns: Subject, Attendance, Total_Class, Scheduled.
+    def subject_comparison(self, start_date, end_date):
+        return self.query(f"""
+            WITH {DAYS},
+            scheduled AS (
+                SELECT r.Subject, COUNT(*) AS Scheduled
+                FROM Routine r JOIN days USING (DayOfWeek)
+                GROUP BY r.Subject
+            )
+            SELECT d.Subject,
+                   SUM(TRY_CAST(d.Present AS BIGINT)) AS Attendance,
+                   SUM(TRY_CAST(d.Classes AS BIGINT)) AS Total_Class,
+                   COALESCE(MAX(s.Scheduled), 0) AS Scheduled
+            FROM AttendanceDaily d
+            LEFT JOIN scheduled s ON s.Subject = d.Subject
+            WHERE d.PersonType = 'Student' AND d.Date BETWEEN ? AND ?
+            GROUP BY d.Subject
+            ORDER BY d.Subject
+        """, [str(start_date), str(end_date), str(start_date), str(end_date)])
+
+
+_engine = None
+_engine_failed_at = None
+_engine_lock = threading.Lock()
+
+
+def _retry_due():
+    return _engine_failed_at is None or time.monotonic() - _engine_failed_at >= analytics_retry_seconds
+
+
+# Function to get the process-wide analytics engine, None when duckdb is not installed
+# or university.db cannot be attached, callers then fall back to their sqlite3 queries.
+# A failed start is remembered for analytics_retry_seconds, so reruns in between do not try again.
+def get_analytics():
+    global _engine, _engine_failed_at
+    if duckdb is None:
+        return None
+    if _engine is None and _retry_due():
+        with _engine_lock:
+            if _engine is None and _retry_due():
+                try:
+                    _engine = AnalyticsEngine()
+                except duckdb.Error:
+                    _engine_failed_at = time.monotonic()
+    return _engine
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the dashboard queries on the DuckDB analytics engine.")
+    parser.add_argument("--db", default=db_path, help="database file (default: db_path from config.py)")
+    parser.add_argument("--days", type=int, default=180, help="date range the queries cover, ending today")
+    parser.add_argument("--live", action="store_true", help="query university.db live instead of a columnar snapshot")
+    parser.add_argument("--teacher", default=None, help="TeacherID for the teacher query")
+    args = parser.parse_args(argv)
+
+    if duckdb is None:
+        print("duckdb is not installed.")
+        return 1
+    started = time.perf_counter()
+    engine = AnalyticsEngine(args.db, snapshot_seconds=0 if args.live else analytics_snapshot_seconds or 300)
+    print(f"{'attached' if args.live else 'snapshot'} in {time.perf_counter() - started:.3f}s")
+
+    end_date = date.today()
+    start_date = end_date - timedelta(days=args.days)
+    queries = {
+        "course_attendance UG": lambda: engine.course_attendance("Undergraduate", start_date, end_date),
+        "course_attendance PG": lambda: engine.course_attendance("Postgraduate", start_date, end_date),
+        "teacher_attendance": lambda: engine.teacher_attendance(start_date, end_date),
+        "subject_comparison": lambda: engine.subject_comparison(start_date, end_date),
+    }
+    if args.teacher:
+        from Database.Attendance import routine_teacher_name
+        teacher_name = routine_teacher_name(args.teacher, path=args.db)
+        queries["teacher_classes"] = lambda: engine.teacher_classes(args.teacher, teacher_name, start_date, end_date)
+    for name, run in queries.items():
+        started = time.perf_counter()
+        rows = len(run())
+        print(f"{name}: {rows} rows in {time.perf_counter() - started:.3f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
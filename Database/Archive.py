@@ -0,0 +1,253 @@
+import os
+import sys
+import glob
+import uuid
+import shutil
+import argparse
+import threading
+from datetime import date, datetime
+import pandas as pd
+from config import db_path, archive_directory, archive_after_months, archive_compression
+from Database.Connection import get_connection, query
+from Database.Rollup import SOURCES, drop_triggers, create_triggers
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+# Every column of the attendance tables. The rowid is kept as RowID so keyset pages (Database/Attendance.py)
+# go on across archived and hot rows in the same order.
+COLUMNS = {
+    "StudentAttendance": ("AttendanceID", "ClassID", "CourseID", "StudentId", "Date", "InTime", "Out", "SubjectTopic",
+                          "Room", "Duration", "Attendance", "Logs"),
+    "TeacherAttendance": ("AttendanceID", "ClassID", "CourseID", "TeacherId", "Date", "InTime", "Out", "SubjectTopic",
+                          "Room", "Duration", "Attendance", "Logs"),
+}
+
+# Parquet types of the archived columns, every other column is stored as text
+TYPES = {"RowID": "BIGINT", "Duration": "DOUBLE", "Year": "INTEGER", "Month": "INTEGER"}
+
+# One row per archived batch, a batch is one month of one table. Only the months listed here are read
+# from the archive, and a batch is listed in the same transaction that deletes its rows.
+CREATE_TABLE = """
+    CREATE TABLE IF NOT EXISTS AttendanceArchive (
+        Batch TEXT PRIMARY KEY,
+        TableName TEXT NOT NULL,
+        Month TEXT NOT NULL,
+        Rows INTEGER NOT NULL,
+        ArchivedAt TEXT NOT NULL
+    )
+"""
+
+# Batches are written here first and moved into the archive once their rows are deleted
+STAGING = ".staging"
+
+
+def _literal(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _shift_month(month, months):
+    index = int(month[:4]) * 12 + int(month[5:7]) - 1 + months
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+# Function to get the first month that stays in the attendance tables ('YYYY-MM'), everything
+# before it is archived. The current month and the months_kept - 1 before it are kept.
+def cutoff_month(months_kept=archive_after_months, today=None):
+    today = today or date.today()
+    return _shift_month(f"{today.year:04d}-{today.month:02d}", 1 - months_kept)
+
+
+_duck = None
+_duck_lock = threading.Lock()
+
+
+def _cursor():
+    global _duck
+    if duckdb is None:
+        raise RuntimeError("duckdb is needed for the attendance archive, install it with pip install duckdb")
+    if _duck is None:
+        with _duck_lock:
+            if _duck is None:
+                _duck = duckdb.connect(":memory:")
+    return _duck.cursor()
+
+
+# Function to get the glob matching the Parquet files of a table, of one month ('YYYY-MM') or of all months
+def archive_glob(table, month=None, directory=archive_directory):
+    year, number = (f"Year={int(month[:4])}", f"Month={int(month[5:7])}") if month else ("Year=*", "Month=*")
+    return os.path.join(directory, table, year, number, "*", "*.parquet")
+
+
+# Function to list the Parquet files of a table, of the given months or of all of them
+def archive_files(table, months=None, directory=archive_directory):
+    patterns = [archive_glob(table, month, directory) for month in months] if months is not None else [archive_glob(table, directory=directory)]
+    return sorted(path for pattern in patterns for path in glob.glob(pattern))
+
+
+# Function to get the DuckDB table expression that reads the given Parquet files or globs
+def archive_source(paths):
+    return f"read_parquet([{', '.join(_literal(path) for path in paths)}], hive_partitioning = true)"
+
+
+# Function to run a query on the archive with DuckDB, the query names its files with archive_source
+def query_archive(sql, params=()):
+    cursor = _cursor()
+    try:
+        return cursor.execute(sql, list(params)).df()
+    finally:
+        cursor.close()
+
+
+# Function to get the archived months ('YYYY-MM') of a table between two dates
+def archived_months(table, start_date, end_date, path=db_path):
+    rows = query("""
+        SELECT DISTINCT Month FROM AttendanceArchive
+        WHERE TableName = ? AND Month BETWEEN ? AND ?
+        ORDER BY Month
+    """, (table, str(start_date)[:7], str(end_date)[:7]), path=path)
+    return [row[0] for row in rows]
+
+
+def _select(table):
+    columns = ", ".join(f"CAST(a.{column} AS {'REAL' if column == 'Duration' else 'TEXT'}) AS {column}"
+                        for column in COLUMNS[table])
+    return f"""
+        SELECT a.rowid AS RowID, {columns},
+               CAST(substr(a.Date, 1, 4) AS INTEGER) AS Year, CAST(substr(a.Date, 6, 2) AS INTEGER) AS Month,
+               COALESCE((SELECT c.DepartmentID FROM Courses c WHERE c.CourseID = a.CourseID LIMIT 1), 'none') AS DepartmentID
+        FROM {table} a
+        WHERE a.Date >= ? AND a.Date < ?
+    """
+
+
+# Function to write rows as Parquet files partitioned by year, month and department, sorted by person and
+# date so a person's rows sit together and the row group statistics skip the rest
+def _write_parquet(rows, table, batch, target):
+    select = ", ".join(f"CAST({column} AS {TYPES.get(column, 'VARCHAR')}) AS {column}" for column in rows.columns)
+    cursor = _cursor()
+    try:
+        cursor.register("attendance_rows", rows)
+        cursor.execute(f"""
+            COPY (SELECT {select} FROM attendance_rows ORDER BY {SOURCES[table][0]}, Date, RowID)
+            TO {_literal(target)}
+            (FORMAT PARQUET, COMPRESSION {_literal(archive_compression)}, PARTITION_BY (Year, Month, DepartmentID),
+             FILENAME_PATTERN {_literal(batch + '_{i}')})
+        """)
+    finally:
+        cursor.close()
+
+
+# Function to move the files of a committed batch from the staging directory into the archive
+def _publish(batch, directory):
+    staging = os.path.join(directory, STAGING, batch)
+    for root, dirs, files in os.walk(staging):
+        for name in files:
+            target = os.path.join(directory, os.path.relpath(os.path.join(root, name), staging))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(os.path.join(root, name), target)
+    shutil.rmtree(staging, ignore_errors=True)
+
+
+# Function to finish the batches an interrupted run left in the staging directory: a batch whose
+# transaction committed is moved into the archive, one that did not is thrown away
+def _recover(conn, directory):
+    staging = os.path.join(directory, STAGING)
+    if not os.path.isdir(staging):
+        return
+    for batch in os.listdir(staging):
+        if conn.execute("SELECT 1 FROM AttendanceArchive WHERE Batch = ?", (batch,)).fetchone():
+            _publish(batch, directory)
+        else:
+            shutil.rmtree(os.path.join(staging, batch), ignore_errors=True)
+
+
+# Function to move one month ('YYYY-MM') of an attendance table into the archive, returns the number of rows.
+# The rows are read, written to Parquet and deleted in one transaction, with the rollup triggers dropped
+# meanwhile so AttendanceDaily keeps the archived days.
+def archive_month(conn, table, month, directory=archive_directory):
+    batch = uuid.uuid4().hex
+    staging = os.path.join(directory, STAGING, batch)
+    params = (month, _shift_month(month, 1))
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        rows = pd.read_sql_query(_select(table), conn, params=params)
+        if rows.empty:
+            conn.rollback()
+            return 0
+        os.makedirs(staging)
+        _write_parquet(rows, table, batch, os.path.join(staging, table))
+        drop_triggers(conn)
+        deleted = conn.execute(f"DELETE FROM {table} WHERE Date >= ? AND Date < ?", params).rowcount
+        create_triggers(conn)
+        conn.execute("INSERT INTO AttendanceArchive (Batch, TableName, Month, Rows, ArchivedAt) VALUES (?, ?, ?, ?, ?)",
+                     (batch, table, month, deleted, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    _publish(batch, directory)
+    return deleted
+
+
+# Function to get the months before the cutoff month that still have rows in an attendance table, with their row counts.
+# Rows whose Date is not a YYYY-MM-DD date are never archived.
+def pending_months(conn, table, before):
+    return conn.execute(f"""
+        SELECT substr(Date, 1, 7), COUNT(*) FROM {table}
+        WHERE Date < ? AND Date GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-*'
+        GROUP BY 1 ORDER BY 1
+    """, (before,)).fetchall()
+
+
+# Function to archive every month before the cutoff month of both attendance tables, one month per transaction
+# so attendance writers are held up for one month's worth of rows at a time.
+# Returns (table, month, rows) tuples.
+def archive(conn=None, before=None, directory=archive_directory):
+    if duckdb is None:
+        raise RuntimeError("duckdb is needed for the attendance archive, install it with pip install duckdb")
+    conn = conn or get_connection()
+    before = before or cutoff_month()
+    _recover(conn, directory)
+    archived = []
+    for table in COLUMNS:
+        for month, _ in pending_months(conn, table, before):
+            archived.append((table, month, archive_month(conn, table, month, directory)))
+    return archived
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Move closed months of attendance into the Parquet archive.")
+    parser.add_argument("--db", default=db_path, help="database file (default: db_path from config.py)")
+    parser.add_argument("--dir", default=archive_directory, help="archive directory (default: archive_directory from config.py)")
+    parser.add_argument("--keep", type=int, default=archive_after_months,
+                        help="months kept in the database, counting the current one (default: archive_after_months)")
+    parser.add_argument("--dry-run", action="store_true", help="only show the months that would be archived")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM afterwards so the database file shrinks")
+    args = parser.parse_args(argv)
+
+    if args.keep < 1:
+        parser.error("--keep must be at least 1, the current month is never archived")
+    conn = get_connection(args.db)
+    before = cutoff_month(args.keep)
+    if args.dry_run:
+        for table in COLUMNS:
+            for month, count in pending_months(conn, table, before):
+                print(f"{table} {month}: {count} rows")
+        return 0
+
+    total = 0
+    for table, month, rows in archive(conn, before, args.dir):
+        print(f"Archived {table} {month}: {rows} rows")
+        total += rows
+    print(f"Archived {total} rows before {before}.")
+    if args.vacuum and total:
+        conn.execute("VACUUM")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
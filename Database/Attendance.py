@@ -0,0 +1,120 @@
+import pandas as pd
+import streamlit as st
+from config import db_path, attendance_page_size, attendance_max_rows
+from Database.Connection import query_df, query_one
+from Database.Archive import archived_months, archive_files, archive_source, query_archive
+
+# The column holding the person each attendance table is about
+PERSON_COLUMNS = {"StudentAttendance": "StudentId", "TeacherAttendance": "TeacherId"}
+
+# PersonType of each attendance table in the AttendanceDaily rollup
+ROLLUP_PERSON_TYPES = {"StudentAttendance": "Student", "TeacherAttendance": "Teacher"}
+
+# Columns the monthly summary needs
+SUMMARY_COLUMNS = ("Date", "InTime", "Out", "SubjectTopic", "Attendance")
+
+DETAIL_COLUMNS = {
+    "StudentAttendance": ("AttendanceID", "ClassID", "CourseID", "StudentId", "Date", "InTime", "Out", "SubjectTopic",
+                          "Room", "Duration", "Attendance", "Logs"),
+    "TeacherAttendance": ("AttendanceID", "ClassID", "CourseID", "TeacherId", "Date", "InTime", "Out", "SubjectTopic",
+                          "Room", "Duration", "Attendance", "Logs"),
+}
+
+
+def _where(table, person_id, start_date, end_date):
+    return f"{PERSON_COLUMNS[table]} = ? AND Date BETWEEN ? AND ?", [person_id, str(start_date), str(end_date)]
+
+
+# Function to run a query on an attendance table and, when months between the two dates were moved to the
+# Parquet archive, on the archived rows of those months too. {table} and {rowid} in sql are filled in for each,
+# the query selects {rowid} AS _rowid and the rows come back ordered by Date and _rowid.
+def _read(table, sql, params, start_date, end_date, path):
+    df = query_df(sql.format(table=table, rowid="rowid"), params, path=path)
+    files = archive_files(table, archived_months(table, start_date, end_date, path=path))
+    if files:
+        archived = query_archive(sql.format(table=archive_source(files), rowid="RowID"), params)
+        if df.empty:
+            df = archived
+        elif not archived.empty:
+            df = pd.concat([archived, df], ignore_index=True).sort_values(["Date", "_rowid"], kind="stable", ignore_index=True)
+    return df
+
+
+# Function to load one person's attendance between two dates (inclusive) with only the given columns.
+# Uses the (person, Date) index, at most max_rows rows are returned so a wide range cannot exhaust memory.
+# Returns (DataFrame, truncated), truncated is True when the range has more rows than were returned: the rows
+# then stop part way through the range. Archived months are read from the Parquet archive.
+def attendance_range(table, person_id, start_date, end_date, columns=SUMMARY_COLUMNS, max_rows=attendance_max_rows,
+                     path=db_path):
+    where, params = _where(table, person_id, start_date, end_date)
+    sql = f"SELECT {{rowid}} AS _rowid, {', '.join(columns)} FROM {{table}} WHERE {where} ORDER BY Date, _rowid LIMIT ?"
+    df = _read(table, sql, params + [max_rows + 1], start_date, end_date, path)
+    return df.iloc[:max_rows].drop(columns="_rowid"), len(df) > max_rows
+
+
+# Function to load one page of a person's attendance between two dates, ordered by date.
+# Keyset pagination: after is the key returned with the previous page (None for the first page), so every
+# page is an index seek and costs the same however far the user pages. Returns (DataFrame, next key),
+# the next key is None on the last page. Archived months are read from the Parquet archive.
+def attendance_page(table, person_id, start_date, end_date, after=None, columns=None, page_size=attendance_page_size,
+                    path=db_path):
+    columns = columns or DETAIL_COLUMNS[table]
+    where, params = _where(table, person_id, start_date, end_date)
+    if after is not None:
+        where += " AND Date >= ? AND (Date > ? OR {rowid} > ?)"
+        params += [after[0], after[0], after[1]]
+    sql = f"SELECT {{rowid}} AS _rowid, {', '.join(columns)} FROM {{table}} WHERE {where} ORDER BY Date, _rowid LIMIT ?"
+    df = _read(table, sql, params + [page_size + 1], start_date, end_date, path)
+    next_key = None
+    if len(df) > page_size:
+        df = df.iloc[:page_size]
+        last = df.iloc[-1]
+        next_key = (last["Date"], int(last["_rowid"]))
+    return df.drop(columns="_rowid"), next_key
+
+
+# Function to load one person's daily rollup rows between two dates, one row per date, course and subject
+# with Classes, Present, Duration, FirstIn and LastOut. Reads AttendanceDaily instead of the attendance rows.
+def daily_summary(table, person_id, start_date, end_date, path=db_path):
+    return query_df("""
+        SELECT Date, CourseID, Subject, Classes, Present, Duration, FirstIn, LastOut
+        FROM AttendanceDaily
+        WHERE PersonType = ? AND PersonId = ? AND Date BETWEEN ? AND ?
+        ORDER BY Date
+    """, [ROLLUP_PERSON_TYPES[table], person_id, str(start_date), str(end_date)], path=path)
+
+
+# Function to get the full name of a student, the id itself if the student is unknown
+def student_name(student_id, path=db_path):
+    row = query_one("SELECT FirstName, MiddleName, LastName FROM Students WHERE StudentID = ?", (student_id,), path=path)
+    return " ".join(part for part in row if part) if row else str(student_id)
+
+
+# Function to get a teacher's name the way Routine.TeacherName stores it: first, middle and last name joined
+# by single spaces, so an empty middle name leaves two. The id itself if the teacher is unknown.
+def routine_teacher_name(teacher_id, path=db_path):
+    row = query_one("SELECT FirstName, MiddleName, LastName FROM Teachers WHERE TeacherID = ?", (teacher_id,), path=path)
+    return f"{row[0]} {row[1] or ''} {row[2]}" if row else str(teacher_id)
+
+
+# Function to show one person's attendance for a day in pages, with buttons to move between them.
+# The keys of the pages already seen are kept in the session so Previous goes back without an OFFSET scan.
+def show_attendance_pages(table, person_id, day, key):
+    state_key = f"{key}_pages"
+    if st.session_state.get(f"{key}_for") != (person_id, day):
+        st.session_state[f"{key}_for"] = (person_id, day)
+        st.session_state[state_key] = [None]
+    pages = st.session_state[state_key]
+    page_df, next_key = attendance_page(table, person_id, day, day, after=pages[-1])
+    if page_df.empty and len(pages) == 1:
+        st.info("No attendance recorded on this day.")
+        return
+    st.dataframe(page_df.set_index('AttendanceID'), use_container_width=True)
+    col1, col2, col3 = st.columns([1, 1, 4])
+    if len(pages) > 1 and col1.button("Previous", key=f"{key}_previous"):
+        pages.pop()
+        st.experimental_rerun()
+    if next_key is not None and col2.button("Next", key=f"{key}_next"):
+        pages.append(next_key)
+        st.experimental_rerun()
+    col3.caption(f"Page {len(pages)}")
@@ -0,0 +1,115 @@
+import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
+import pandas as pd
+from config import db_path, db_cache_size_kib, db_cached_statements, db_pool_size, db_busy_timeout_ms
+
+# Applied once when a connection is opened, every page then sees the same settings.
+# In WAL mode readers work from a snapshot and never block the writer (or get blocked by it), and with
+# synchronous = NORMAL a commit only appends to the WAL file, the fsync happens at checkpoints.
+# A writer that finds the database locked retries for busy_timeout milliseconds before giving up.
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    f"PRAGMA busy_timeout = {db_busy_timeout_ms}",
+    f"PRAGMA cache_size = -{db_cache_size_kib}",
+    "PRAGMA temp_store = MEMORY",
+)
+
+
+# Keeps a few open SQLite connections per database file. A thread gets one connection the first time it
+# asks and keeps it until the thread ends, then the connection goes back to the pool for the next thread
+# (Streamlit runs every rerun on a fresh thread). A connection is never used by two threads at once,
+# and since it stays open its schema and its prepared statement cache (cached_statements) survive reruns.
+class ConnectionPool:
+    def __init__(self, path=db_path, size=db_pool_size):
+        self.path = path
+        self.size = size
+        self._idle = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.opened = 0
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, cached_statements=db_cached_statements)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        self.opened += 1
+        return conn
+
+    # Function to get the connection of the calling thread
+    def connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            conn = self._open()
+        self._local.conn = conn
+        weakref.finalize(threading.current_thread(), self._release, conn)
+        return conn
+
+    def _release(self, conn):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            return
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(path=db_path):
+    pool = _pools.get(path)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.setdefault(path, ConnectionPool(path))
+    return pool
+
+
+# Function to get this thread's connection. Do not close it, it is reused by later calls and reruns.
+def get_connection(path=db_path):
+    return get_pool(path).connection()
+
+
+# Context manager for a transaction: commits when the block ends and rolls back on an exception.
+# A transaction opened inside another one joins it, so helpers can be combined freely.
+@contextmanager
+def transaction(path=db_path):
+    conn = get_connection(path)
+    if conn.in_transaction:
+        yield conn
+        return
+    with conn:
+        yield conn
+
+
+# Function to run a query and return all rows
+def query(sql, params=(), path=db_path):
+    return get_connection(path).execute(sql, params).fetchall()
+
+
+# Function to run a query and return the first row, None if there is none
+def query_one(sql, params=(), path=db_path):
+    return get_connection(path).execute(sql, params).fetchone()
+
+
+# Function to run a query into a DataFrame
+def query_df(sql, params=None, path=db_path):
+    return pd.read_sql_query(sql, get_connection(path), params=params)
+
+
+# Function to run a write statement in its own transaction, returns the number of changed rows
+def execute(sql, params=(), path=db_path):
+    with transaction(path) as conn:
+        return conn.execute(sql, params).rowcount
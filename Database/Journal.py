@@ -0,0 +1,259 @@
+import os
+import glob
+import json
+import time
+import atexit
+import sqlite3
+import threading
+import traceback
+from concurrent.futures import TimeoutError
+from config import db_path, attendance_journal_path, journal_flush_seconds, journal_batch_size
+from Database.Connection import query_one
+from Database.Migrations import ensure_schema
+from Database.Writer import get_writer, insert_attendance, ATTENDANCE_COLUMNS
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+
+class JournalInUse(RuntimeError):
+    pass
+
+
+# Function to take an exclusive lock on an open file without waiting, False if another process holds it.
+# The operating system releases the lock when the file is closed, also when the process dies.
+def _try_lock(f):
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+# Write-behind buffer for attendance rows. append() only writes the row to an append-only journal file and
+# fsyncs it, so pressing Stop takes the same short time whether the database is busy, locked or being backed
+# up. A background thread moves the journalled rows into StudentAttendance/TeacherAttendance in batches.
+#
+# Every record carries a sequence number. The highest flushed number is stored in JournalCheckpoint in the
+# same transaction as the rows, so after a crash the journal is replayed from the checkpoint on and no row is
+# lost or written twice. Once everything is flushed the journal file is emptied again.
+# A record the database refuses (a constraint error) is moved to <journal>.rejected instead of blocking
+# the records behind it.
+#
+# Sequence numbers and the checkpoint belong to one journal file, so only one process may use a file at a
+# time: open() takes an exclusive lock on <journal>.lock and raises JournalInUse if another process has it.
+class AttendanceJournal:
+    def __init__(self, path=attendance_journal_path, interval=journal_flush_seconds,
+                 batch_size=journal_batch_size, db=db_path):
+        self.path = path
+        self.name = os.path.abspath(path)
+        self.interval = interval
+        self.batch_size = batch_size
+        self.db = db
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._pending = []
+        self._next_seq = 1
+        self._file = None
+        self._lock_file = None
+        self._thread = None
+        self.flushed = 0
+        self.rejected = 0
+        self.last_error = None
+
+    # Function to load the unflushed records left by an earlier run and start the flush thread
+    def open(self):
+        lock_file = open(self.path + ".lock", "a")
+        if not _try_lock(lock_file):
+            lock_file.close()
+            raise JournalInUse(f"{self.path} is used by another process")
+        self._lock_file = lock_file
+        row = query_one("SELECT Seq FROM JournalCheckpoint WHERE Journal = ?", (self.name,), path=self.db)
+        checkpoint = row[0] if row else 0
+        records, end = self._read()
+        with self._lock:
+            self._pending = [record for record in records if record["seq"] > checkpoint]
+            self._next_seq = max([checkpoint] + [record["seq"] for record in records]) + 1
+            self._file = open(self.path, "a", encoding="utf-8")
+            # Cut a torn last line off, records appended after it would be unreadable
+            self._file.truncate(end)
+        self._thread = threading.Thread(target=self._run, name="attendance-journal", daemon=True)
+        self._thread.start()
+        return len(self._pending)
+
+    # Function to read the journal, returns the records and the byte offset where the readable part ends
+    def _read(self):
+        records, end = [], 0
+        try:
+            with open(self.path, "rb") as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        # Only the last line can be torn, by a crash in the middle of a write
+                        break
+                    end += len(line)
+        except FileNotFoundError:
+            pass
+        return records, end
+
+    # Function to journal one attendance data entry, returns its sequence number.
+    # The entry is durable when this returns, it reaches the table within journal_flush_seconds.
+    def append(self, table, data_entry):
+        row = {column: data_entry[column] for column in ATTENDANCE_COLUMNS[table]}
+        with self._lock:
+            record = {"seq": self._next_seq, "table": table, "row": row, "at": time.time()}
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._next_seq += 1
+            self._pending.append(record)
+            if len(self._pending) >= self.batch_size:
+                self._wake.set()
+        return record["seq"]
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def _run(self):
+        while not self._stopping:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                while self.flush() == self.batch_size:
+                    pass
+            except Exception as e:
+                # An unexpected error must not end the flush thread, the records stay journalled for the next
+                # round. The traceback is printed once, not on every round while the error lasts.
+                if repr(e) != repr(self.last_error):
+                    traceback.print_exc()
+                self.last_error = e
+
+    # Function to move the oldest batch of journalled records into the database, returns how many were moved
+    def flush(self):
+        with self._lock:
+            batch = self._pending[:self.batch_size]
+        if not batch:
+            return 0
+        writer = get_writer(self.db)
+        try:
+            writer.write(self._apply, batch, True)
+        except (sqlite3.OperationalError, TimeoutError) as e:
+            # Database busy or unavailable, the records stay journalled and the next round tries again
+            self.last_error = e
+            return 0
+        except Exception:
+            # Some record in the batch is refused, write them one by one to find it
+            for record in batch:
+                try:
+                    writer.write(self._apply, [record], True)
+                except (sqlite3.OperationalError, TimeoutError) as e:
+                    self.last_error = e
+                    return 0
+                except Exception as e:
+                    writer.write(self._apply, [record], False)
+                    self._reject(record, e)
+        self.last_error = None
+        self._done(batch)
+        return len(batch)
+
+    # Runs on the writer thread. Records at or below the stored checkpoint were already written (by a flush
+    # whose wait timed out but which still committed), they are skipped so a retry never duplicates rows.
+    def _apply(self, conn, records, insert):
+        row = conn.execute("SELECT Seq FROM JournalCheckpoint WHERE Journal = ?", (self.name,)).fetchone()
+        checkpoint = row[0] if row else 0
+        if insert:
+            for record in records:
+                if record["seq"] > checkpoint:
+                    insert_attendance(conn, record["table"], record["row"])
+        conn.execute("INSERT OR REPLACE INTO JournalCheckpoint (Journal, Seq) VALUES (?, ?)",
+                     (self.name, max(checkpoint, records[-1]["seq"])))
+
+    def _reject(self, record, error):
+        with open(self.path + ".rejected", "a", encoding="utf-8") as f:
+            f.write(json.dumps(dict(record, error=str(error))) + "\n")
+        self.rejected += 1
+
+    def _done(self, batch):
+        with self._lock:
+            self._pending = self._pending[len(batch):]
+            self.flushed += len(batch)
+            if not self._pending:
+                self._file.truncate(0)
+                self._file.flush()
+                os.fsync(self._file.fileno())
+
+    # Function to stop the flush thread after one last flush
+    def close(self):
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        while self.flush():
+            pass
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+
+
+_journal = None
+_journal_lock = threading.Lock()
+
+
+# Function to get the journal file of a slot. Every process journals to its own slot, the first process
+# uses attendance_journal_path itself and the ones started next to it <path>.1, <path>.2, ...
+def journal_slot(slot, path=attendance_journal_path):
+    return path if slot == 0 else f"{path}.{slot}"
+
+
+# Function to replay the slots no running process holds. A process that crashed on slot 1 or above would
+# otherwise leave its records there until some process takes that slot again.
+def recover_journals(path=attendance_journal_path):
+    for other in glob.glob(glob.escape(path) + ".*"):
+        if not other[len(path) + 1:].isdigit():
+            continue
+        journal = AttendanceJournal(other)
+        try:
+            journal.open()
+        except JournalInUse:
+            continue
+        journal.close()
+
+
+# Function to get the process-wide journal on the first free slot, replaying what an earlier run left unflushed
+def get_journal():
+    global _journal
+    if _journal is None:
+        with _journal_lock:
+            if _journal is None:
+                ensure_schema()
+                slot = 0
+                while True:
+                    journal = AttendanceJournal(journal_slot(slot))
+                    try:
+                        journal.open()
+                        break
+                    except JournalInUse:
+                        slot += 1
+                recover_journals()
+                atexit.register(journal.close)
+                _journal = journal
+    return _journal
+
+
+# Function to record one attendance data entry, returns without waiting for the database
+def save_attendance(table, data_entry):
+    return get_journal().append(table, data_entry)
@@ -0,0 +1,210 @@
+import sys
+import argparse
+import threading
+from config import db_path
+from Database.Connection import get_connection
+from Database.Rollup import create_rollup, recreate_triggers
+from Database.Archive import CREATE_TABLE as CREATE_ARCHIVE_TABLE
+from Media.Store import CREATE_TABLE as CREATE_MEDIA_TABLE, move_profile_images
+
+# The schema version of a database is kept in PRAGMA user_version, 0 for a database no migration has touched.
+# Every migration is (version, description, steps). A step is either one SQL statement or a function that is
+# called with the connection, and all steps of a migration run in one transaction together with the version
+# bump, so a failed migration leaves the database as it was. Append new migrations, never edit applied ones.
+MIGRATIONS = [
+    (1, "Admins and PresenceSamples tables", [
+        """
+        CREATE TABLE IF NOT EXISTS Admins (
+            AdminId INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            email TEXT NOT NULL UNIQUE,
+            password TEXT NOT NULL
+        )
+        """,
+        # One row per presence check, keyed so it needs no separate rowid
+        """
+        CREATE TABLE IF NOT EXISTS PresenceSamples (
+            StudentId TEXT NOT NULL,
+            ClassID TEXT NOT NULL,
+            SampledAt INTEGER NOT NULL,
+            Present INTEGER NOT NULL,
+            Distance REAL,
+            PRIMARY KEY (StudentId, ClassID, SampledAt)
+        ) WITHOUT ROWID
+        """,
+    ]),
+    # The trailing columns make the indexes covering for the dashboard and routine queries, which are then
+    # answered from the index alone without visiting the table rows
+    (2, "Indexes for the attendance, routine and login lookups", [
+        "CREATE INDEX IF NOT EXISTS idx_StudentAttendance_StudentId_Date ON StudentAttendance (StudentId, Date, SubjectTopic, Attendance)",
+        "CREATE INDEX IF NOT EXISTS idx_TeacherAttendance_TeacherId_Date ON TeacherAttendance (TeacherId, Date)",
+        "CREATE INDEX IF NOT EXISTS idx_Routine_DayOfWeek_CourseID ON Routine (DayOfWeek, CourseID, StartTime, EndTime, Subject, Classroom, TeacherName)",
+        "CREATE INDEX IF NOT EXISTS idx_Routine_TeacherName_DayOfWeek ON Routine (TeacherName, DayOfWeek, StartTime, EndTime, Subject, Classroom, CourseID)",
+        "CREATE INDEX IF NOT EXISTS idx_StudentLogin_DepartmentID_approval_status ON StudentLogin (DepartmentID, approval_status)",
+    ]),
+    # Highest attendance journal record written to the database, per journal file (Database/Journal.py)
+    (3, "Attendance journal checkpoints", [
+        """
+        CREATE TABLE IF NOT EXISTS JournalCheckpoint (
+            Journal TEXT PRIMARY KEY,
+            Seq INTEGER NOT NULL
+        )
+        """,
+    ]),
+    # Daily attendance rollup kept up to date by triggers (Database/Rollup.py)
+    (4, "AttendanceDaily rollup", [create_rollup]),
+    # Months of attendance moved to the Parquet archive (Database/Archive.py)
+    (5, "Attendance archive batches", [CREATE_ARCHIVE_TABLE]),
+    # Profile images moved out of Students and Teachers into a content-addressed store (Media/Store.py)
+    (6, "Profile images in MediaBlobs", [CREATE_MEDIA_TABLE, move_profile_images]),
+    # Rollup triggers that leave the archived rows' counts in AttendanceDaily (Database/Rollup.py)
+    (7, "Rollup triggers aware of archived months", [recreate_triggers]),
+]
+
+# Tables the migrations build on. They come with the university database and no migration creates them,
+# so the migrations are refused on a database without them instead of failing at the first index.
+BASE_TABLES = ("StudentAttendance", "TeacherAttendance", "Routine", "StudentLogin")
+
+# The queries the indexes above are for, with the index each one must use. check_query_plans runs
+# EXPLAIN QUERY PLAN on them, parameters are dummies since the plan does not depend on their values.
+HOT_QUERIES = {
+    "student attendance for a day": (
+        "SELECT * FROM StudentAttendance WHERE StudentId = ? AND Date = ?",
+        "idx_StudentAttendance_StudentId_Date"),
+    "student attendance by subject": (
+        """SELECT SubjectTopic, SUM(CASE WHEN Attendance = 'Present' THEN 1 ELSE 0 END), COUNT(*)
+           FROM StudentAttendance WHERE StudentId = ? AND Date BETWEEN ? AND ? GROUP BY SubjectTopic""",
+        "idx_StudentAttendance_StudentId_Date"),
+    "teacher attendance for a day": (
+        "SELECT * FROM TeacherAttendance WHERE TeacherId = ? AND Date = ?",
+        "idx_TeacherAttendance_TeacherId_Date"),
+    "course routine for a day": (
+        """SELECT StartTime, EndTime, Subject, Classroom, TeacherName
+           FROM Routine WHERE DayOfWeek = ? AND CourseID = ?""",
+        "idx_Routine_DayOfWeek_CourseID"),
+    "teacher routine for a day": (
+        """SELECT StartTime, EndTime, Subject, Classroom, TeacherName
+           FROM Routine WHERE TeacherName = ? AND DayOfWeek = ? ORDER BY StartTime""",
+        "idx_Routine_TeacherName_DayOfWeek"),
+    "pending students of a department": (
+        "SELECT * FROM StudentLogin WHERE DepartmentID = ? AND approval_status = 'pending'",
+        "idx_StudentLogin_DepartmentID_approval_status"),
+}
+
+
+# Function to get the schema version of a database
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def latest_version():
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+# Function to list the base tables a database is missing
+def missing_base_tables(conn):
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    return [table for table in BASE_TABLES if table not in existing]
+
+
+# Function to apply every migration above the current version, up to target (default: all of them).
+# Runs ANALYZE afterwards so the query planner has statistics for the new indexes.
+# Returns the list of (version, description) that were applied.
+def migrate(conn=None, target=None, analyze=True):
+    conn = conn or get_connection()
+    target = latest_version() if target is None else target
+    if schema_version(conn) < target:
+        missing = missing_base_tables(conn)
+        if missing:
+            raise RuntimeError(f"Tables {', '.join(missing)} not found: migrations update an existing university "
+                               "database, they do not create one")
+    applied = []
+    for version, description, steps in MIGRATIONS:
+        if version > target:
+            break
+        # BEGIN IMMEDIATE so a second process starting up waits here, then sees the new version and skips
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if version <= schema_version(conn):
+                conn.rollback()
+                continue
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append((version, description))
+    if applied and analyze:
+        conn.execute("ANALYZE")
+        conn.commit()
+    return applied
+
+
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+
+# Function to bring the database up to date once per process, for main.py to call on every rerun
+def ensure_schema():
+    global _schema_ready
+    if _schema_ready:
+        return
+    with _schema_lock:
+        if not _schema_ready:
+            migrate()
+            _schema_ready = True
+
+
+# Function to run EXPLAIN QUERY PLAN on each hot query.
+# Returns (name, expected index, plan, ok) tuples, ok is True when the plan searches with the expected index.
+def check_query_plans(conn=None):
+    conn = conn or get_connection()
+    results = []
+    for name, (sql, index) in HOT_QUERIES.items():
+        params = (None,) * sql.count("?")
+        plan = [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+        ok = any(f"INDEX {index} " in f"{step} " and "SEARCH" in step for step in plan)
+        results.append((name, index, plan, ok))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply schema migrations to the attendance database.")
+    parser.add_argument("--db", default=db_path, help="database file (default: db_path from config.py)")
+    parser.add_argument("--target", type=int, default=None, help="migrate up to this version (default: latest)")
+    parser.add_argument("--status", action="store_true", help="only show the schema version and pending migrations")
+    parser.add_argument("--check", action="store_true", help="verify that every hot query uses its index")
+    args = parser.parse_args(argv)
+
+    conn = get_connection(args.db)
+    version = schema_version(conn)
+    print(f"Schema version {version}, latest {latest_version()}.")
+    if args.status:
+        for number, description, steps in MIGRATIONS:
+            if number > version:
+                print(f"  pending {number}: {description}")
+        return 0
+
+    for number, description in migrate(conn, args.target):
+        print(f"Applied {number}: {description}")
+
+    if args.check:
+        failed = 0
+        for name, index, plan, ok in check_query_plans(conn):
+            print(f"{'ok  ' if ok else 'FAIL'} {name}: {' / '.join(plan)}")
+            if not ok:
+                failed += 1
+                print(f"     expected a search using {index}")
+        if failed:
+            print(f"{failed} queries do not use their index.")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
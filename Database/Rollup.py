@@ -0,0 +1,213 @@
+import sys
+import argparse
+from config import db_path
+from Database.Connection import get_connection
+
+# Attendance tables rolled up into AttendanceDaily, with the column naming the person and the PersonType stored
+SOURCES = {
+    "StudentAttendance": ("StudentId", "Student"),
+    "TeacherAttendance": ("TeacherId", "Teacher"),
+}
+
+# One row per date, person, course and subject with the number of attendance rows, how many of them are
+# Present, the total of their Duration and the first InTime and last Out of the day.
+# Key columns are never NULL (a WITHOUT ROWID key cannot be), a missing course or subject is stored as ''.
+CREATE_TABLE = """
+    CREATE TABLE IF NOT EXISTS AttendanceDaily (
+        Date TEXT NOT NULL,
+        PersonType TEXT NOT NULL,
+        PersonId TEXT NOT NULL,
+        CourseID TEXT NOT NULL,
+        Subject TEXT NOT NULL,
+        Classes INTEGER NOT NULL,
+        Present INTEGER NOT NULL,
+        Duration REAL NOT NULL,
+        FirstIn TEXT,
+        LastOut TEXT,
+        PRIMARY KEY (Date, PersonType, PersonId, CourseID, Subject)
+    ) WITHOUT ROWID
+"""
+
+CREATE_INDEX = "CREATE INDEX IF NOT EXISTS idx_AttendanceDaily_Person ON AttendanceDaily (PersonType, PersonId, Date)"
+
+
+def _key(row, person_column):
+    return (f"COALESCE({row}.Date, '')", f"COALESCE({row}.{person_column}, '')",
+            f"COALESCE({row}.CourseID, '')", f"COALESCE({row}.SubjectTopic, '')")
+
+
+# SQL condition that is true when the month of a row was moved to the Parquet archive (Database/Archive.py)
+def _archived(table, row):
+    return f"EXISTS (SELECT 1 FROM AttendanceArchive WHERE TableName = '{table}' AND Month = substr({row}.Date, 1, 7))"
+
+
+# SQL that adds one row to the rollup row of its group, when condition holds
+def _add(person_column, person_type, row, condition="1 = 1"):
+    date, person, course, subject = _key(row, person_column)
+    return f"""
+        INSERT INTO AttendanceDaily (Date, PersonType, PersonId, CourseID, Subject, Classes, Present, Duration, FirstIn, LastOut)
+        SELECT {date}, '{person_type}', {person}, {course}, {subject}, 1,
+               COALESCE({row}.Attendance = 'Present', 0), COALESCE({row}.Duration, 0), {row}.InTime, {row}.Out
+        WHERE {condition}
+        ON CONFLICT (Date, PersonType, PersonId, CourseID, Subject) DO UPDATE SET
+            Classes = Classes + 1,
+            Present = Present + excluded.Present,
+            Duration = Duration + excluded.Duration,
+            FirstIn = CASE WHEN FirstIn IS NULL OR excluded.FirstIn < FirstIn THEN excluded.FirstIn ELSE FirstIn END,
+            LastOut = CASE WHEN LastOut IS NULL OR excluded.LastOut > LastOut THEN excluded.LastOut ELSE LastOut END;"""
+
+
+# SQL that takes one row back out of the rollup row of its group, when condition holds. Used for archived
+# months, whose other rows are no longer in the table to recompute from: the counts are exact, FirstIn
+# and LastOut are left as they are.
+def _subtract(person_column, person_type, row, condition):
+    date, person, course, subject = _key(row, person_column)
+    group = f"Date = {date} AND PersonType = '{person_type}' AND PersonId = {person} AND CourseID = {course} AND Subject = {subject}"
+    return f"""
+        UPDATE AttendanceDaily
+        SET Classes = Classes - 1,
+            Present = Present - COALESCE({row}.Attendance = 'Present', 0),
+            Duration = Duration - COALESCE({row}.Duration, 0)
+        WHERE {group} AND {condition};
+        DELETE FROM AttendanceDaily WHERE {group} AND Classes <= 0 AND {condition};"""
+
+
+# SQL that recomputes the rollup row of one group from the attendance rows, used when a row is
+# changed or deleted since a minimum or maximum cannot be taken back incrementally. Only done when
+# condition holds.
+def _recompute(table, person_column, person_type, row, condition="1 = 1"):
+    date, person, course, subject = _key(row, person_column)
+    return f"""
+        DELETE FROM AttendanceDaily
+        WHERE Date = {date} AND PersonType = '{person_type}' AND PersonId = {person} AND CourseID = {course} AND Subject = {subject}
+          AND {condition};
+        INSERT INTO AttendanceDaily (Date, PersonType, PersonId, CourseID, Subject, Classes, Present, Duration, FirstIn, LastOut)
+        SELECT {date}, '{person_type}', {person}, {course}, {subject}, COUNT(*),
+               COALESCE(SUM(a.Attendance = 'Present'), 0), COALESCE(SUM(a.Duration), 0), MIN(a.InTime), MAX(a.Out)
+        FROM {table} a
+        WHERE a.{person_column} = {row}.{person_column} AND a.Date = {row}.Date
+          AND COALESCE(a.CourseID, '') = {course} AND COALESCE(a.SubjectTopic, '') = {subject}
+          AND {condition}
+        GROUP BY a.{person_column};"""
+
+
+# Function to get the CREATE TRIGGER statements that keep AttendanceDaily in step with one attendance table.
+# An insert adds to its group in place, an update or delete recomputes the groups it touched. With archive
+# (the AttendanceArchive table exists), a group in an archived month is changed by the row's own values
+# instead, recomputing it from the table alone would lose the archived rows.
+def trigger_statements(table, archive=False):
+    person_column, person_type = SOURCES[table]
+    old_changes = _recompute(table, person_column, person_type, "OLD")
+    new_changes = _recompute(table, person_column, person_type, "NEW")
+    if archive:
+        old_archived, new_archived = _archived(table, "OLD"), _archived(table, "NEW")
+        old_changes = (_recompute(table, person_column, person_type, "OLD", f"NOT {old_archived}")
+                       + _subtract(person_column, person_type, "OLD", old_archived))
+        new_changes = (_recompute(table, person_column, person_type, "NEW", f"NOT {new_archived}")
+                       + _add(person_column, person_type, "NEW", new_archived))
+    return [
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_rollup_insert AFTER INSERT ON {table}
+        BEGIN{_add(person_column, person_type, "NEW")}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_rollup_update AFTER UPDATE ON {table}
+        BEGIN{old_changes}{new_changes}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_rollup_delete AFTER DELETE ON {table}
+        BEGIN{old_changes}
+        END
+        """,
+    ]
+
+
+def _has_archive(conn):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'AttendanceArchive'").fetchone() is not None
+
+
+def create_triggers(conn):
+    archive = _has_archive(conn)
+    for table in SOURCES:
+        for statement in trigger_statements(table, archive):
+            conn.execute(statement)
+
+
+
+# Function to drop the rollup triggers, for bulk changes that maintain AttendanceDaily themselves.
+# Call inside a transaction together with create_triggers so no other writer sees them missing.
+def drop_triggers(conn):
+    for table in SOURCES:
+        for event in ("insert", "update", "delete"):
+            conn.execute(f"DROP TRIGGER IF EXISTS trg_{table}_rollup_{event}")
+
+
+# Migration step: replace the rollup triggers with the current ones
+def recreate_triggers(conn):
+    drop_triggers(conn)
+    create_triggers(conn)
+
+
+# Function to recompute AttendanceDaily from the attendance tables, for all dates or those between
+# start_date and end_date (inclusive). Returns the number of rollup rows written.
+# Months moved to the Parquet archive (Database/Archive.py) are no longer in the attendance tables,
+# their rollup rows are left as they are.
+def rebuild(conn, start_date=None, end_date=None):
+    where, params = "", []
+    if start_date is not None:
+        where += " AND Date >= ?"
+        params.append(str(start_date))
+    if end_date is not None:
+        where += " AND Date <= ?"
+        params.append(str(end_date))
+    archive = _has_archive(conn)
+    written = 0
+    for table, (person_column, person_type) in SOURCES.items():
+        keep = ""
+        if archive:
+            keep = f" AND substr(Date, 1, 7) NOT IN (SELECT Month FROM AttendanceArchive WHERE TableName = '{table}')"
+        conn.execute(f"DELETE FROM AttendanceDaily WHERE PersonType = '{person_type}'{where}{keep}", params)
+        written += conn.execute(f"""
+            INSERT INTO AttendanceDaily (Date, PersonType, PersonId, CourseID, Subject, Classes, Present, Duration, FirstIn, LastOut)
+            SELECT COALESCE(Date, ''), '{person_type}', COALESCE({person_column}, ''), COALESCE(CourseID, ''),
+                   COALESCE(SubjectTopic, ''), COUNT(*), COALESCE(SUM(Attendance = 'Present'), 0),
+                   COALESCE(SUM(Duration), 0),
+                   MIN(InTime), MAX(Out)
+            FROM {table}
+            WHERE 1 = 1{where}{keep}
+            GROUP BY 1, 3, 4, 5
+        """, params).rowcount
+    return written
+
+
+# Migration step: create the rollup table and its triggers and fill it from the existing attendance
+def create_rollup(conn):
+    conn.execute(CREATE_TABLE)
+    conn.execute(CREATE_INDEX)
+    create_triggers(conn)
+    rebuild(conn)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild the AttendanceDaily rollup from the attendance tables.")
+    parser.add_argument("--db", default=db_path, help="database file (default: db_path from config.py)")
+    parser.add_argument("--from", dest="start_date", default=None, help="first date to rebuild, YYYY-MM-DD (default: all)")
+    parser.add_argument("--to", dest="end_date", default=None, help="last date to rebuild, YYYY-MM-DD (default: all)")
+    args = parser.parse_args(argv)
+
+    conn = get_connection(args.db)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        written = rebuild(conn, args.start_date, args.end_date)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    print(f"Wrote {written} rollup rows.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
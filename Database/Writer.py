@@ -0,0 +1,167 @@
+import time
+import queue
+import atexit
+import sqlite3
+import threading
+from concurrent.futures import Future
+from config import db_path, db_group_commit_size, db_group_commit_wait_ms, db_write_timeout, db_write_retries
+from Database.Connection import get_connection
+
+
+class _Write:
+    def __init__(self, fn, args):
+        self.fn = fn
+        self.args = args
+        self.future = Future()
+
+
+# Funnels every attendance write through one thread with one connection, so the pages never fight each
+# other for SQLite's write lock. Whatever is queued while a commit is running goes into the next commit
+# together (group commit): when a whole class presses Stop at once the sixty inserts cost a handful of
+# fsyncs instead of sixty. Each write runs inside its own savepoint, a failing write only rolls back itself
+# and its future gets the exception, the rest of the batch still commits.
+class GroupCommitWriter:
+    def __init__(self, path=db_path, batch_size=db_group_commit_size, wait_ms=db_group_commit_wait_ms,
+                 retries=db_write_retries):
+        self.path = path
+        self.batch_size = batch_size
+        self.wait = wait_ms / 1000
+        self.retries = retries
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._counters = {"writes": 0, "failed": 0, "batches": 0, "largest_batch": 0, "retries": 0}
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                self._thread.start()
+
+    # Function to queue fn(conn, *args), returns a Future with fn's return value
+    def submit(self, fn, *args):
+        write = _Write(fn, args)
+        self._start()
+        self._queue.put(write)
+        return write.future
+
+    # Function to queue fn(conn, *args) and wait until it is committed
+    def write(self, fn, *args, timeout=db_write_timeout):
+        return self.submit(fn, *args).result(timeout=timeout)
+
+    # Function to commit everything already queued and stop the writer thread
+    def close(self):
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        stats["queued"] = self._queue.qsize()
+        stats["average_batch"] = round(stats["writes"] / stats["batches"], 2) if stats["batches"] else 0.0
+        return stats
+
+    def _run(self):
+        conn = get_connection(self.path)
+        # The pool's synchronous = NORMAL makes a commit durable only at the next checkpoint. Attendance
+        # writes are fsynced at commit instead: the attendance journal empties itself once its rows are
+        # committed, so after a power loss they must be in the database. Group commit keeps the fsyncs few.
+        conn.execute("PRAGMA synchronous = FULL")
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.wait
+            while batch[-1] is not None and len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            stop = batch[-1] is None
+            batch = [write for write in batch if write is not None]
+            if batch:
+                self._commit(conn, batch)
+            if stop:
+                return
+
+    def _commit(self, conn, batch):
+        for attempt in range(self.retries + 1):
+            try:
+                # BEGIN IMMEDIATE takes the write lock up front, waiting up to the busy timeout for it
+                conn.execute("BEGIN IMMEDIATE")
+                results = [self._apply(conn, write) for write in batch]
+                conn.commit()
+                break
+            except Exception as e:
+                if conn.in_transaction:
+                    conn.rollback()
+                # Only a lock that outlasted the busy timeout is worth another try
+                if attempt == self.retries or not isinstance(e, sqlite3.OperationalError):
+                    for write in batch:
+                        write.future.set_exception(e)
+                    with self._lock:
+                        self._counters["failed"] += len(batch)
+                    return
+                with self._lock:
+                    self._counters["retries"] += 1
+                time.sleep(0.05 * 2 ** attempt)
+
+        with self._lock:
+            self._counters["batches"] += 1
+            self._counters["largest_batch"] = max(self._counters["largest_batch"], len(batch))
+        for write, (result, error) in zip(batch, results):
+            with self._lock:
+                self._counters["failed" if error else "writes"] += 1
+            if error:
+                write.future.set_exception(error)
+            else:
+                write.future.set_result(result)
+
+    @staticmethod
+    def _apply(conn, write):
+        conn.execute("SAVEPOINT write")
+        try:
+            result = write.fn(conn, *write.args)
+        except Exception as e:
+            conn.execute("ROLLBACK TO write")
+            conn.execute("RELEASE write")
+            return None, e
+        conn.execute("RELEASE write")
+        return result, None
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(path=db_path):
+    writer = _writers.get(path)
+    if writer is None:
+        with _writers_lock:
+            writer = _writers.get(path)
+            if writer is None:
+                writer = _writers[path] = GroupCommitWriter(path)
+                atexit.register(writer.close)
+    return writer
+
+
+# Columns written for each attendance table, other keys of a data entry (image paths, percentages) are not stored
+ATTENDANCE_COLUMNS = {
+    "StudentAttendance": ("ClassID", "CourseID", "StudentId", "Date", "Out", "SubjectTopic", "Room", "Duration",
+                          "Attendance", "Logs", "InTime"),
+    "TeacherAttendance": ("AttendanceID", "ClassID", "CourseID", "TeacherId", "Date", "Out", "SubjectTopic", "Room",
+                          "Duration", "Attendance", "Logs", "InTime"),
+}
+
+
+# Function to insert one attendance data entry, returns the new rowid
+def insert_attendance(conn, table, data_entry):
+    columns = ATTENDANCE_COLUMNS[table]
+    return conn.execute(
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+        tuple(data_entry[column] for column in columns)
+    ).lastrowid
+
+
+# Function to save one attendance data entry through the writer, waits until it is committed
+def save_attendance(table, data_entry, path=db_path):
+    return get_writer(path).write(insert_attendance, table, data_entry)
@@ -0,0 +1,251 @@
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+from datetime import datetime
+import numpy as np
+import cv2
+from config import face_index_path, face_embedding_precision
+from Face.FaceIndex import load_face_index, IMAGE_EXTENSIONS, DESCRIPTOR_SIZE
+from Face.Models import get_face_models
+from Face.Detection import detector_for_camera
+from Face.Matcher import FaceMatcher
+from Face.Recognition import describe_shapes
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Bump this whenever the layout of the results file changes
+RESULTS_VERSION = 1
+STAGES = ("detect", "landmarks", "descriptor", "match", "total")
+PERCENTILES = (50, 95, 99)
+
+
+# Function to read the peak resident memory of this process in bytes, None if it cannot be measured
+def peak_rss():
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    if psutil is not None:
+        memory = psutil.Process().memory_info()
+        return getattr(memory, "peak_wset", memory.rss)
+    return None
+
+
+# Function to load the sample images once as RGB arrays
+def load_samples(directory, limit=None):
+    samples = []
+    for filename in sorted(os.listdir(directory)):
+        if not filename.lower().endswith(IMAGE_EXTENSIONS + (".jpeg",)):
+            continue
+        img = cv2.imread(os.path.join(directory, filename))
+        if img is None:
+            print(f"Skipping unreadable image {filename}", file=sys.stderr)
+            continue
+        samples.append((filename, cv2.cvtColor(img, cv2.COLOR_BGR2RGB)))
+        if limit and len(samples) >= limit:
+            break
+    return samples
+
+
+# Function to resize an image to a given width, keeping the aspect ratio
+def resize_to_width(img, width):
+    if width is None or img.shape[1] == width:
+        return img
+    height = int(round(img.shape[0] * width / img.shape[1]))
+    interpolation = cv2.INTER_AREA if width < img.shape[1] else cv2.INTER_LINEAR
+    return cv2.resize(img, (width, height), interpolation=interpolation)
+
+
+# Function to build a gallery of the requested size. The enrolled faces are used first, the rest is
+# filled with random descriptors spread like real ones so the matching cost is realistic.
+def build_gallery(size, enrolled=None, seed=0, precision=face_embedding_precision):
+    encodings = np.zeros((0, DESCRIPTOR_SIZE), dtype=np.float32)
+    names = []
+    if enrolled is not None:
+        encodings, names = enrolled["encodings"][:size], list(enrolled["names"][:size])
+    missing = size - len(names)
+    if missing > 0:
+        rng = np.random.default_rng(seed)
+        synthetic = rng.normal(0.0, 0.09, size=(missing, DESCRIPTOR_SIZE)).astype(np.float32)
+        encodings = np.vstack([encodings, synthetic])
+        names += [f"SYNTH{i:06d}" for i in range(missing)]
+    return FaceMatcher(encodings, names, precision=precision)
+
+
+# Function to run detection, landmarks and descriptors over every sample at one width.
+# Returns the per-image stage timings in milliseconds and the descriptors for the match stage.
+def time_pipeline(samples, width, face_detector, sp, facerec, repeat):
+    timings = {stage: [] for stage in ("detect", "landmarks", "descriptor")}
+    descriptors = []
+    faces = 0
+    for _, img in samples:
+        img = resize_to_width(img, width)
+        for r in range(repeat):
+            start = time.perf_counter()
+            dets, _ = face_detector.detect(img)
+            detected = time.perf_counter()
+            shapes = [sp(img, d) for d in dets]
+            landmarked = time.perf_counter()
+            encodings = describe_shapes(img, shapes, facerec)
+            described = time.perf_counter()
+            timings["detect"].append((detected - start) * 1000)
+            timings["landmarks"].append((landmarked - detected) * 1000)
+            timings["descriptor"].append((described - landmarked) * 1000)
+            if r == 0:
+                faces += len(dets)
+                descriptors.append(encodings)
+    return timings, descriptors, faces
+
+
+# Function to time matching the descriptors of every image against a gallery
+def time_matching(descriptors, matcher, repeat):
+    timings = []
+    for encodings in descriptors:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            matcher.identify(encodings)
+            timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def summarise(values):
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        return None
+    summary = {f"p{p}": round(float(np.percentile(values, p)), 3) for p in PERCENTILES}
+    summary["mean"] = round(float(values.mean()), 3)
+    return summary
+
+
+# Function to run the whole benchmark and return the machine readable results
+def run_benchmark(directory, widths, gallery_sizes, repeat=3, limit=None, index_path=face_index_path,
+                  precision=face_embedding_precision):
+    samples = load_samples(directory, limit)
+    if not samples:
+        raise ValueError(f"No sample images found in {directory}")
+    detector, sp, facerec = get_face_models()
+    face_detector = detector_for_camera(0)
+    enrolled = load_face_index(index_path) if index_path else None
+
+    # One untimed pass so lazy model loading and first-call allocations are not measured
+    time_pipeline(samples[:1], widths[0], face_detector, sp, facerec, 1)
+
+    runs = []
+    for width in widths:
+        timings, descriptors, faces = time_pipeline(samples, width, face_detector, sp, facerec, repeat)
+        for gallery_size in gallery_sizes:
+            matcher = build_gallery(gallery_size, enrolled, precision=precision)
+            matcher.identify(np.zeros((1, DESCRIPTOR_SIZE), dtype=np.float32))
+            # Every descriptor list was matched repeat times in the same order the images were timed
+            timings["match"] = time_matching(descriptors, matcher, repeat)
+            timings["total"] = [sum(stage) for stage in zip(*(timings[s] for s in ("detect", "landmarks", "descriptor", "match")))]
+            total_seconds = sum(timings["total"]) / 1000
+            runs.append({
+                "width": width,
+                "gallery_size": gallery_size,
+                "backend": matcher.backend,
+                "images": len(samples),
+                "faces": faces,
+                "samples": len(timings["total"]),
+                "stages": {stage: summarise(timings[stage]) for stage in STAGES},
+                "throughput_images_per_second": round(len(timings["total"]) / total_seconds, 2) if total_seconds else None,
+            })
+            print(f"width {width}, gallery {gallery_size} ({matcher.backend}): "
+                  f"total p50 {runs[-1]['stages']['total']['p50']:.1f} ms, "
+                  f"{runs[-1]['throughput_images_per_second']} images/s", flush=True)
+
+    return {
+        "version": RESULTS_VERSION,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "platform": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "system": platform.system(),
+            "cpu_count": os.cpu_count(),
+        },
+        "settings": {
+            "images": directory, "widths": widths, "gallery_sizes": gallery_sizes, "repeat": repeat, "precision": precision
+        },
+        "peak_rss_bytes": peak_rss(),
+        "runs": runs,
+    }
+
+
+# Function to compare two result files, returns printable lines and the worst p50 slowdown in percent
+def compare_results(current, baseline):
+    lines = []
+    worst = 0.0
+    baseline_runs = {(run["width"], run["gallery_size"]): run for run in baseline["runs"]}
+    for run in current["runs"]:
+        old = baseline_runs.get((run["width"], run["gallery_size"]))
+        if old is None:
+            continue
+        lines.append(f"width {run['width']}, gallery {run['gallery_size']}:")
+        for stage in STAGES:
+            new_stats, old_stats = run["stages"].get(stage), old["stages"].get(stage)
+            if not new_stats or not old_stats:
+                continue
+            cells = []
+            for key in ("p50", "p95", "p99"):
+                change = (new_stats[key] - old_stats[key]) / old_stats[key] * 100 if old_stats[key] else 0.0
+                cells.append(f"{key} {old_stats[key]:.2f} -> {new_stats[key]:.2f} ms ({change:+.1f}%)")
+                if key == "p50":
+                    worst = max(worst, change)
+            lines.append(f"  {stage:<10} " + ", ".join(cells))
+    if current.get("peak_rss_bytes") and baseline.get("peak_rss_bytes"):
+        lines.append(f"peak RSS {baseline['peak_rss_bytes'] / 2**20:.1f} -> {current['peak_rss_bytes'] / 2**20:.1f} MiB")
+    return lines, worst
+
+
+def _int_list(value):
+    return [int(item) for item in value.split(",") if item]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the face pipeline stage by stage on a folder of sample images.")
+    parser.add_argument("--images", required=True, help="folder with sample .jpg/.png images")
+    parser.add_argument("--widths", type=_int_list, default=[1280, 960, 640], help="comma separated image widths to test")
+    parser.add_argument("--gallery-sizes", type=_int_list, default=[100, 1000, 10000], help="comma separated gallery sizes to match against")
+    parser.add_argument("--repeat", type=int, default=3, help="timed passes per image")
+    parser.add_argument("--limit", type=int, default=None, help="only use the first N images")
+    parser.add_argument("--index", default=face_index_path, help="face index whose enrolled faces seed the gallery, '' for synthetic only")
+    parser.add_argument("--precision", default=face_embedding_precision, help="gallery precision: float32, float16 or int8")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="results JSON of an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=None, help="exit with 1 when any p50 is slower than the baseline by more than this percent")
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(args.images, args.widths, args.gallery_sizes, args.repeat, args.limit, args.index, args.precision)
+    if results["peak_rss_bytes"]:
+        print(f"Peak RSS: {results['peak_rss_bytes'] / 2**20:.1f} MiB")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+    else:
+        print(json.dumps(results, indent=2))
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        lines, worst = compare_results(results, baseline)
+        print("\n".join(lines))
+        if args.max_regression is not None and worst > args.max_regression:
+            print(f"p50 regression of {worst:.1f}% exceeds {args.max_regression}%")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
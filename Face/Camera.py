@@ -0,0 +1,110 @@
+import time
+import threading
+from collections import deque
+import cv2
+from config import camera_buffer_size, camera_idle_timeout, camera_warmup_frames, camera_max_frame_age
+
+
+# Owns one capture device for the whole process. A background thread keeps reading frames into a
+# small ring buffer so any session gets the freshest frame immediately instead of opening the
+# device itself. The device is released after idle_timeout seconds without a request, and frames
+# older than max_frame_age seconds are dropped so a camera that stopped delivering gives no frame.
+class CameraService:
+    def __init__(self, device=0, buffer_size=camera_buffer_size, idle_timeout=camera_idle_timeout,
+                 warmup_frames=camera_warmup_frames, max_frame_age=camera_max_frame_age):
+        self.device = device
+        self.idle_timeout = idle_timeout
+        self.warmup_frames = warmup_frames
+        self.max_frame_age = max_frame_age
+        self.error = None
+        self._frames = deque(maxlen=buffer_size)
+        self._lock = threading.Lock()
+        self._frame_ready = threading.Condition(self._lock)
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self._stopping = False
+        self._last_request = 0.0
+
+    def is_running(self):
+        with self._lock:
+            return self._thread is not None and self._thread.is_alive() and not self._stopping
+
+    # Function to start the capture thread if it is not running, waiting for a stopping one to release the device
+    def _ensure_running(self):
+        with self._start_lock:
+            with self._lock:
+                self._last_request = time.monotonic()
+                if self._thread is not None and self._thread.is_alive() and not self._stopping:
+                    return
+                old_thread = self._thread
+            if old_thread is not None:
+                old_thread.join()
+            with self._lock:
+                self._frames.clear()
+                self.error = None
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name=f"camera-{self.device}", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        cap = cv2.VideoCapture(self.device)
+        try:
+            if not cap.isOpened():
+                with self._frame_ready:
+                    self.error = "Error: No input device found. Please check your webcam."
+                    self._stopping = True
+                    self._frame_ready.notify_all()
+                return
+            # The first frames after opening are usually under-exposed, let auto exposure settle
+            for _ in range(self.warmup_frames):
+                cap.read()
+            while True:
+                ret, frame = cap.read()
+                with self._frame_ready:
+                    if not ret:
+                        self.error = "Error: Could not read frame."
+                        self._stopping = True
+                        self._frames.clear()
+                        self._frame_ready.notify_all()
+                        return
+                    self._frames.append((time.monotonic(), frame))
+                    self._frame_ready.notify_all()
+                    if time.monotonic() - self._last_request > self.idle_timeout:
+                        self._stopping = True
+                        self._frames.clear()
+                        return
+        finally:
+            cap.release()
+
+    # Function to get the buffered frames captured within max_frame_age, call it holding the lock
+    def _fresh_frames(self):
+        cutoff = time.monotonic() - self.max_frame_age
+        return [frame for captured, frame in self._frames if captured >= cutoff]
+
+    # Function to get copies of the newest frames (oldest first), waiting only if no fresh frame was captured yet.
+    # Returns an empty list if the device gives no fresh frame within timeout.
+    def recent_frames(self, count=1, timeout=5.0):
+        self._ensure_running()
+        with self._frame_ready:
+            self._frame_ready.wait_for(lambda: len(self._fresh_frames()) > 0 or self.error is not None, timeout)
+            frames = self._fresh_frames()[-count:]
+        return [frame.copy() for frame in frames]
+
+    # Function to get the freshest frame, None if the device could not deliver one
+    def latest_frame(self, timeout=5.0):
+        frames = self.recent_frames(1, timeout)
+        return frames[0] if frames else None
+
+
+_cameras = {}
+_cameras_lock = threading.Lock()
+
+
+# Function to get the shared capture service of a device
+def get_camera(device=0):
+    with _cameras_lock:
+        camera = _cameras.get(device)
+        if camera is None:
+            camera = CameraService(device)
+            _cameras[device] = camera
+        return camera
@@ -0,0 +1,77 @@
+import time
+import cv2
+import numpy as np
+import dlib
+from config import detect_max_width, detect_upsample, detect_retry_upsample, detect_roi, camera_detect_settings
+from Face.Models import get_detector
+
+
+# HOG face detection with a cheap first pass and a full-resolution retry.
+# The first pass runs on a downscaled crop of the frame; only when it finds nothing is the crop
+# searched again at full resolution with upsampling. Rectangles are always returned in the
+# coordinates of the full frame so landmarks and descriptors are computed at full resolution.
+class FaceDetector:
+    def __init__(self, detector=None, max_width=detect_max_width, upsample=detect_upsample,
+                 retry_upsample=detect_retry_upsample, roi=detect_roi):
+        self.detector = detector or get_detector()
+        self.max_width = max_width
+        self.upsample = upsample
+        self.retry_upsample = retry_upsample
+        self.roi = roi
+        self.last_timings = {}
+
+    # Function to crop the frame to the region of interest, returns the crop and its offset
+    def _crop(self, img):
+        if self.roi is None:
+            return img, 0, 0
+        height, width = img.shape[:2]
+        left, top = int(self.roi[0] * width), int(self.roi[1] * height)
+        right, bottom = int(self.roi[2] * width), int(self.roi[3] * height)
+        return np.ascontiguousarray(img[top:bottom, left:right]), left, top
+
+    # Function to detect faces, returns (rectangles, timings in milliseconds per stage)
+    def detect(self, img_rgb):
+        timings = {}
+        start = time.perf_counter()
+        crop, offset_x, offset_y = self._crop(img_rgb)
+        scale = 1.0
+        small = crop
+        if self.max_width and crop.shape[1] > self.max_width:
+            scale = self.max_width / crop.shape[1]
+            small = cv2.resize(crop, (self.max_width, int(round(crop.shape[0] * scale))), interpolation=cv2.INTER_AREA)
+        timings["prepare_ms"] = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        dets = self.detector(small, self.upsample)
+        timings["detect_ms"] = (time.perf_counter() - start) * 1000
+        timings["passes"] = 1
+
+        if len(dets) == 0 and self.retry_upsample is not None and (scale < 1.0 or self.retry_upsample > self.upsample):
+            start = time.perf_counter()
+            dets = self.detector(crop, self.retry_upsample)
+            timings["retry_ms"] = (time.perf_counter() - start) * 1000
+            timings["passes"] = 2
+            scale = 1.0
+
+        rects = dlib.rectangles()
+        for d in dets:
+            rects.append(dlib.rectangle(
+                int(d.left() / scale) + offset_x, int(d.top() / scale) + offset_y,
+                int(d.right() / scale) + offset_x, int(d.bottom() / scale) + offset_y
+            ))
+        timings["total_ms"] = sum(value for key, value in timings.items() if key.endswith("_ms"))
+        self.last_timings = timings
+        return rects, timings
+
+
+# Function to build a detector with the settings of one camera (see camera_detect_settings in config)
+def detector_for_camera(camera_index=0):
+    return FaceDetector(**camera_detect_settings.get(camera_index, {}))
+
+
+# Function to format stage timings for display, e.g. "prepare 1.2 ms, detect 18.4 ms, passes 1"
+def format_timings(timings):
+    return ", ".join(
+        f"{key[:-3]} {value:.1f} ms" if key.endswith("_ms") else f"{key} {value}"
+        for key, value in timings.items()
+    )
@@ -0,0 +1,182 @@
+import os
+import sys
+import argparse
+import tempfile
+import numpy as np
+from config import face_index_path, face_embedding_precision, face_rerank_candidates
+from Face.FaceIndex import load_face_index, save_reference_matrix, load_reference_matrix, DESCRIPTOR_SIZE
+
+PRECISIONS = ("float32", "float16", "int8")
+# Rows converted back to float32 at a time while scanning a reduced precision matrix
+SCAN_BLOCK = 8192
+
+
+# Function to compute squared euclidean distances between every query and every row with one matrix product
+def squared_distances(queries, matrix, matrix_sq_norms):
+    query_sq_norms = np.einsum("ij,ij->i", queries, queries)
+    distances = query_sq_norms[:, None] + matrix_sq_norms[None, :] - 2.0 * (queries @ matrix.T)
+    return np.maximum(distances, 0.0, out=distances)
+
+
+# Function to pick the k smallest entries of each row without sorting the whole row
+def smallest_k(distances, k):
+    k = min(k, distances.shape[1])
+    if k == 0:
+        return np.zeros((len(distances), 0), dtype=np.float32), np.zeros((len(distances), 0), dtype=np.int64)
+    if k < distances.shape[1]:
+        idx = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    else:
+        idx = np.broadcast_to(np.arange(distances.shape[1]), distances.shape).copy()
+    part = np.take_along_axis(distances, idx, axis=1)
+    order = np.argsort(part, axis=1)
+    return np.take_along_axis(part, order, axis=1), np.take_along_axis(idx, order, axis=1)
+
+
+# Gallery vectors as one matrix plus a compact int32 id per row pointing into a table of unique names.
+# In float16 and int8 mode the scan runs over the reduced matrix and the best candidates are re-ranked
+# against the full-precision rows, which the caller may pass as a read-only memmap so they stay on disk.
+# int8 uses one symmetric scale per dimension.
+class EmbeddingStore:
+    def __init__(self, encodings, names, precision=face_embedding_precision, rerank=face_rerank_candidates):
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown embedding precision {precision!r}, expected one of {PRECISIONS}")
+        labels, ids = np.unique(np.asarray(names, dtype=str), return_inverse=True)
+        self.labels = labels.tolist()
+        self.ids = ids.astype(np.int32).reshape(-1)
+        self.precision = precision
+        self.rerank = rerank
+        self.scales = None
+        if precision == "float32":
+            self.vectors = np.ascontiguousarray(encodings, dtype=np.float32).reshape(-1, DESCRIPTOR_SIZE)
+            self.reference = self.vectors
+            self.sq_norms = np.einsum("ij,ij->i", self.vectors, self.vectors)
+            return
+
+        self.reference = encodings
+        source = np.asarray(encodings, dtype=np.float32).reshape(-1, DESCRIPTOR_SIZE)
+        if precision == "float16":
+            self.vectors = source.astype(np.float16)
+        else:
+            scales = np.abs(source).max(axis=0) / 127 if len(source) else np.ones(DESCRIPTOR_SIZE, dtype=np.float32)
+            scales[scales == 0] = 1.0
+            self.scales = scales.astype(np.float32)
+            self.vectors = np.clip(np.rint(source / self.scales), -127, 127).astype(np.int8)
+        approx = self.vectors.astype(np.float32) * (self.scales if self.scales is not None else 1.0)
+        self.sq_norms = np.einsum("ij,ij->i", approx, approx)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def name(self, row):
+        return self.labels[self.ids[row]]
+
+    # Function to get the rows enrolled for a name, an empty array if the name is unknown
+    def rows_for(self, name):
+        position = np.searchsorted(self.labels, name)
+        if position >= len(self.labels) or self.labels[position] != name:
+            return np.zeros(0, dtype=np.int64)
+        return np.flatnonzero(self.ids == position)
+
+    # Function to read full-precision rows, from disk when the reference is a memmap
+    def full_rows(self, rows):
+        return np.asarray(self.reference[np.sort(rows)], dtype=np.float32).reshape(-1, DESCRIPTOR_SIZE)
+
+    # Function to find the k nearest rows of every query, same contract as the matcher backends
+    def search(self, queries, k):
+        if self.precision == "float32":
+            return smallest_k(squared_distances(queries, self.vectors, self.sq_norms), k)
+
+        candidates = min(len(self), max(k, self.rerank))
+        # Folding the int8 scales into the queries saves rescaling every gallery block
+        scaled_queries = queries * self.scales if self.scales is not None else queries
+        query_sq_norms = np.einsum("ij,ij->i", queries, queries)
+        distances = np.empty((len(queries), len(self)), dtype=np.float32)
+        for start in range(0, len(self), SCAN_BLOCK):
+            stop = min(len(self), start + SCAN_BLOCK)
+            block = self.vectors[start:stop].astype(np.float32)
+            distances[:, start:stop] = query_sq_norms[:, None] + self.sq_norms[None, start:stop] - 2.0 * (scaled_queries @ block.T)
+        _, idx = smallest_k(distances, candidates)
+
+        # Re-rank the shortlist with the exact vectors, reading each distinct row once
+        rows, inverse = np.unique(idx, return_inverse=True)
+        exact = self.full_rows(rows)[inverse.reshape(idx.shape)]
+        exact_distances = ((exact - queries[:, None, :]) ** 2).sum(axis=2)
+        order = np.argsort(exact_distances, axis=1)[:, :k]
+        return np.take_along_axis(exact_distances, order, axis=1), np.take_along_axis(idx, order, axis=1)
+
+    # Function to report how many bytes the store keeps in memory
+    def memory_report(self):
+        report = {
+            "vectors": self.vectors.nbytes,
+            "sq_norms": self.sq_norms.nbytes,
+            "ids": self.ids.nbytes,
+            "labels": sum(sys.getsizeof(label) for label in self.labels) + sys.getsizeof(self.labels),
+            "scales": self.scales.nbytes if self.scales is not None else 0,
+            "reference": 0 if isinstance(self.reference, np.memmap) or self.reference is self.vectors else self.reference.nbytes,
+        }
+        report["total"] = sum(report.values())
+        # What the same gallery used to cost: a Python list of float64 arrays plus a list of name strings
+        report["legacy"] = len(self) * (sys.getsizeof(np.zeros(DESCRIPTOR_SIZE)) + 8) + sum(
+            sys.getsizeof(self.labels[i]) + 8 for i in self.ids
+        )
+        return report
+
+
+# Function to measure memory and accuracy of every precision on an enrolled gallery.
+# Every enrolled row is used as a query with itself left out, so the nearest remaining row should
+# belong to the same student whenever that student has more than one photo.
+def compare_precisions(encodings, names, rerank=face_rerank_candidates):
+    encodings = np.ascontiguousarray(encodings, dtype=np.float32).reshape(-1, DESCRIPTOR_SIZE)
+    names = np.asarray(names, dtype=str)
+    with tempfile.TemporaryDirectory() as directory:
+        # Reduced precisions are measured the way the gallery runs them, with the float32 rows mapped from disk
+        reference = load_reference_matrix(save_reference_matrix(encodings, os.path.join(directory, "face_index.npz")))
+        results = _compare_precisions(encodings, reference, names, rerank)
+        del reference
+    return results
+
+
+def _compare_precisions(encodings, reference, names, rerank):
+    results = {}
+    exact_neighbours = None
+    for precision in PRECISIONS:
+        store = EmbeddingStore(encodings if precision == "float32" else reference, names, precision, rerank)
+        # Two candidates each: the query row itself comes back first
+        sq_distances, idx = store.search(encodings, 2)
+        neighbour = np.where(idx[:, 0] == np.arange(len(idx)), idx[:, 1], idx[:, 0])
+        if exact_neighbours is None:
+            exact_neighbours = neighbour
+        has_other_photo = np.array([np.count_nonzero(names == name) > 1 for name in names])
+        correct = names[neighbour] == names
+        results[precision] = {
+            "memory": store.memory_report(),
+            "same_neighbour_as_float32": float(np.mean(neighbour == exact_neighbours)) if len(idx) else 1.0,
+            "identification_accuracy": float(np.mean(correct[has_other_photo])) if has_other_photo.any() else None,
+        }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report memory use and accuracy of the face gallery at each embedding precision.")
+    parser.add_argument("--index", default=face_index_path, help="face index file to analyse")
+    parser.add_argument("--rerank", type=int, default=face_rerank_candidates, help="candidates re-ranked at full precision")
+    args = parser.parse_args(argv)
+
+    index = load_face_index(args.index)
+    if index is None or len(index["names"]) < 2:
+        print(f"No usable face index at {args.index}, run python -m Face.Enroll first.")
+        return 1
+    results = compare_precisions(index["encodings"], index["names"], args.rerank)
+    baseline = results["float32"]["memory"]["legacy"]
+    print(f"{len(index['names'])} enrolled faces, the old list-of-arrays gallery used {baseline / 2**20:.2f} MiB")
+    for precision, result in results.items():
+        memory = result["memory"]
+        accuracy = result["identification_accuracy"]
+        print(f"{precision:>8}: {memory['total'] / 2**20:.2f} MiB in memory ({1 - memory['total'] / baseline:.0%} saved), "
+              f"same neighbour as float32 {result['same_neighbour_as_float32']:.2%}, "
+              f"identification {'n/a' if accuracy is None else f'{accuracy:.2%}'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
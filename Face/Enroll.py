@@ -0,0 +1,85 @@
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from config import saved_faces_directory1, face_index_path
+from Face.FaceIndex import (
+    load_face_index, save_face_index, empty_face_index, update_face_index, plan_face_index_update,
+    scan_faces_directory, encode_face_image
+)
+from Face.Models import get_face_models
+
+
+# Runs once in every worker process so each worker holds its own copy of the dlib models
+def _init_worker():
+    get_face_models()
+
+
+# Function run in the worker processes: encodes one enrollment photo.
+# An enrollment photo must contain exactly one face, otherwise it is reported as a failure.
+def encode_enrollment_image(img_path):
+    detector, sp, facerec = get_face_models()
+    face_encodings, error = encode_face_image(img_path, detector, sp, facerec)
+    return img_path, face_encodings, error
+
+
+# Function to encode every new or changed photo in SavedFaces on a process pool and write the results
+# straight into the face index. progress(done, total, filename, error) is called as each image finishes.
+def enroll_directory(directory=saved_faces_directory1, workers=None, progress=None, index_path=face_index_path):
+    start = time.perf_counter()
+    index = load_face_index(index_path) or empty_face_index()
+    files = scan_faces_directory(directory)
+    plan = plan_face_index_update(index, directory, files)
+    pending = plan[0]["added"] + plan[0]["changed"]
+
+    encoded = {}
+    failures = []
+    if pending:
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending)), initializer=_init_worker) as pool:
+            futures = [pool.submit(encode_enrollment_image, os.path.join(directory, filename)) for filename in pending]
+            for done, future in enumerate(as_completed(futures), start=1):
+                img_path, face_encodings, error = future.result()
+                filename = os.path.basename(img_path)
+                encoded[filename] = (face_encodings, error)
+                if error:
+                    failures.append((filename, error))
+                if progress is not None:
+                    progress(done, len(pending), filename, error)
+
+    index, changes = update_face_index(index, directory, files, encoded=encoded, plan=plan)
+    if any(changes.values()) or not os.path.exists(index_path):
+        save_face_index(index, index_path)
+
+    return {
+        "enrolled": len(pending) - len(failures),
+        "failed": sorted(failures),
+        "removed": len(changes["removed"]),
+        "unchanged": len(plan[0]["unchanged"]) + len(changes["touched"]),
+        "gallery_size": len(index["names"]),
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Encode new face photos in SavedFaces into the face index using all CPU cores.")
+    parser.add_argument("--directory", default=saved_faces_directory1, help="folder with <StudentID>.jpg photos")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes (default: one per core)")
+    parser.add_argument("--index", default=face_index_path, help="face index file to update")
+    args = parser.parse_args(argv)
+
+    def progress(done, total, filename, error):
+        status = f"FAILED ({error})" if error else "ok"
+        print(f"[{done}/{total}] {filename}: {status}", flush=True)
+
+    report = enroll_directory(args.directory, args.workers, progress, args.index)
+    print(f"Enrolled {report['enrolled']} images, {len(report['failed'])} failed, {report['removed']} removed, "
+          f"{report['unchanged']} unchanged in {report['seconds']}s. Gallery now has {report['gallery_size']} faces.")
+    for filename, error in report["failed"]:
+        print(f"  {filename}: {error}")
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
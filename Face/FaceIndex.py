@@ -0,0 +1,204 @@
+import os
+import json
+import hashlib
+import numpy as np
+import dlib
+from config import face_index_path
+
+# Bump this whenever the layout of the index file changes so old files get rebuilt
+INDEX_VERSION = 1
+IMAGE_EXTENSIONS = (".jpg", ".png")
+DESCRIPTOR_SIZE = 128
+
+
+# Function to list the enrolled face images with their modification time and size
+def scan_faces_directory(directory):
+    files = {}
+    for entry in os.scandir(directory):
+        if entry.is_file() and entry.name.endswith(IMAGE_EXTENSIONS):
+            stat = entry.stat()
+            files[entry.name] = (stat.st_mtime_ns, stat.st_size)
+    return files
+
+
+# Function to hash the content of an image so that touched-but-unchanged files are not re-encoded
+def file_sha1(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Function to compute the face descriptor of one enrollment photo, returns (encodings, error).
+# The photo must show exactly one face: in a group photo there is no telling which face is the student,
+# so it is rejected instead of enrolling everyone in it under the file's name. The gallery refresh and
+# the bulk enrollment pool (Face/Enroll.py) both encode through here.
+def encode_face_image(img_path, detector, sp, facerec):
+    try:
+        img = dlib.load_rgb_image(img_path)
+    except RuntimeError as e:
+        return [], f"unreadable image: {e}"
+    dets = detector(img, 1)
+    if len(dets) == 0:
+        return [], "no face found"
+    if len(dets) > 1:
+        return [], f"{len(dets)} faces found"
+    face_descriptor = facerec.compute_face_descriptor(img, sp(img, dets[0]))
+    return [np.array(face_descriptor, dtype=np.float32)], None
+
+
+# Function to create an index with no faces in it
+def empty_face_index():
+    return {
+        "encodings": np.zeros((0, DESCRIPTOR_SIZE), dtype=np.float32),
+        "names": [],
+        "manifest": []
+    }
+
+
+# Function to work out which images were added, changed, removed or only touched since the index was written.
+# Size and mtime are compared first; the content hash is only computed for files whose stat changed.
+def plan_face_index_update(index, directory, files):
+    old_entries = {entry["file"]: entry for entry in index["manifest"]}
+    plan = {"added": [], "changed": [], "removed": sorted(set(old_entries) - set(files)), "touched": [], "unchanged": []}
+    hashes = {}
+    for filename in sorted(files):
+        mtime, size = files[filename]
+        entry = old_entries.get(filename)
+        # Files indexed with several faces before the one-face rule are encoded again so the rule applies
+        if entry is not None and entry["rows"] > 1:
+            hashes[filename] = entry["sha1"]
+            plan["changed"].append(filename)
+            continue
+        if entry is not None and entry["mtime"] == mtime and entry["size"] == size:
+            plan["unchanged"].append(filename)
+            hashes[filename] = entry["sha1"]
+            continue
+        hashes[filename] = file_sha1(os.path.join(directory, filename))
+        if entry is None:
+            plan["added"].append(filename)
+        elif entry["size"] == size and entry["sha1"] == hashes[filename]:
+            plan["touched"].append(filename)
+        else:
+            plan["changed"].append(filename)
+    return plan, hashes
+
+
+# Function to bring an index up to date with the directory.
+# Only added or changed images are encoded; rows of unchanged images are copied over and rows of
+# removed images are dropped. Images already encoded elsewhere (e.g. by the bulk enrollment pool) can be
+# passed in `encoded` as {filename: (encodings, error)}. Returns the new index and the files in each category.
+def update_face_index(index, directory, files, detector=None, sp=None, facerec=None, encoded=None, plan=None):
+    plan, hashes = plan if plan is not None else plan_face_index_update(index, directory, files)
+    encoded = encoded or {}
+    old_rows = {}
+    offset = 0
+    for entry in index["manifest"]:
+        old_rows[entry["file"]] = (entry, offset)
+        offset += entry["rows"]
+
+    reencode = set(plan["added"]) | set(plan["changed"])
+    encodings = []
+    names = []
+    manifest = []
+    for filename in sorted(files):
+        mtime, size = files[filename]
+        if filename not in reencode:
+            entry, offset = old_rows[filename]
+            manifest.append(dict(entry, mtime=mtime))
+            encodings.append(index["encodings"][offset:offset + entry["rows"]])
+            names.extend(index["names"][offset:offset + entry["rows"]])
+            continue
+
+        if filename in encoded:
+            face_encodings, error = encoded[filename]
+        else:
+            face_encodings, error = encode_face_image(os.path.join(directory, filename), detector, sp, facerec)
+        entry = {"file": filename, "mtime": mtime, "size": size, "sha1": hashes[filename], "rows": len(face_encodings)}
+        if error:
+            entry["error"] = error
+        manifest.append(entry)
+        encodings.append(np.array(face_encodings, dtype=np.float32).reshape(-1, DESCRIPTOR_SIZE))
+        names.extend([filename.split(".")[0]] * len(face_encodings))
+
+    new_index = {
+        "encodings": np.ascontiguousarray(np.concatenate(encodings) if encodings else empty_face_index()["encodings"]),
+        "names": names,
+        "manifest": manifest
+    }
+    changes = {key: plan[key] for key in ("added", "changed", "removed", "touched")}
+    return new_index, changes
+
+
+# Function to build the index from scratch by encoding every image in the directory
+def build_face_index(directory, detector, sp, facerec):
+    index, _ = update_face_index(empty_face_index(), directory, scan_faces_directory(directory), detector, sp, facerec)
+    return index
+
+
+# Function to write the index atomically so a running page never reads a half-written file
+def save_face_index(index, index_path=face_index_path):
+    tmp_path = index_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(
+            f,
+            version=np.int32(INDEX_VERSION),
+            encodings=np.ascontiguousarray(index["encodings"], dtype=np.float32),
+            names=np.array(index["names"], dtype=str),
+            manifest=np.array(json.dumps(index["manifest"]))
+        )
+    os.replace(tmp_path, index_path)
+
+
+# Function to write the float32 rows next to the index as a plain .npy file that can be memory mapped.
+# The name includes a hash of the content and an existing file is never rewritten, so a process that still
+# maps an older file is not affected. Older files are removed when nothing holds them open.
+def save_reference_matrix(encodings, index_path=face_index_path):
+    encodings = np.ascontiguousarray(encodings, dtype=np.float32).reshape(-1, DESCRIPTOR_SIZE)
+    base = os.path.splitext(index_path)[0]
+    path = f"{base}.{hashlib.sha1(encodings.tobytes()).hexdigest()[:12]}.f32.npy"
+    if not os.path.exists(path):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, encodings)
+        os.replace(tmp_path, path)
+    directory, prefix = os.path.split(base)
+    for entry in os.scandir(directory or "."):
+        if entry.name.startswith(prefix + ".") and entry.name.endswith(".f32.npy") and entry.path != path:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+    return path
+
+
+# Function to map the float32 rows written by save_reference_matrix read-only
+def load_reference_matrix(path):
+    return np.load(path, mmap_mode="r")
+
+
+# Function to load the index from disk, returns None if it is missing or was written by another version
+def load_face_index(index_path=face_index_path):
+    if not os.path.exists(index_path):
+        return None
+    try:
+        with np.load(index_path, allow_pickle=False) as data:
+            if int(data["version"]) != INDEX_VERSION:
+                return None
+            return {
+                "encodings": np.ascontiguousarray(data["encodings"], dtype=np.float32).reshape(-1, DESCRIPTOR_SIZE),
+                "names": data["names"].tolist(),
+                "manifest": json.loads(str(data["manifest"]))
+            }
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+# Function used by scripts: loads the saved index and re-encodes only the images that changed
+def get_face_index(directory, detector, sp, facerec, index_path=face_index_path):
+    index = load_face_index(index_path) or empty_face_index()
+    index, changes = update_face_index(index, directory, scan_faces_directory(directory), detector, sp, facerec)
+    if any(changes.values()) or not os.path.exists(index_path):
+        save_face_index(index, index_path)
+    return index["encodings"], index["names"]
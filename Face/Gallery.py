@@ -0,0 +1,128 @@
+import os
+import time
+import threading
+import numpy as np
+from config import (
+    saved_faces_directory1, face_index_path, face_index_refresh_seconds, face_match_threshold, face_embedding_precision
+)
+from Face.FaceIndex import (
+    load_face_index, save_face_index, empty_face_index, update_face_index, plan_face_index_update,
+    scan_faces_directory, save_reference_matrix, load_reference_matrix
+)
+from Face.Models import get_face_models
+from Face.Matcher import FaceMatcher
+
+
+# Immutable view of the gallery handed to sessions. A refresh builds a new snapshot and
+# swaps it in, so a session that already holds one keeps a consistent matrix and name list.
+class GallerySnapshot:
+    def __init__(self, index, version):
+        self.version = version
+        self.matcher = FaceMatcher(index["encodings"], index["names"])
+        self.store = self.matcher.store
+
+    def __len__(self):
+        return len(self.store)
+
+    # Function for 1:1 verification of a claimed identity against that student's enrolled descriptors.
+    # Returns (distance, verified); distance is None when the student has no enrolled photo.
+    def verify(self, face_encoding, name, threshold=face_match_threshold):
+        rows = self.store.rows_for(name)
+        if len(rows) == 0:
+            return None, False
+        face_encoding = np.asarray(face_encoding, dtype=np.float32).reshape(128)
+        distance = float(np.sqrt(((self.store.full_rows(rows) - face_encoding) ** 2).sum(axis=1).min()))
+        return distance, distance < threshold
+
+
+class FaceGallery:
+    def __init__(self, directory, index_path=face_index_path, refresh_seconds=face_index_refresh_seconds):
+        self.directory = directory
+        self.index_path = index_path
+        self.refresh_seconds = refresh_seconds
+        self._index = None
+        self._index_mtime = None
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.last_changes = {}
+
+    # Function to get the current snapshot, rescanning the directory at most every refresh_seconds.
+    # Only the very first call waits for the scan. Later rescans run on a background thread and encode new
+    # photos there, sessions keep matching against the current snapshot until the new one is swapped in.
+    # Only one rebuild runs at a time: sessions arriving together build the first snapshot once, and a
+    # background refresh that finds another one running leaves the work to it.
+    def snapshot(self):
+        if self._snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._refresh()
+        elif time.monotonic() - self._checked_at >= self.refresh_seconds and not self._lock.locked():
+            self._checked_at = time.monotonic()
+            threading.Thread(target=self.refresh, args=(False,), name="face-gallery-refresh", daemon=True).start()
+        return self._snapshot
+
+    # Function to read the modification time of the index file, None if it does not exist yet
+    def _index_file_mtime(self):
+        try:
+            return os.stat(self.index_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    # Function to re-encode added or changed images and swap the result into running sessions, returns the
+    # changes. With wait=False it returns None straight away when another refresh is running.
+    # The lock only keeps two refreshes apart, snapshot() never waits on it once a snapshot exists.
+    def refresh(self, wait=True):
+        if not self._lock.acquire(blocking=wait):
+            return None
+        try:
+            return self._refresh()
+        finally:
+            self._lock.release()
+
+    # Must be called with the lock held
+    def _refresh(self):
+        # The index file may have been rewritten by another process, e.g. the bulk enrollment command
+        index_mtime = self._index_file_mtime()
+        reloaded = self._index is None or index_mtime != self._index_mtime
+        if reloaded:
+            self._index = load_face_index(self.index_path) or empty_face_index()
+        files = scan_faces_directory(self.directory)
+        plan = plan_face_index_update(self._index, self.directory, files)
+        if plan[0]["added"] or plan[0]["changed"]:
+            detector, sp, facerec = get_face_models()
+        else:
+            detector, sp, facerec = None, None, None
+        index, changes = update_face_index(self._index, self.directory, files, detector, sp, facerec, plan=plan)
+        if any(changes.values()) or index_mtime is None:
+            save_face_index(index, self.index_path)
+        self._index_mtime = self._index_file_mtime()
+        if self._snapshot is None or reloaded or any(changes[key] for key in ("added", "changed", "removed")):
+            if face_embedding_precision != "float32" and len(index["names"]):
+                # Only the reduced matrix stays in memory, the float32 rows are mapped from disk for re-ranking
+                index["encodings"] = load_reference_matrix(save_reference_matrix(index["encodings"], self.index_path))
+            version = self._snapshot.version + 1 if self._snapshot is not None else 1
+            self._snapshot = GallerySnapshot(index, version)
+        elif face_embedding_precision != "float32" and len(index["names"]):
+            # Nothing changed, keep using the mapped rows instead of the copy update_face_index just made
+            index["encodings"] = self._snapshot.store.reference
+        self._index = index
+        self._checked_at = time.monotonic()
+        self.last_changes = changes
+        return changes
+
+
+_galleries = {}
+_galleries_lock = threading.Lock()
+
+
+# Function to get the process-wide gallery for a SavedFaces directory
+def get_gallery(directory=saved_faces_directory1):
+    gallery = _galleries.get(directory)
+    if gallery is None:
+        with _galleries_lock:
+            gallery = _galleries.get(directory)
+            if gallery is None:
+                gallery = FaceGallery(directory)
+                _galleries[directory] = gallery
+    return gallery
@@ -0,0 +1,111 @@
+import numpy as np
+from config import face_match_threshold, face_ann_backend, face_ann_min_gallery, face_embedding_precision
+from Face.EmbeddingStore import EmbeddingStore, squared_distances, smallest_k
+
+
+# One candidate for a query face. margin is how much further away the closest *other*
+# student is, a small margin means the match is ambiguous even if it is under the threshold.
+class Match:
+    def __init__(self, name, index, distance, margin):
+        self.name = name
+        self.index = index
+        self.distance = distance
+        self.margin = margin
+
+    def __repr__(self):
+        return f"Match({self.name!r}, distance={self.distance:.4f}, margin={self.margin:.4f})"
+
+
+# Inverted-file index: the gallery is clustered with k-means and a query is only compared with
+# the rows of its nprobe closest clusters. Approximate, but keeps the cost flat as enrollment grows.
+class IVFIndex:
+    def __init__(self, matrix, nlist=None, nprobe=8, iterations=10, seed=0):
+        self.matrix = matrix
+        self.sq_norms = np.einsum("ij,ij->i", matrix, matrix)
+        n = len(matrix)
+        self.nlist = max(1, min(n, nlist or int(np.sqrt(n))))
+        self.nprobe = min(nprobe, self.nlist)
+        rng = np.random.default_rng(seed)
+        sample = matrix[rng.choice(n, size=min(n, self.nlist * 64), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=self.nlist, replace=False)]
+        for _ in range(iterations):
+            assign = np.argmin(squared_distances(sample, centroids, np.einsum("ij,ij->i", centroids, centroids)), axis=1)
+            for c in range(self.nlist):
+                members = sample[assign == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.centroid_sq_norms = np.einsum("ij,ij->i", self.centroids, self.centroids)
+        assign = np.argmin(squared_distances(matrix, self.centroids, self.centroid_sq_norms), axis=1)
+        self.lists = [np.flatnonzero(assign == c) for c in range(self.nlist)]
+
+    def search(self, queries, k):
+        _, probes = smallest_k(squared_distances(queries, self.centroids, self.centroid_sq_norms), self.nprobe)
+        k = min(k, len(self.matrix))
+        all_distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+        all_idx = np.full((len(queries), k), -1, dtype=np.int64)
+        for q, query in enumerate(queries):
+            candidates = np.concatenate([self.lists[c] for c in probes[q]])
+            if len(candidates) == 0:
+                continue
+            distances, idx = smallest_k(
+                squared_distances(query[None, :], self.matrix[candidates], self.sq_norms[candidates]), k
+            )
+            found = idx.shape[1]
+            all_distances[q, :found] = distances[0]
+            all_idx[q, :found] = candidates[idx[0]]
+        return all_distances, all_idx
+
+
+# Approximate indexes over float32 rows. "brute" is the exact scan of the EmbeddingStore itself.
+# There is no tree backend: over 128-dimensional descriptors a KD-tree or ball tree visits nearly every
+# node and ends up slower than the brute scan.
+BACKENDS = {
+    "ivf": IVFIndex,
+}
+
+
+class FaceMatcher:
+    # Extra candidates fetched per query so the margin to the next student can be computed
+    # even when one student has several photos enrolled
+    MARGIN_CANDIDATES = 8
+
+    def __init__(self, encodings, names, backend=None, precision=face_embedding_precision):
+        self.store = EmbeddingStore(encodings, names, precision)
+        if backend is None or len(self.store) == 0:
+            backend = face_ann_backend if len(self.store) >= face_ann_min_gallery else "brute"
+        if precision != "float32":
+            # The other backends search float32 rows, a reduced precision store is always scanned and re-ranked
+            backend = "brute"
+        self.backend = backend
+        self.index = self.store if backend == "brute" else BACKENDS[backend](self.store.vectors)
+
+    def __len__(self):
+        return len(self.store)
+
+    # Function to match several faces at once, returns the top-k candidates of every query
+    def match(self, query_encodings, k=1):
+        queries = np.ascontiguousarray(query_encodings, dtype=np.float32).reshape(-1, 128)
+        if len(queries) == 0 or len(self.store) == 0:
+            return [[] for _ in range(len(queries))]
+        sq_distances, idx = self.index.search(queries, k + self.MARGIN_CANDIDATES)
+        distances = np.sqrt(sq_distances)
+        results = []
+        for q in range(len(queries)):
+            valid = idx[q] >= 0
+            row_idx, row_dist = idx[q][valid], distances[q][valid]
+            matches = []
+            row_ids = self.store.ids[row_idx]
+            for i, student, d in zip(row_idx[:k], row_ids[:k], row_dist[:k]):
+                others = row_dist[row_ids != student]
+                margin = float(others[0] - d) if len(others) else float("inf")
+                matches.append(Match(self.store.labels[student], int(i), float(d), margin))
+            results.append(matches)
+        return results
+
+    # Function to get the best match of each query, None where it is above the threshold
+    def identify(self, query_encodings, threshold=face_match_threshold):
+        return [
+            matches[0] if matches and matches[0].distance < threshold else None
+            for matches in self.match(query_encodings, k=1)
+        ]
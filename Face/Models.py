@@ -0,0 +1,93 @@
+import os
+import time
+import threading
+import dlib
+from config import sp_path, facerec_path
+
+# psutil is optional, it is only used to report how much memory each model added
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+# The ResNet used by face_recognition_model_v1 keeps per-call state, so concurrent
+# Streamlit sessions must not run it at the same time
+class SerializedFaceRecognizer:
+    def __init__(self, model):
+        self.model = model
+        self.lock = threading.Lock()
+
+    def compute_face_descriptor(self, *args, **kwargs):
+        with self.lock:
+            return self.model.compute_face_descriptor(*args, **kwargs)
+
+
+_LOADERS = {
+    "detector": lambda: dlib.get_frontal_face_detector(),
+    "shape_predictor": lambda: dlib.shape_predictor(sp_path),
+    "face_recognizer": lambda: SerializedFaceRecognizer(dlib.face_recognition_model_v1(facerec_path)),
+}
+_MODEL_FILES = {
+    "shape_predictor": sp_path,
+    "face_recognizer": facerec_path,
+}
+
+_models = {}
+_metrics = {}
+_locks = {name: threading.Lock() for name in _LOADERS}
+
+
+# Function to read the resident memory of this process, None when psutil is not installed
+def _current_rss():
+    if psutil is None:
+        return None
+    return psutil.Process().memory_info().rss
+
+
+# Function to get a model, loading it the first time any session asks for it
+def get_model(name):
+    model = _models.get(name)
+    if model is not None:
+        return model
+    with _locks[name]:
+        # Another session may have finished loading while we waited for the lock
+        model = _models.get(name)
+        if model is not None:
+            return model
+        rss_before = _current_rss()
+        start = time.perf_counter()
+        model = _LOADERS[name]()
+        load_seconds = time.perf_counter() - start
+        rss_after = _current_rss()
+        model_file = _MODEL_FILES.get(name)
+        _metrics[name] = {
+            "load_seconds": round(load_seconds, 4),
+            "file_bytes": os.path.getsize(model_file) if model_file else 0,
+            "rss_delta_bytes": rss_after - rss_before if rss_before is not None else None,
+            "loaded_at": time.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        _models[name] = model
+        return model
+
+
+def get_detector():
+    return get_model("detector")
+
+
+def get_shape_predictor():
+    return get_model("shape_predictor")
+
+
+def get_face_recognizer():
+    return get_model("face_recognizer")
+
+
+# Function to get the detector, shape predictor and face recognizer together
+def get_face_models():
+    return get_detector(), get_shape_predictor(), get_face_recognizer()
+
+
+# Function to report load time and memory of every model loaded so far in this process
+def model_metrics():
+    return {name: dict(metrics) for name, metrics in _metrics.items()}
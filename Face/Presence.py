@@ -0,0 +1,143 @@
+import time
+import threading
+import numpy as np
+from config import saved_faces_directory1, presence_interval_seconds, presence_max_minutes
+from Database.Writer import get_writer
+from Face.Models import get_face_models
+from Face.Gallery import get_gallery
+from Face.Camera import get_camera
+from Face.Detection import detector_for_camera
+from Face.Recognition import describe_faces
+
+
+# Function to store presence samples given as (student_id, class_id, sampled_at, present, distance).
+# The PresenceSamples table is created by Database/Migrations.py.
+def save_presence_samples(samples):
+    get_writer().write(_insert_presence_samples, samples)
+
+
+def _insert_presence_samples(conn, samples):
+    conn.executemany(
+        "INSERT OR REPLACE INTO PresenceSamples (StudentId, ClassID, SampledAt, Present, Distance) VALUES (?, ?, ?, ?, ?)",
+        [(student_id, class_id, int(sampled_at), int(present), distance)
+         for student_id, class_id, sampled_at, present, distance in samples]
+    )
+
+
+# Function to compute the fraction of a routine slot a student was seen in. Each present sample stands for
+# one sampling interval, so a student who snaps in and leaves is only credited for the checks they passed.
+# slot_start and slot_end are unix timestamps. Returns (fraction, present samples, total samples).
+def attended_fraction(conn, student_id, class_id, slot_start, slot_end, interval=presence_interval_seconds):
+    present, total = conn.execute("""
+        SELECT COALESCE(SUM(Present), 0), COUNT(*)
+        FROM PresenceSamples
+        WHERE StudentId = ? AND ClassID = ? AND SampledAt BETWEEN ? AND ?
+    """, (student_id, class_id, int(slot_start), int(slot_end))).fetchone()
+    slot_seconds = max(1.0, slot_end - slot_start)
+    return min(1.0, present * interval / slot_seconds), present, total
+
+
+class PresenceSession:
+    def __init__(self, student_id, class_id, interval):
+        self.student_id = student_id
+        self.class_id = class_id
+        self.interval = interval
+        self.started = time.time()
+        self.next_check = self.started + interval
+        self.present = 0
+        self.checks = 0
+
+
+# Re-verifies the students whose timers are running. One background thread wakes when the next check is
+# due, takes a single frame from the shared camera and describes the faces in it once for all students
+# due at that moment. Students are matched 1:1 against their own enrolled descriptors from the cached
+# gallery. When nobody is being monitored the thread exits and the camera can close.
+class PresenceMonitor:
+    def __init__(self, camera_index=0, interval=presence_interval_seconds, max_minutes=presence_max_minutes):
+        self.camera_index = camera_index
+        self.interval = interval
+        self.max_seconds = max_minutes * 60
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._thread = None
+        self.error = None
+
+    # Function to start monitoring a student, session_key identifies the browser session
+    def start(self, session_key, student_id, class_id):
+        with self._lock:
+            self._sessions[session_key] = PresenceSession(student_id, class_id, self.interval)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="presence-monitor", daemon=True)
+                self._thread.start()
+            self._wake.notify()
+
+    # Function to stop monitoring, returns the finished session or None
+    def stop(self, session_key):
+        with self._lock:
+            return self._sessions.pop(session_key, None)
+
+    def session(self, session_key):
+        with self._lock:
+            return self._sessions.get(session_key)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._sessions:
+                    self._thread = None
+                    return
+                now = time.time()
+                for key, session in list(self._sessions.items()):
+                    if now - session.started > self.max_seconds:
+                        del self._sessions[key]
+                due = [s for s in self._sessions.values() if s.next_check <= now]
+                if not due:
+                    next_check = min((s.next_check for s in self._sessions.values()), default=now + self.interval)
+                    self._wake.wait(timeout=max(0.0, next_check - now))
+                    continue
+            try:
+                self._check(due)
+                self.error = None
+            except Exception as e:
+                self.error = str(e)
+            with self._lock:
+                for session in due:
+                    session.next_check = time.time() + session.interval
+
+    # Function to run one check for every due session on a single frame
+    def _check(self, due):
+        sampled_at = time.time()
+        frame = get_camera(self.camera_index).latest_frame()
+        if frame is None:
+            # No frame is not evidence of absence, skip this round
+            return
+        detector, sp, facerec = get_face_models()
+        img_rgb = np.ascontiguousarray(frame[:, :, ::-1])
+        dets, _ = detector_for_camera(self.camera_index).detect(img_rgb)
+        encodings = describe_faces(img_rgb, dets, sp, facerec) if len(dets) else []
+        gallery = get_gallery(saved_faces_directory1).snapshot()
+        samples = []
+        for session in due:
+            results = [gallery.verify(encoding, session.student_id) for encoding in encodings]
+            present = any(verified for _, verified in results)
+            closest = min((distance for distance, _ in results if distance is not None), default=None)
+            with self._lock:
+                session.checks += 1
+                session.present += int(present)
+            samples.append((session.student_id, session.class_id, sampled_at, present, closest))
+        save_presence_samples(samples)
+
+
+_monitor = None
+_monitor_lock = threading.Lock()
+
+
+# Function to get the process-wide presence monitor
+def get_presence_monitor():
+    global _monitor
+    if _monitor is None:
+        with _monitor_lock:
+            if _monitor is None:
+                _monitor = PresenceMonitor()
+    return _monitor
@@ -0,0 +1,128 @@
+import math
+import cv2
+import numpy as np
+import dlib
+from config import (
+    quality_min_sharpness, quality_min_brightness, quality_max_brightness, quality_min_face_size,
+    quality_max_yaw, quality_max_roll_degrees
+)
+
+
+class QualityReport:
+    def __init__(self, metrics, reasons, score):
+        self.metrics = metrics
+        self.reasons = reasons
+        self.score = score
+
+    @property
+    def ok(self):
+        return not self.reasons
+
+
+# Function to measure how sharp an image is, the variance of the Laplacian drops sharply with blur
+def sharpness(gray):
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+
+# Function to estimate head yaw and roll from the 68 landmarks.
+# Yaw is how far the nose tip sits from the midpoint of the eyes, relative to the eye distance.
+def head_pose(shape):
+    points = np.array([(shape.part(i).x, shape.part(i).y) for i in range(shape.num_parts)], dtype=np.float32)
+    left_eye = points[36:42].mean(axis=0)
+    right_eye = points[42:48].mean(axis=0)
+    eye_vector = right_eye - left_eye
+    eye_distance = float(np.hypot(*eye_vector)) or 1.0
+    nose = points[30]
+    yaw = float((nose[0] - (left_eye[0] + right_eye[0]) / 2) / eye_distance)
+    roll = math.degrees(math.atan2(eye_vector[1], eye_vector[0]))
+    return yaw, roll
+
+
+# Function to check one detected face before the expensive descriptor is computed
+def assess_face(img_rgb, rect, shape):
+    height, width = img_rgb.shape[:2]
+    left, top = max(0, rect.left()), max(0, rect.top())
+    right, bottom = min(width, rect.right()), min(height, rect.bottom())
+    gray = cv2.cvtColor(img_rgb[top:bottom, left:right], cv2.COLOR_RGB2GRAY) if right > left and bottom > top else None
+    if gray is None or gray.size == 0:
+        return QualityReport({}, ["face outside the frame"], 0.0)
+
+    yaw, roll = head_pose(shape)
+    metrics = {
+        "sharpness": sharpness(gray),
+        "brightness": float(gray.mean()),
+        "face_size": min(rect.width(), rect.height()),
+        "yaw": yaw,
+        "roll": roll,
+    }
+    reasons = []
+    if metrics["sharpness"] < quality_min_sharpness:
+        reasons.append("too blurry")
+    if metrics["brightness"] < quality_min_brightness:
+        reasons.append("too dark")
+    elif metrics["brightness"] > quality_max_brightness:
+        reasons.append("too bright")
+    if metrics["face_size"] < quality_min_face_size:
+        reasons.append("face too small, move closer")
+    if abs(yaw) > quality_max_yaw or abs(roll) > quality_max_roll_degrees:
+        reasons.append("face not looking at the camera")
+
+    # Each factor is in [0, 1] so frames of a burst can be ranked even when all of them pass
+    score = (
+        min(1.0, metrics["sharpness"] / (2 * quality_min_sharpness))
+        * max(0.0, 1.0 - abs(metrics["brightness"] - 128) / 128)
+        * min(1.0, metrics["face_size"] / (2 * quality_min_face_size))
+        * max(0.0, 1.0 - abs(yaw) / (2 * quality_max_yaw))
+    )
+    return QualityReport(metrics, reasons, score)
+
+
+# Result of picking a frame out of a burst. rects and shapes only contain the faces that passed the gate.
+class FrameSelection:
+    def __init__(self, index, image, rects, shapes, reports, timings):
+        self.index = index
+        self.image = image
+        self.rects = rects
+        self.shapes = shapes
+        self.reports = reports
+        self.timings = timings
+
+    @property
+    def ok(self):
+        return len(self.rects) > 0
+
+    @property
+    def reasons(self):
+        if not self.reports:
+            return ["no face detected"]
+        best = max(self.reports, key=lambda report: report.score)
+        return best.reasons
+
+
+# Function to pick the best of several buffered RGB frames. Frames are tried sharpest first (a cheap
+# whole-frame check), and only detection and landmarks are run until one frame has a usable face.
+# The frames of a burst are a fraction of a second apart, so once a frame has no face at all the
+# rest are not searched: with nobody in front of the camera detection runs once, not once per frame.
+# An empty burst raises ValueError, callers only pass frames the camera delivered.
+def select_best_frame(frames, face_detector, sp):
+    if not frames:
+        raise ValueError("no frames to select from")
+    order = sorted(range(len(frames)), key=lambda i: sharpness(cv2.cvtColor(frames[i], cv2.COLOR_RGB2GRAY)), reverse=True)
+    best = None
+    best_score = -1.0
+    for i in order:
+        rects, timings = face_detector.detect(frames[i])
+        shapes = [sp(frames[i], rect) for rect in rects]
+        reports = [assess_face(frames[i], rect, shape) for rect, shape in zip(rects, shapes)]
+        good = [(rect, shape) for rect, shape, report in zip(rects, shapes, reports) if report.ok]
+        selection = FrameSelection(
+            i, frames[i], dlib.rectangles([rect for rect, _ in good]), [shape for _, shape in good], reports, timings
+        )
+        if selection.ok:
+            return selection
+        if len(rects) == 0:
+            return best or selection
+        score = max((report.score for report in reports), default=0.0)
+        if score > best_score:
+            best, best_score = selection, score
+    return best
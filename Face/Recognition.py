@@ -0,0 +1,56 @@
+import numpy as np
+import dlib
+import cv2
+from Face.Quality import select_best_frame
+
+
+# Function to compute the descriptors of all detected faces in one call to the recognition network
+def describe_faces(img_rgb, dets, sp, facerec):
+    return describe_shapes(img_rgb, [sp(img_rgb, d) for d in dets], facerec)
+
+
+# Function to compute descriptors from landmarks that were already found, e.g. by the quality gate
+def describe_shapes(img_rgb, shapes, facerec):
+    batch = dlib.full_object_detections()
+    for shape in shapes:
+        batch.append(shape)
+    if len(batch) == 0:
+        return np.zeros((0, 128), dtype=np.float32)
+    face_descriptors = facerec.compute_face_descriptor(img_rgb, batch)
+    return np.array([np.array(fd) for fd in face_descriptors], dtype=np.float32).reshape(-1, 128)
+
+
+# Function to detect, describe and identify every face in an image in a single pass.
+# Returns a list of (rectangle, match) pairs, match is None for faces that are not enrolled.
+def recognise_faces(img_rgb, gallery, detector, sp, facerec, upsample=1):
+    dets = detector(img_rgb, upsample)
+    face_encodings = describe_faces(img_rgb, dets, sp, facerec)
+    matches = gallery.matcher.identify(face_encodings)
+    return list(zip(dets, matches))
+
+
+# Function to pick the best frame of a BGR burst and identify the faces that pass the quality gate.
+# Safe to run on a worker thread, it does not touch Streamlit.
+def recognise_snapshot(frames, face_detector, sp, facerec, gallery):
+    selection = select_best_frame([cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) for frame in frames], face_detector, sp)
+    matches = []
+    if selection.ok:
+        matches = gallery.matcher.identify(describe_shapes(selection.image, selection.shapes, facerec))
+    return {
+        "frame": frames[selection.index],
+        "ok": selection.ok,
+        "reasons": selection.reasons,
+        "timings": selection.timings,
+        "matches": matches,
+    }
+
+
+# Function to keep one result per student, the closest face wins if a student matched twice
+def best_match_per_student(results):
+    best = {}
+    for rect, match in results:
+        if match is None:
+            continue
+        if match.name not in best or match.distance < best[match.name][1].distance:
+            best[match.name] = (rect, match)
+    return best
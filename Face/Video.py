@@ -0,0 +1,248 @@
+import sys
+import time
+import argparse
+from datetime import datetime, timedelta
+import cv2
+import dlib
+from config import (
+    saved_faces_directory1, detect_max_width, video_sample_fps, video_keyframe_interval,
+    video_tracker_min_confidence, video_recognition_attempts, video_merge_gap_seconds, attendance_min_fraction
+)
+from Database.Connection import get_connection
+from Face.Models import get_face_models
+from Face.Gallery import get_gallery
+from Face.Detection import FaceDetector
+from Face.Recognition import describe_faces
+
+
+# One face followed through the video. It is recognised once, on the first frame where it is found,
+# and only retried on later keyframes while it is still unknown.
+class FaceTrack:
+    def __init__(self, track_id, tracker, rect, seconds):
+        self.id = track_id
+        self.tracker = tracker
+        self.rect = rect
+        self.first_seen = seconds
+        self.last_seen = seconds
+        self.student_id = None
+        self.distance = None
+        self.attempts = 0
+
+
+# Function to compute how much two rectangles overlap, 0 for disjoint and 1 for identical
+def overlap(a, b):
+    intersection = a.intersect(b)
+    if intersection.is_empty():
+        return 0.0
+    union = a.area() + b.area() - intersection.area()
+    return intersection.area() / union if union else 0.0
+
+
+def _to_rectangle(drect):
+    return dlib.rectangle(int(drect.left()), int(drect.top()), int(drect.right()), int(drect.bottom()))
+
+
+# Function to open a video file, or a camera when the source is a device number
+def open_video(source):
+    capture = cv2.VideoCapture(int(source) if str(source).isdigit() else source)
+    if not capture.isOpened():
+        raise IOError(f"Could not open video source {source}")
+    return capture
+
+
+# Function to follow every face of a recording and recognise each face track once.
+# Only every step-th frame is decoded. Detection runs on every keyframe_interval-th sampled frame,
+# the correlation trackers carry the faces through the sampled frames in between.
+# Returns the finished tracks and processing statistics.
+def track_video(source, gallery, sample_fps=video_sample_fps, keyframe_interval=video_keyframe_interval,
+                min_confidence=video_tracker_min_confidence, max_width=detect_max_width, progress=None):
+    detector, sp, facerec = get_face_models()
+    face_detector = FaceDetector(detector, max_width=max_width)
+    capture = open_video(source)
+    fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+    total_frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    step = max(1, int(round(fps / sample_fps)))
+
+    tracks, finished = [], []
+    next_id = 0
+    stats = {"frames": 0, "sampled": 0, "keyframes": 0, "recognitions": 0}
+    started = time.perf_counter()
+
+    def recognise(img_rgb, pending):
+        rects = dlib.rectangles()
+        for track in pending:
+            rects.append(track.rect)
+        matches = gallery.matcher.identify(describe_faces(img_rgb, rects, sp, facerec))
+        stats["recognitions"] += len(pending)
+        for track, match in zip(pending, matches):
+            track.attempts += 1
+            if match is not None:
+                track.student_id, track.distance = match.name, match.distance
+
+    try:
+        frame_number = -1
+        while True:
+            # grab() skips a frame without decoding it, only sampled frames are retrieved
+            if not capture.grab():
+                break
+            frame_number += 1
+            stats["frames"] += 1
+            if frame_number % step:
+                continue
+            ok, frame = capture.retrieve()
+            if not ok:
+                break
+            seconds = frame_number / fps
+            img_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            is_keyframe = stats["sampled"] % keyframe_interval == 0
+            stats["sampled"] += 1
+
+            if is_keyframe:
+                stats["keyframes"] += 1
+                dets, _ = face_detector.detect(img_rgb)
+                unmatched = list(dets)
+                kept, new_tracks = [], []
+                for track in tracks:
+                    best = max(unmatched, key=lambda d: overlap(track.rect, d), default=None)
+                    if best is None or overlap(track.rect, best) < 0.3:
+                        finished.append(track)
+                        continue
+                    unmatched.remove(best)
+                    track.tracker.start_track(img_rgb, best)
+                    track.rect, track.last_seen = best, seconds
+                    kept.append(track)
+                for d in unmatched:
+                    tracker = dlib.correlation_tracker()
+                    tracker.start_track(img_rgb, d)
+                    new_tracks.append(FaceTrack(next_id, tracker, d, seconds))
+                    next_id += 1
+                tracks = kept + new_tracks
+                pending = [t for t in tracks if t.student_id is None and t.attempts < video_recognition_attempts]
+                if pending:
+                    recognise(img_rgb, pending)
+            else:
+                kept = []
+                for track in tracks:
+                    if track.tracker.update(img_rgb) < min_confidence:
+                        finished.append(track)
+                        continue
+                    track.rect, track.last_seen = _to_rectangle(track.tracker.get_position()), seconds
+                    kept.append(track)
+                tracks = kept
+
+            if progress is not None:
+                progress(frame_number, total_frames, len(tracks))
+    finally:
+        capture.release()
+
+    finished.extend(tracks)
+    stats["video_seconds"] = round(stats["frames"] / fps, 1)
+    stats["processing_seconds"] = round(time.perf_counter() - started, 1)
+    stats["tracks"] = len(finished)
+    return finished, stats
+
+
+# Function to turn recognised tracks into per-student presence intervals in seconds from the start of
+# the video. Intervals of the same student closer than merge_gap seconds are joined.
+def presence_intervals(tracks, merge_gap=video_merge_gap_seconds):
+    spans = {}
+    for track in tracks:
+        if track.student_id is not None:
+            spans.setdefault(track.student_id, []).append((track.first_seen, track.last_seen))
+    intervals = {}
+    for student_id, student_spans in spans.items():
+        merged = []
+        for start, end in sorted(student_spans):
+            if merged and start - merged[-1][1] <= merge_gap:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        intervals[student_id] = merged
+    return intervals
+
+
+# Function to fetch the routine slot a recording belongs to
+def get_routine(conn, routine_id):
+    c = conn.cursor()
+    c.execute("SELECT RoutineID, CourseID, Subject, Classroom, StartTime, EndTime FROM Routine WHERE RoutineID = ?", (routine_id,))
+    return c.fetchone()
+
+
+# Function to write one StudentAttendance row per student in a single transaction. InTime and Out are the
+# first and last moment the student was seen, Duration is the time actually present in minutes and the
+# individual intervals are listed in Logs. A student is Present when seen for at least attendance_min_fraction
+# of the routine slot, the rule PresenceMonitor's checks are graded by, and Absent otherwise.
+# Students already marked for the class are skipped.
+def save_video_attendance(conn, routine, lecture_start, intervals, source, min_fraction=attendance_min_fraction):
+    routine_id, course_id, subject, classroom, start_time, end_time = routine
+    class_id = f"{routine_id}{lecture_start.strftime('%Y%m%d')}"
+    date_str = lecture_start.strftime('%Y-%m-%d')
+    lecture_minutes = max(1.0, (datetime.strptime(end_time, '%H:%M') - datetime.strptime(start_time, '%H:%M')).total_seconds() / 60)
+
+    def at(seconds):
+        return (lecture_start + timedelta(seconds=seconds)).strftime('%Y-%m-%d %H:%M:%S')
+
+    with conn:
+        c = conn.cursor()
+        c.execute("SELECT StudentId FROM StudentAttendance WHERE ClassID = ? AND Date = ?", (class_id, date_str))
+        already_marked = {row[0] for row in c.fetchall()}
+        rows = []
+        for student_id, spans in intervals.items():
+            if student_id in already_marked:
+                continue
+            present_minutes = sum(end - start for start, end in spans) / 60
+            fraction = min(1.0, present_minutes / lecture_minutes)
+            status = "Present" if fraction >= min_fraction else "Absent"
+            logs = (f"Marked from recording {source}, seen {fraction:.0%} of the class. Present "
+                    + ", ".join(f"{at(start)[11:]}-{at(end)[11:]}" for start, end in spans))
+            rows.append((class_id, course_id, student_id, date_str, at(spans[-1][1]), subject, classroom,
+                         round(present_minutes, 2), status, logs, at(spans[0][0])))
+        c.executemany("""
+            INSERT INTO StudentAttendance (ClassID, CourseID, StudentId, Date, Out, SubjectTopic, Room, Duration, Attendance, Logs, InTime)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+    return len(rows), len(already_marked & set(intervals))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mark attendance from a recorded lecture by tracking and recognising faces.")
+    parser.add_argument("video", help="video file, or a camera number to use a live camera instead")
+    parser.add_argument("--routine-id", required=True, help="RoutineID of the class that was recorded")
+    parser.add_argument("--date", default=datetime.now().strftime('%Y-%m-%d'), help="date of the lecture, YYYY-MM-DD")
+    parser.add_argument("--start", default=None, help="time the recording started, HH:MM (default: the routine start time)")
+    parser.add_argument("--sample-fps", type=float, default=video_sample_fps, help="frames per second to look at")
+    parser.add_argument("--keyframe-interval", type=int, default=video_keyframe_interval, help="run detection on every Nth sampled frame")
+    parser.add_argument("--max-width", type=int, default=detect_max_width, help="downscale frames wider than this for detection")
+    parser.add_argument("--dry-run", action="store_true", help="print the intervals without writing attendance")
+    args = parser.parse_args(argv)
+
+    conn = get_connection()
+    routine = get_routine(conn, args.routine_id)
+    if routine is None:
+        print(f"Routine {args.routine_id} not found.")
+        return 1
+    lecture_start = datetime.strptime(f"{args.date} {args.start or routine[4]}", '%Y-%m-%d %H:%M')
+
+    def progress(frame_number, total_frames, active_tracks):
+        if frame_number % 500 == 0:
+            print(f"frame {frame_number}/{total_frames or '?'}, {active_tracks} faces tracked", flush=True)
+
+    gallery = get_gallery(saved_faces_directory1).snapshot()
+    tracks, stats = track_video(args.video, gallery, args.sample_fps, args.keyframe_interval, max_width=args.max_width, progress=progress)
+    intervals = presence_intervals(tracks)
+    speed = stats["video_seconds"] / stats["processing_seconds"] if stats["processing_seconds"] else 0
+    print(f"Processed {stats['video_seconds']}s of video in {stats['processing_seconds']}s ({speed:.1f}x real time), "
+          f"{stats['keyframes']} keyframes, {stats['tracks']} face tracks, {stats['recognitions']} recognitions.")
+    unknown = sum(1 for track in tracks if track.student_id is None)
+    print(f"{len(intervals)} students recognised, {unknown} tracks unknown.")
+    for student_id, spans in sorted(intervals.items()):
+        print(f"  {student_id}: " + ", ".join(f"{start:.0f}s-{end:.0f}s" for start, end in spans))
+
+    if not args.dry_run and intervals:
+        inserted, skipped = save_video_attendance(conn, routine, lecture_start, intervals, args.video)
+        print(f"Attendance marked for {inserted} students, {skipped} were already marked.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config import recognition_workers, recognition_queue_size, recognition_job_timeout, recognition_result_ttl
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+TIMED_OUT = "timed_out"
+
+
+class QueueFull(Exception):
+    pass
+
+
+class RecognitionJob:
+    def __init__(self, job_id, timeout):
+        self.id = job_id
+        self.timeout = timeout
+        self.status = PENDING
+        self.result = None
+        self.error = None
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+
+    def expired(self, now=None):
+        return ((now or time.monotonic()) - self.submitted_at) > self.timeout
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED, TIMED_OUT)
+
+
+# Runs recognition jobs on a small thread pool so the Streamlit script never blocks on dlib.
+# At most max_pending jobs may be queued or running, submit raises QueueFull beyond that so a
+# burst of snaps is turned away immediately instead of piling up behind each other.
+# A job that is still waiting when its timeout passes is dropped without running. A job that is
+# already running cannot be interrupted, it is reported as timed out and its result is discarded.
+class RecognitionQueue:
+    def __init__(self, workers=recognition_workers, max_pending=recognition_queue_size,
+                 timeout=recognition_job_timeout, result_ttl=recognition_result_ttl):
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.result_ttl = result_ttl
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="recognition")
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._pending = 0
+        self._running = 0
+        self._counters = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0, "timed_out": 0}
+        self._latencies = []
+
+    # Function to queue fn(*args), returns the job id to poll with get()
+    def submit(self, fn, *args, timeout=None):
+        with self._lock:
+            self._prune()
+            if self._pending + self._running >= self.max_pending:
+                self._counters["rejected"] += 1
+                raise QueueFull(f"{self._pending + self._running} recognition jobs already queued")
+            job = RecognitionJob(uuid.uuid4().hex, timeout or self.timeout)
+            self._jobs[job.id] = job
+            self._pending += 1
+            self._counters["submitted"] += 1
+        self._executor.submit(self._run, job, fn, args)
+        return job.id
+
+    def _run(self, job, fn, args):
+        with self._lock:
+            self._pending -= 1
+            if job.expired():
+                self._finish(job, TIMED_OUT)
+                return
+            job.status = RUNNING
+            job.started_at = time.monotonic()
+            self._running += 1
+        try:
+            result, error = fn(*args), None
+        except Exception as e:
+            result, error = None, e
+        with self._lock:
+            self._running -= 1
+            if job.status == TIMED_OUT:
+                return
+            job.result, job.error = result, error
+            self._finish(job, FAILED if error is not None else DONE)
+
+    # Must be called with the lock held
+    def _finish(self, job, status):
+        job.status = status
+        job.finished_at = time.monotonic()
+        self._counters["completed" if status == DONE else status] += 1
+        if status == DONE:
+            self._latencies.append(job.finished_at - job.submitted_at)
+            del self._latencies[:-500]
+
+    # Must be called with the lock held
+    def _prune(self):
+        now = time.monotonic()
+        for job_id, job in list(self._jobs.items()):
+            if job.finished and now - job.finished_at > self.result_ttl:
+                del self._jobs[job_id]
+
+    # Function to get the current state of a job, None if the id is unknown or its result expired
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.status == RUNNING and job.expired():
+                self._finish(job, TIMED_OUT)
+            return job
+
+    # Function to wait for a job to finish, used where blocking is acceptable
+    def wait(self, job_id, poll_interval=0.05):
+        job = self.get(job_id)
+        while job is not None and not job.finished:
+            time.sleep(poll_interval)
+            job = self.get(job_id)
+        return job
+
+    # Function to get the number of jobs ahead of a pending job
+    def position(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status != PENDING:
+                return 0
+            return sum(1 for other in self._jobs.values() if other.status == PENDING and other.submitted_at < job.submitted_at)
+
+    def metrics(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            metrics = dict(self._counters)
+            metrics["depth"] = self._pending
+            metrics["running"] = self._running
+            metrics["capacity"] = self.max_pending
+            if latencies:
+                metrics["latency_p50_ms"] = round(latencies[len(latencies) // 2] * 1000, 1)
+                metrics["latency_p95_ms"] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1)
+            return metrics
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+# Function to get the process-wide recognition queue shared by all sessions
+def get_recognition_queue():
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = RecognitionQueue()
+    return _queue
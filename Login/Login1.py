@@ -1,10 +1,9 @@
 import streamlit as st
-import sqlite3
 import uuid
 from datetime import datetime
 import pandas as pd
 import subprocess as sp
-from config import db_path
+from Database.Connection import get_connection
 
 
 
@@ -25,7 +24,7 @@ def main():
     
     # Function to create a connection to the database
     def create_connection():
-        conn = sqlite3.connect(db_path)
+        conn = get_connection()
         return conn
     
     # Function to generate a random ID
@@ -37,7 +36,6 @@ def main():
         conn = create_connection()
         query = f"SELECT * FROM {table_name}"
         df = pd.read_sql(query, conn)
-        conn.close()
         return df
     
     def fetch_teachers():
@@ -64,7 +62,6 @@ def main():
             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         ''', student_data)
         conn.commit()
-        conn.close()
     
     # Function to add a new teacher
     def add_teacher(teacher_data):
@@ -75,7 +72,6 @@ def main():
             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         ''', teacher_data)
         conn.commit()
-        conn.close()
     
     # Function to check login credentials
     def check_credentials(user_id, password, user_type):
@@ -84,7 +80,6 @@ def main():
         table = "StudentLogin" if user_type == "Student" else "TeacherLogin"
         c.execute(f'SELECT * FROM {table} WHERE {table[:-5]}ID = ? AND password = ?', (user_id, password))
         user = c.fetchone()
-        conn.close()
         return user
     
     # Function to update password
@@ -94,7 +89,6 @@ def main():
         table = "StudentLogin" if user_type == "Student" else "TeacherLogin"
         c.execute(f'UPDATE {table} SET password = ? WHERE {table[:-5]}ID = ?', (new_password, user_id))
         conn.commit()
-        conn.close()
     
     # Function to fetch department names and IDs
     def fetch_department_names():
@@ -102,7 +96,6 @@ def main():
         c = conn.cursor()
         c.execute('SELECT DepartmentID, Name FROM Departments')
         departments = c.fetchall()
-        conn.close()
         return {d[1]: d[0] for d in departments}
     
     # Function to fetch course IDs based on department ID
@@ -111,7 +104,6 @@ def main():
         c = conn.cursor()
         c.execute('SELECT CourseID FROM Courses WHERE DepartmentID = ?', (department_id,))
         courses = c.fetchall()
-        conn.close()
         return [c[0] for c in courses]
     
     # Initialize session state
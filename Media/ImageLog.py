@@ -0,0 +1,38 @@
+import streamlit as st
+from config import image_log_page_size, image_log_columns
+from Media.Thumbnails import load_thumbnail
+
+
+# Function to show captured images as a grid of thumbnails, newest first.
+# entries is a list of (image_path, caption). Only one page of thumbnails is rendered until the user
+# asks for more, and a full-size image is only read when its "View" button is clicked.
+def show_image_log(entries, key):
+    entries = [(path, caption) for path, caption in entries if path]
+    if not entries:
+        return
+    shown_key, full_key = f"{key}_shown", f"{key}_full"
+    shown = st.session_state.get(shown_key, image_log_page_size)
+
+    columns = st.columns(image_log_columns)
+    for i, (path, caption) in enumerate(reversed(entries[-shown:])):
+        with columns[i % image_log_columns]:
+            thumbnail = load_thumbnail(path)
+            if thumbnail is None:
+                st.caption(f"{caption} (image not found)")
+                continue
+            st.image(thumbnail, caption=caption)
+            # Keyed by position in entries, not by path: the same image can be logged more than once
+            if st.button("View", key=f"{key}_view_{len(entries) - 1 - i}"):
+                st.session_state[full_key] = (path, caption)
+
+    if len(entries) > shown:
+        if st.button(f"Show older ({len(entries) - shown} more)", key=f"{key}_more"):
+            st.session_state[shown_key] = shown + image_log_page_size
+            st.experimental_rerun()
+
+    if st.session_state.get(full_key):
+        path, caption = st.session_state[full_key]
+        st.image(path, caption=caption)
+        if st.button("Close", key=f"{key}_close"):
+            st.session_state[full_key] = None
+            st.experimental_rerun()
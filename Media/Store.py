@@ -0,0 +1,114 @@
+import io
+import hashlib
+from datetime import datetime
+from functools import lru_cache
+from PIL import Image
+from config import db_path, profile_image_cache_size, profile_thumbnail_size, thumbnail_cache_size
+from Database.Connection import query_one, transaction
+
+# Tables with a profile image and their key column. The image itself is in MediaBlobs, the table only
+# keeps its ImageID, so listing students or teachers never reads image data.
+IMAGE_TABLES = {"Students": "StudentID", "Teachers": "TeacherID"}
+
+# Content-addressed image store: MediaID is the SHA-256 of Data, so the same photo is stored once
+# and an ID always names the same bytes (which is what makes caching them safe)
+CREATE_TABLE = """
+    CREATE TABLE IF NOT EXISTS MediaBlobs (
+        MediaID TEXT PRIMARY KEY,
+        Size INTEGER NOT NULL,
+        Data BLOB NOT NULL,
+        CreatedAt TEXT NOT NULL
+    )
+"""
+
+THUMBNAIL_QUALITY = 85
+
+
+def media_id(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+# Function to store image bytes and return their MediaID, storing bytes that are already there is a no-op
+def put_image(conn, data):
+    image_id = media_id(data)
+    conn.execute("INSERT OR IGNORE INTO MediaBlobs (MediaID, Size, Data, CreatedAt) VALUES (?, ?, ?, ?)",
+                 (image_id, len(data), data, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+    return image_id
+
+
+# Function to delete an image once no student or teacher refers to it any more
+def release_image(conn, image_id):
+    if not image_id:
+        return
+    unused = " AND ".join(f"NOT EXISTS (SELECT 1 FROM {table} WHERE ImageID = :id)" for table in IMAGE_TABLES)
+    conn.execute(f"DELETE FROM MediaBlobs WHERE MediaID = :id AND {unused}", {"id": image_id})
+
+
+# Function to set the profile image of a student or teacher, returns the new ImageID
+def set_profile_image(table, person_id, data, path=db_path):
+    key = IMAGE_TABLES[table]
+    with transaction(path) as conn:
+        row = conn.execute(f"SELECT ImageID FROM {table} WHERE {key} = ?", (person_id,)).fetchone()
+        image_id = put_image(conn, data)
+        conn.execute(f"UPDATE {table} SET ImageID = ? WHERE {key} = ?", (image_id, person_id))
+        if row and row[0] != image_id:
+            release_image(conn, row[0])
+    return image_id
+
+
+# A missing image raises instead of returning None, so lru_cache does not remember the miss
+@lru_cache(maxsize=profile_image_cache_size)
+def _load_image(image_id, path):
+    row = query_one("SELECT Data FROM MediaBlobs WHERE MediaID = ?", (image_id,), path=path)
+    if row is None:
+        raise KeyError(image_id)
+    return bytes(row[0])
+
+
+# Function to get the bytes of an image, None if there is no such image
+def get_image(image_id, path=db_path):
+    if not image_id:
+        return None
+    try:
+        return _load_image(image_id, path)
+    except KeyError:
+        return None
+
+
+@lru_cache(maxsize=thumbnail_cache_size)
+def _make_thumbnail(image_id, size, path):
+    image = Image.open(io.BytesIO(_load_image(image_id, path)))
+    image.thumbnail((size, size))
+    output = io.BytesIO()
+    image.convert("RGB").save(output, format="JPEG", quality=THUMBNAIL_QUALITY)
+    return output.getvalue()
+
+
+# Function to get a JPEG thumbnail of an image that fits in size x size pixels, None if there is no such
+# image or it cannot be decoded. Lists show these instead of the full photos.
+def get_thumbnail(image_id, size=profile_thumbnail_size, path=db_path):
+    if not image_id:
+        return None
+    try:
+        return _make_thumbnail(image_id, size, path)
+    except (KeyError, OSError):
+        return None
+
+
+# Migration step: add ImageID to the profile tables and move the images stored in their Image column into
+# MediaBlobs. Image is emptied rather than dropped, pages that still read rows by position keep working.
+def move_profile_images(conn):
+    for table in IMAGE_TABLES:
+        columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+        if not columns:
+            continue
+        if "ImageID" not in columns:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN ImageID TEXT")
+        if "Image" not in columns:
+            continue
+        # One image in memory at a time
+        rowids = [row[0] for row in conn.execute(f"SELECT rowid FROM {table} WHERE Image IS NOT NULL")]
+        for rowid in rowids:
+            data = conn.execute(f"SELECT Image FROM {table} WHERE rowid = ?", (rowid,)).fetchone()[0]
+            image_id = put_image(conn, bytes(data)) if len(data) else None
+            conn.execute(f"UPDATE {table} SET ImageID = ?, Image = NULL WHERE rowid = ?", (image_id, rowid))
@@ -0,0 +1,64 @@
+import os
+from functools import lru_cache
+import cv2
+from config import thumbnail_width, thumbnail_cache_size
+
+THUMBNAIL_DIRECTORY = "thumbs"
+THUMBNAIL_QUALITY = 80
+
+
+# Function to get where the thumbnail of a captured image is stored
+def thumbnail_path(image_path):
+    directory, filename = os.path.split(image_path)
+    return os.path.join(directory, THUMBNAIL_DIRECTORY, os.path.splitext(filename)[0] + ".jpg")
+
+
+# Function to write the thumbnail of an image that is already in memory, called right after the capture is saved
+def save_thumbnail(image, image_path, width=thumbnail_width):
+    path = thumbnail_path(image_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if image.shape[1] > width:
+        height = max(1, int(round(image.shape[0] * width / image.shape[1])))
+        image = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+    cv2.imwrite(path, image, [cv2.IMWRITE_JPEG_QUALITY, THUMBNAIL_QUALITY])
+    return path
+
+
+# Function to make sure a thumbnail exists, images captured before thumbnails existed get one on first view
+def ensure_thumbnail(image_path):
+    path = thumbnail_path(image_path)
+    if os.path.exists(path):
+        return path
+    image = cv2.imread(image_path)
+    if image is None:
+        return None
+    return save_thumbnail(image, image_path)
+
+
+@lru_cache(maxsize=thumbnail_cache_size)
+def _decode_thumbnail(path, mtime_ns):
+    image = cv2.imread(path)
+    if image is None:
+        return None
+    image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    image.setflags(write=False)
+    return image
+
+
+# Function to get the decoded RGB thumbnail of a captured image, None if the image is missing.
+# Decoded thumbnails are shared by all sessions through an LRU cache keyed on the file's modification time.
+def load_thumbnail(image_path):
+    if not image_path:
+        return None
+    path = ensure_thumbnail(image_path)
+    if path is None:
+        return None
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    return _decode_thumbnail(path, mtime_ns)
+
+
+def thumbnail_cache_info():
+    return _decode_thumbnail.cache_info()
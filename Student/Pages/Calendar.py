@@ -2,20 +2,14 @@ import pandas as pd
 import streamlit as st
 from datetime import datetime, timedelta
 import calendar
-import sqlite3
-from sqlalchemy import create_engine
 from io import BytesIO
-from config import db_path
+from Database.Connection import get_connection, query_df, transaction
 
-# Database connection
-# db_path = ("F:/MCA PROJECT/Final/Data/university.db")
-engine = create_engine(f'sqlite:///{db_path}')
 
 def main():
     def load_data():
         query = "SELECT EventId, EventName, EventType, StartDate, EndDate, Description FROM EventCalendar"
-        with engine.connect() as conn:
-            df = pd.read_sql(query, conn)
+        df = query_df(query)
         return df
     
     events_data = load_data()
@@ -39,7 +33,7 @@ def main():
         # Save events to the database
         def save_events(events):
             df = pd.DataFrame(events)
-            with engine.connect() as conn:
+            with transaction() as conn:
                 df.to_sql('EventCalendar', conn, if_exists='replace', index=False)
     
         # Initial event list
@@ -164,7 +158,7 @@ def main():
     
     with rout:
             # Connect to the database
-        conn = sqlite3.connect(db_path)
+        conn = get_connection()
         
         def fetch_data(table_name):
             query = f"SELECT * FROM {table_name}"
@@ -266,6 +260,4 @@ def main():
             else:
                 st.dataframe(list_day_routine)
         
-        # Close the database connection
-        conn.close()
 
@@ -4,7 +4,8 @@ import numpy as np
 import matplotlib.pyplot as plt
 import sqlite3
 from datetime import datetime
-from config import db_path
+from Database.Connection import get_connection
+from Database.Analytics import get_analytics
 
 def main():
     # Function to get distinct student IDs
@@ -17,20 +18,21 @@ def main():
             st.error(f"Error fetching student IDs: {e}")
             return []
     
-    # Function to get attendance data for a specific student and date range
+    # Function to get attendance data for a specific student and date range, read from the daily rollup
     def get_attendance_data_for_student(conn, student_id, start_date, end_date):
         query = """
             SELECT
-                sa.SubjectTopic as Subject,
-                SUM(CASE WHEN sa.Attendance = 'Present' THEN 1 ELSE 0 END) as Attendance,  -- Count 'Present' statuses
-                COUNT(sa.AttendanceID) as Total_Class
+                ad.Subject as Subject,
+                SUM(ad.Present) as Attendance,  -- Count 'Present' statuses
+                SUM(ad.Classes) as Total_Class
             FROM
-                StudentAttendance sa
+                AttendanceDaily ad
             WHERE
-                sa.StudentId = ?
-                AND sa.Date BETWEEN ? AND ?
+                ad.PersonType = 'Student'
+                AND ad.PersonId = ?
+                AND ad.Date BETWEEN ? AND ?
             GROUP BY
-                sa.SubjectTopic
+                ad.Subject
         """
         try:
             cursor = conn.cursor()
@@ -61,19 +63,20 @@ def main():
             st.error(f"Error fetching scheduled classes: {e}")
             return {}
     
-    # Function to get attendance data for all students
+    # Function to get attendance data for all students, read from the daily rollup
     def get_attendance_data_all_students(conn, start_date, end_date):
         query = """
             SELECT
-                sa.SubjectTopic as Subject,
-                SUM(CASE WHEN sa.Attendance = 'Present' THEN 1 ELSE 0 END) as Attendance,  -- Count 'Present' statuses
-                COUNT(sa.AttendanceID) as Total_Class
+                ad.Subject as Subject,
+                SUM(ad.Present) as Attendance,  -- Count 'Present' statuses
+                SUM(ad.Classes) as Total_Class
             FROM
-                StudentAttendance sa
+                AttendanceDaily ad
             WHERE
-                sa.Date BETWEEN ? AND ?
+                ad.Date BETWEEN ? AND ?
+                AND ad.PersonType = 'Student'
             GROUP BY
-                sa.SubjectTopic
+                ad.Subject
         """
         try:
             cursor = conn.cursor()
@@ -85,7 +88,7 @@ def main():
     
     # Connect to the database with error handling
     try:
-        conn = sqlite3.connect(db_path)
+        conn = get_connection()
     except sqlite3.Error as e:
         st.error(f"Failed to connect to the database: {e}")
         conn = None
@@ -110,15 +113,20 @@ def main():
             st.subheader(f'Student Attendance Details for {selected_student_id}')
             st.table(df_student)
     
-            # Fetch attendance data for all students
-            all_students_attendance_data = get_attendance_data_all_students(conn, start_date, end_date)
-            df_all_students = pd.DataFrame(all_students_attendance_data, columns=['Subject', 'Attendance', 'Total_Class'])
+            # Fetch attendance data for all students, from the analytics engine when duckdb is available
+            analytics = get_analytics()
+            if analytics is not None:
+                df_all_students = analytics.subject_comparison(start_date, end_date)
+                df_all_students['Avg_Attendance'] = df_all_students['Attendance'] / df_all_students['Scheduled'].replace(0, 1)  # Avoid division by zero
+            else:
+                all_students_attendance_data = get_attendance_data_all_students(conn, start_date, end_date)
+                df_all_students = pd.DataFrame(all_students_attendance_data, columns=['Subject', 'Attendance', 'Total_Class'])
     
-            # Fetch total scheduled classes
-            scheduled_classes = get_total_scheduled_classes(conn, start_date, end_date)
+                # Fetch total scheduled classes
+                scheduled_classes = get_total_scheduled_classes(conn, start_date, end_date)
     
-            # Calculate Avg_Attendance for each subject
-            df_all_students['Avg_Attendance'] = df_all_students.apply(lambda row: row['Attendance'] / scheduled_classes.get(row['Subject'], 1), axis=1)  # Avoid division by zero
+                # Calculate Avg_Attendance for each subject
+                df_all_students['Avg_Attendance'] = df_all_students.apply(lambda row: row['Attendance'] / scheduled_classes.get(row['Subject'], 1), axis=1)  # Avoid division by zero
     
             # Display data table for all students
             st.subheader('Comparison with Other Students')
@@ -1,13 +1,12 @@
 import streamlit as st
-import sqlite3
 import pandas as pd
 import base64
-from config import db_path
+from Database.Connection import get_connection
 # st.set_page_config(page_title="Notifications ", layout="wide")
 
 def main():
     # Initialize connection to SQLite database
-    conn = sqlite3.connect(db_path)
+    conn = get_connection()
     c = conn.cursor()
     
     # Function to fetch students
@@ -3,13 +3,14 @@ import streamlit as st
 from PIL import Image, ImageDraw
 import io
 from datetime import datetime
-from config import db_path
+from Database.Connection import get_connection
+from Media.Store import get_image, set_profile_image
 
 def main():
     # Initialize session state attributes
     session_state_defaults = {
         "student_id": None,
-        "image_blob": None,
+        "image_id": None,
         "first_name": "",
         "middle_name": "",
         "last_name": "",
@@ -39,17 +40,18 @@ def main():
     # Function to load student data from the database
     def load_student_data(student_id):
         try:
-            conn = sqlite3.connect(db_path)
+            conn = get_connection()
             cursor = conn.cursor()
             cursor.execute("""
-                SELECT s.*, d.Name AS DepartmentName, c.Name AS CourseName
+                SELECT s.StudentID, s.ImageID, s.FirstName, s.MiddleName, s.LastName, s.RollNo, s.RegNo, s.DepartmentID,
+                       s.CourseID, s.AdmissionDate, s.NameInHindi, s.Caste, s.DOB, s.Gender, s.FatherName, s.MotherName,
+                       s.Phone, s.Email, s.Session, d.Name AS DepartmentName, c.Name AS CourseName
                 FROM Students s
                 JOIN Departments d ON s.DepartmentID = d.DepartmentID
                 JOIN Courses c ON s.CourseID = c.CourseID
                 WHERE StudentID = ?
             """, (student_id,))
             student_data = cursor.fetchone()
-            conn.close()
             return student_data
         except sqlite3.Error as e:
             st.error(f"Database error: {e}")
@@ -58,11 +60,10 @@ def main():
     # Function to update student data in the database
     def update_student_data(student_id, field, value):
         try:
-            conn = sqlite3.connect(db_path)
+            conn = get_connection()
             cursor = conn.cursor()
             cursor.execute(f"UPDATE Students SET {field} = ? WHERE StudentID = ?", (value, student_id))
             conn.commit()
-            conn.close()
         except sqlite3.Error as e:
             st.error(f"Database error: {e}")
     
@@ -77,11 +78,10 @@ def main():
     
     # Connect to the database and fetch student IDs for the select box
     try:
-        conn = sqlite3.connect(db_path)
+        conn = get_connection()
         cursor = conn.cursor()
         cursor.execute("SELECT StudentID FROM Students")
         student_ids = [row[0] for row in cursor.fetchall()]
-        conn.close()
     except sqlite3.Error as e:
         st.error(f"Database error: {e}")
         student_ids = []
@@ -107,7 +107,7 @@ def main():
             
             st.session_state.update(
                 student_id = student_data[0],
-                image_blob = student_data[1],
+                image_id = student_data[1],
                 first_name = student_data[2],
                 middle_name = student_data[3],
                 last_name = student_data[4],
@@ -134,7 +134,7 @@ def main():
     
     # Unpack student data
     student_id = st.session_state.student_id
-    image_blob = st.session_state.image_blob
+    image_blob = get_image(st.session_state.image_id)
     first_name = st.session_state.first_name
     middle_name = st.session_state.middle_name
     last_name = st.session_state.last_name
@@ -269,7 +269,7 @@ def main():
     
             if uploaded_image:
                 image_bytes = uploaded_image.read()
-                update_student_data(student_id, "Image", image_bytes)
+                set_profile_image("Students", student_id, image_bytes)
     
             st.success("Profile updated successfully!")
             st.session_state.edit_mode = False
@@ -4,42 +4,22 @@ import streamlit as st
 import datetime
 from datetime import datetime, date, time
 from config import db_path
+from Database.Connection import get_connection
+from Database.Attendance import daily_summary, student_name, show_attendance_pages
 
 # st.set_page_config(page_title="User", layout="wide")
 def main():
 
-    
-    # Function to load data from the SQLite database
-    def load_data_from_db(db_path):
-        # Connect to the database
-        conn = sqlite3.connect(db_path)
-        
-        # SQL query to select data from TeacherAttendance table
-        query = "SELECT * FROM TeacherAttendance"
-        
-        # Read the data into a DataFrame
-        df = pd.read_sql_query(query, conn)
-        
-        # Close the connection
-        conn.close()
-        
-        return df
     selected_student_id=st.session_state.user_id
-    # Function to load data from the database
-    def load_data_from_db(db_path, query):
-        conn = sqlite3.connect(db_path)
-        df = pd.read_sql_query(query, conn)
-        conn.close()
-        return df
     
-    # Function to generate the monthly summary
+    # Function to generate the monthly summary from the student's daily rollup rows
     def generate_summary(df, start_date, end_date):
         df['Date'] = pd.to_datetime(df['Date'])
         df['Day'] = df['Date'].dt.strftime('%a, %b %d')
         
         # Handle time format issue with errors='coerce'
-        df['InTime'] = pd.to_datetime(df['InTime'], format='%H:%M:%S', errors='coerce').dt.time
-        df['Out'] = pd.to_datetime(df['Out'], format='%H:%M:%S', errors='coerce').dt.time
+        df['FirstIn'] = pd.to_datetime(df['FirstIn'], format='%H:%M:%S', errors='coerce').dt.time
+        df['LastOut'] = pd.to_datetime(df['LastOut'], format='%H:%M:%S', errors='coerce').dt.time
         
         summary_data = []
         date_range = pd.date_range(start=start_date, end=end_date)
@@ -57,11 +37,11 @@ def main():
                 day_data = df[df['Date'].dt.date == date.date()]
                 if not day_data.empty:
                     # Handle NaN values when computing min and max times
-                    first_in = day_data['InTime'].dropna().min()
-                    last_out = day_data['Out'].dropna().max()
-                    subjects = ','.join(day_data['SubjectTopic'].unique())
-                    attendance_list = day_data['Attendance']
-                    attendance = ''.join(['✅' if status == 'Present' else '❌' for status in attendance_list])
+                    first_in = day_data['FirstIn'].dropna().min()
+                    last_out = day_data['LastOut'].dropna().max()
+                    subjects = ','.join(day_data['Subject'].unique())
+                    present = int(day_data['Present'].sum())
+                    attendance = '✅' * present + '❌' * (int(day_data['Classes'].sum()) - present)
                 else:
                     first_in, last_out, subjects, attendance = None, None, 'Absent', 'Absent'
     
@@ -80,38 +60,13 @@ def main():
         summary_df = pd.DataFrame(summary_data)
         return summary_df
     
-    # Function to load data from the database
-    def load_data_from_db(db_path, query):
-            conn = sqlite3.connect(db_path)
-            df = pd.read_sql_query(query, conn)
-            conn.close()
-            return df
-        
-        # Load StudentAttendance data
-    attendance_query = "SELECT * FROM StudentAttendance"
-    attendance_df = load_data_from_db(db_path, attendance_query)
-    
-    # Load Students data
-    students_query = "SELECT * FROM Students"
-    students_df = load_data_from_db(db_path, students_query)
-    
-    # Create a dictionary mapping StudentID to Full Name
-    students_df['FullName'] = students_df['FirstName'] + ' ' + students_df['MiddleName'] + ' ' + students_df['LastName']
-    student_name_mapping = students_df.set_index('StudentID')['FullName'].to_dict()
-    
-    # Set default student ID
-    default_student_id = 'STU961527236'
-    if default_student_id not in student_name_mapping:
-        default_student_id = list(student_name_mapping.keys())[0]
-    
+    # Full name of the logged in student, looked up by id instead of loading every student
+    student_full_name = student_name(selected_student_id)
         
     tab1, tab2, tab3 = st.tabs(["Summary", "Detailed", "Leave"])
     
     with tab1:
             st.title('Monthly Attendance Summary')
-        
-            # Load the data from the database
-            df = load_data_from_db(db_path, "SELECT * FROM StudentAttendance")
             
             # Get the current date and set the minimum date
             today = date.today()
@@ -126,28 +81,16 @@ def main():
                                        min_value=min_date,
                                        max_value=today)
             
-            # Load Students data for the selectbox
-            students_df = load_data_from_db(db_path, "SELECT * FROM Students")
-            students_df['FullName'] = students_df['FirstName'] + ' ' + students_df['MiddleName'] + ' ' + students_df['LastName']
-            student_name_mapping = students_df.set_index('StudentID')['FullName'].to_dict()
-            
-            # Set default student ID
-            default_student_id = 'STU961527236'
-            if default_student_id not in student_name_mapping:
-                default_student_id = list(student_name_mapping.keys())[0]
-            
-           
-            
             if len(date_range) == 2:
                 start_date, end_date = date_range
-                # Filter attendance data based on the selected student
-                student_attendance_df = df[df['StudentId'] == selected_student_id]
+                # Load the student's pre-aggregated daily rows for the selected range
+                student_attendance_df = daily_summary("StudentAttendance", selected_student_id, start_date, end_date)
                 
                 # Generate the summary
                 summary_df = generate_summary(student_attendance_df, start_date, end_date)
                 
                 # Display the selected date range
-                st.header(f"Summary for {student_name_mapping[selected_student_id]} from {start_date.strftime('%A, %B %d, %Y')} to {end_date.strftime('%A, %B %d, %Y')}")
+                st.header(f"Summary for {student_full_name} from {start_date.strftime('%A, %B %d, %Y')} to {end_date.strftime('%A, %B %d, %Y')}")
                 
                 # Display the summary dataframe
                 st.dataframe(summary_df, use_container_width=True)
@@ -159,13 +102,7 @@ def main():
     with tab2:  
          with st.container():
               # Display the full name of the selected student
-               st.header(student_name_mapping[selected_student_id])
-               
-               # Filter attendance data based on the selected student
-               student_attendance_df = attendance_df[attendance_df['StudentId'] == selected_student_id]
-               
-               # Ensure the 'Date' column is in datetime format
-               student_attendance_df['Date'] = pd.to_datetime(student_attendance_df['Date'])
+               st.header(student_full_name)
                
                # Display a date picker
                selected_date = st.date_input("Select a date")
@@ -173,26 +110,18 @@ def main():
                # Display the selected date with day name and date
                st.subheader(selected_date.strftime("%A, %B %d, %Y"))
                
-               # Filter the DataFrame based on the selected date
-               filtered_df = student_attendance_df[student_attendance_df['Date'].dt.date == selected_date]
-               
-               # Display the filtered dataframe in fullscreen and hide the row numbers
-               st.dataframe(filtered_df.set_index('AttendanceID'), use_container_width=True)
+               # Display the day's attendance a page at a time, hiding the row numbers
+               show_attendance_pages("StudentAttendance", selected_student_id, selected_date, key="student_detail")
     
     with tab3:
             def create_connection(db_path):
                 conn = None
                 try:
-                    conn = sqlite3.connect(db_path)
+                    conn = get_connection(db_path)
                 except sqlite3.Error as e:
                     st.error(f"Error connecting to database: {e}")
                 return conn
             
-            # Function to load students data
-            def load_students(conn):
-                query = "SELECT StudentID, FirstName || ' ' || LastName AS Name FROM Students"
-                return pd.read_sql_query(query, conn)
-            
             # Function to save leave application data
             def save_leave_application(conn, data):
                 query = """
@@ -244,9 +173,6 @@ def main():
             if conn is None:
                 st.stop()
             
-            # Load students data
-            students_df = load_students(conn)
-            
             # Student selection box
             student_id = st.session_state.user_id
             
@@ -397,6 +323,4 @@ def main():
                                     st.session_state.edit_application_id = None
                                     st.experimental_rerun()
             
-            # Close the database connection
-            conn.close()
     
\ No newline at end of file
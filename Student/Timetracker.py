@@ -1,21 +1,28 @@
 import cv2
 from PIL import Image
 import numpy as np
-import dlib
 import os
 import streamlit as st
-import sqlite3
 import time
 import json
 import pandas as pd
 from datetime import datetime
 from streamlit.components.v1 import html
 from config import db_path
-from config import sp_path
-from config import facerec_path
+from Database.Connection import get_connection
+from Database.Journal import save_attendance
 from config import save_directory1
 from config import saved_faces_directory1
 from config import class_state
+from config import quality_burst_frames
+from Face.Gallery import get_gallery
+from Face.Models import get_face_models
+from Face.Detection import detector_for_camera, format_timings
+from Face.Camera import get_camera
+from Face.Recognition import recognise_snapshot
+from Face.Worker import get_recognition_queue, QueueFull, TIMED_OUT, FAILED
+from Media.Thumbnails import save_thumbnail
+from Media.ImageLog import show_image_log
 from .Pages import Calendar, Dashboard, Notifications, User, Profile
 
 def main():
@@ -33,7 +40,7 @@ def main():
             st.stop()
         
         # Connect to SQLite database
-        conn = sqlite3.connect(db_path)
+        conn = get_connection()
         cursor = conn.cursor()
         
         # Define timer functions
@@ -72,19 +79,12 @@ def main():
             except Exception as e:
                 st.error(f"Error stopping the timer: {e}")
         
+        # Attendance rows are journalled to disk first and written to the table in the background
         def save_to_database(data_entry):
             try:
-                cursor.execute("""
-                    INSERT INTO StudentAttendance (ClassID, CourseID, StudentId, Date, Out, SubjectTopic, Room, Duration, Attendance, Logs, InTime) 
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    data_entry["ClassID"], data_entry["CourseID"], data_entry["StudentId"], data_entry["Date"],
-                    data_entry["Out"], data_entry["SubjectTopic"], data_entry["Room"], data_entry["Duration"],
-                    data_entry["Attendance"], data_entry["Logs"], data_entry["InTime"]
-                ))
-                conn.commit()
+                save_attendance("StudentAttendance", data_entry)
             except Exception as e:
-                st.error(f"Error saving to database: {e}")
+                st.error(f"Error saving attendance: {e}")
         
         def get_student_routine(student_id):
             try:
@@ -133,19 +133,13 @@ def main():
         def mark_present():
             st.session_state.student_present = not st.session_state.student_present
         
-        def capture_image():
-            cap = cv2.VideoCapture(0)
-            if not cap.isOpened():
-                st.error("Error: No input device found. Please check your webcam.")
-                return None
-        
-            ret, frame = cap.read()
-            if not ret:
-                st.error("Error: Could not read frame.")
-                return None
-        
-            cap.release()
-            return frame
+        def capture_frames():
+            # The shared camera service keeps the webcam open, take its last few frames so the best one can be used
+            camera = get_camera(0)
+            frames = camera.recent_frames(quality_burst_frames)
+            if not frames:
+                st.error(camera.error or "Error: Could not read frame.")
+            return frames
         
         def save_image(image, student_id):
             # Directory to save images
@@ -156,6 +150,7 @@ def main():
             # Construct image path
             img_path = f"{save_directory}/{student_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg"
             cv2.imwrite(img_path, image)
+            save_thumbnail(image, img_path)
             return img_path
         
         load_state()
@@ -206,30 +201,12 @@ def main():
         
 
 
-        # Load pre-trained face detection and face recognition models
-        detector = dlib.get_frontal_face_detector()
-        sp = dlib.shape_predictor(sp_path)
-        facerec = dlib.face_recognition_model_v1(facerec_path)
-        
-        # Function to load and prepare face data from a directory
-        def load_face_data(directory):
-            known_face_encodings = []
-            known_face_names = []
-            for filename in os.listdir(directory):
-                if filename.endswith(".jpg") or filename.endswith(".png"):
-                    img_path = os.path.join(directory, filename)
-                    img = dlib.load_rgb_image(img_path)
-                    dets = detector(img, 1)
-                    for k, d in enumerate(dets):
-                        shape = sp(img, d)
-                        face_descriptor = facerec.compute_face_descriptor(img, shape)
-                        face_encoding = np.array(face_descriptor)
-                        known_face_encodings.append(face_encoding)
-                        known_face_names.append(filename.split(".")[0])
-            return known_face_encodings, known_face_names
-        
-        saved_faces_directory = saved_faces_directory1
-        known_face_encodings, known_face_names = load_face_data(saved_faces_directory)
+        # Face detection and recognition models are loaded once per process and shared by all sessions
+        _, sp, facerec = get_face_models()
+        face_detector = detector_for_camera(0)
+        
+        # Shared face gallery, new or re-uploaded photos in SavedFaces are picked up incrementally
+        gallery = get_gallery(saved_faces_directory1).snapshot()
         
         # Layout
         left, right = st.columns([5,1])
@@ -249,83 +226,110 @@ def main():
             st.session_state.captured_image = None
             st.session_state.captured_image_path = ""
         
+        # Recognition runs on the shared worker pool, the page submits the burst and waits for the result in the
+        # same run, updating a placeholder while it waits instead of rerunning the whole page
+        recognition_queue = get_recognition_queue()
         if snap_button:
-            st.session_state.captured_image = capture_image()
-            if st.session_state.captured_image is not None:
-                image_pil = Image.fromarray(cv2.cvtColor(st.session_state.captured_image, cv2.COLOR_BGR2RGB))
-                st.image(image_pil, caption='Captured Image')
-                
-                # Save captured image and get path
-                st.session_state.captured_image_path = save_image(st.session_state.captured_image, st.session_state.selected_student)
-                
-                # Face recognition
-                img_rgb = cv2.cvtColor(st.session_state.captured_image, cv2.COLOR_BGR2RGB)
-                dets = detector(img_rgb, 1)
-                if len(dets) == 0:
-                    st.error("No face detected. Please try again.")
-                else:
-                    for k, d in enumerate(dets):
-                        shape = sp(img_rgb, d)
-                        face_descriptor = facerec.compute_face_descriptor(img_rgb, shape)
-                        face_encoding = np.array(face_descriptor)
-        
-                        distances = np.linalg.norm(known_face_encodings - face_encoding, axis=1)
-                        min_distance = np.min(distances)
-                        if min_distance < 0.6:  # You can adjust the threshold as needed
-                            matched_idx = np.argmin(distances)
-                            matched_name = known_face_names[matched_idx]
-                            st.success(f"Face recognized: {matched_name}")
-                            st.session_state.student_present = True
-                            st.session_state.timer_running = True  # Enable timer if face recognized
-                            start_timer()
-                            # HTML and JavaScript to request the user's location
-                            location_script = """
-                            <script>
-                            function getLocation() {
-                                if (navigator.geolocation) {
-                                    navigator.geolocation.getCurrentPosition(showPosition, showError);
-                                } else { 
-                                    document.getElementById("location").innerHTML = "Geolocation is not supported by this browser.";
-                                }
-                            }
-                            
-                            function showPosition(position) {
-                                document.getElementById("location").innerHTML = 
-                                "Latitude: " + position.coords.latitude + 
-                                "<br>Longitude: " + position.coords.longitude;
+            frames = capture_frames()
+            if frames:
+                try:
+                    # Pick the best frame of the burst, blurry, dark, tiny or turned faces never reach the descriptor
+                    st.session_state.recognition_job = recognition_queue.submit(
+                        recognise_snapshot, frames, face_detector, sp, facerec, gallery
+                    )
+                except QueueFull:
+                    st.warning("Many students are checking in right now. Please snap again in a moment.")
+        
+        recognition_result = None
+        if st.session_state.get('recognition_job'):
+            progress = st.empty()
+            job = recognition_queue.get(st.session_state.recognition_job)
+            # Bounded by the job timeout: a job still waiting when it passes is reported as timed out
+            while job is not None and not job.finished and not job.expired():
+                position = recognition_queue.position(job.id)
+                metrics = recognition_queue.metrics()
+                with progress.container():
+                    st.info("Recognising your face..." if position == 0 else f"Waiting for recognition, {position} ahead of you...")
+                    st.caption(f"Recognition queue: {metrics['depth']} waiting, {metrics['running']} running")
+                time.sleep(0.1)
+                job = recognition_queue.get(job.id)
+            progress.empty()
+            st.session_state.recognition_job = None
+            if job is None or not job.finished or job.status == TIMED_OUT:
+                st.error("Recognition took too long. Please try again.")
+            elif job.status == FAILED:
+                st.error(f"Error recognising face: {job.error}")
+            else:
+                recognition_result = job.result
+        
+        if recognition_result is not None:
+            st.session_state.captured_image = recognition_result["frame"]
+            st.image(Image.fromarray(cv2.cvtColor(st.session_state.captured_image, cv2.COLOR_BGR2RGB)), caption='Captured Image')
+            
+            # Save captured image and get path
+            st.session_state.captured_image_path = save_image(st.session_state.captured_image, st.session_state.selected_student)
+            
+            # Face recognition
+            st.caption(f"Detection: {format_timings(recognition_result['timings'])}")
+            if not recognition_result["ok"]:
+                st.error(f"Photo not usable ({', '.join(recognition_result['reasons'])}). Please try again.")
+            else:
+                # Every face that passed the quality gate was matched against the gallery in one batch
+                for match in recognition_result["matches"]:
+                    if match is not None:  # Threshold is face_match_threshold in config
+                        matched_name = match.name
+                        st.success(f"Face recognized: {matched_name}")
+                        st.session_state.student_present = True
+                        st.session_state.timer_running = True  # Enable timer if face recognized
+                        start_timer()
+                        # HTML and JavaScript to request the user's location
+                        location_script = """
+                        <script>
+                        function getLocation() {
+                            if (navigator.geolocation) {
+                                navigator.geolocation.getCurrentPosition(showPosition, showError);
+                            } else { 
+                                document.getElementById("location").innerHTML = "Geolocation is not supported by this browser.";
                             }
-                            
-                            function showError(error) {
-                                switch(error.code) {
-                                    case error.PERMISSION_DENIED:
-                                        document.getElementById("location").innerHTML = "User denied the request for Geolocation."
-                                        break;
-                                    case error.POSITION_UNAVAILABLE:
-                                        document.getElementById("location").innerHTML = "Location information is unavailable."
-                                        break;
-                                    case error.TIMEOUT:
-                                        document.getElementById("location").innerHTML = "The request to get user location timed out."
-                                        break;
-                                    case error.UNKNOWN_ERROR:
-                                        document.getElementById("location").innerHTML = "An unknown error occurred."
-                                        break;
-                                }
+                        }
+                        
+                        function showPosition(position) {
+                            document.getElementById("location").innerHTML = 
+                            "Latitude: " + position.coords.latitude + 
+                            "<br>Longitude: " + position.coords.longitude;
+                        }
+                        
+                        function showError(error) {
+                            switch(error.code) {
+                                case error.PERMISSION_DENIED:
+                                    document.getElementById("location").innerHTML = "User denied the request for Geolocation."
+                                    break;
+                                case error.POSITION_UNAVAILABLE:
+                                    document.getElementById("location").innerHTML = "Location information is unavailable."
+                                    break;
+                                case error.TIMEOUT:
+                                    document.getElementById("location").innerHTML = "The request to get user location timed out."
+                                    break;
+                                case error.UNKNOWN_ERROR:
+                                    document.getElementById("location").innerHTML = "An unknown error occurred."
+                                    break;
                             }
-                            
-                            getLocation();
-                            </script>
-                            <div id="location">Fetching location...</div>
-                            """
-                            
-                            
-                            # st.markdown("## Current Location")
-                            html(location_script, height=100)
-        
-                        else:
-                            st.error("Face not recognized. Please try again.")
-                            st.session_state.student_present = False
-                            st.session_state.timer_running = False
-        
+                        }
+                        
+                        getLocation();
+                        </script>
+                        <div id="location">Fetching location...</div>
+                        """
+                        
+                        
+                        # st.markdown("## Current Location")
+                        html(location_script, height=100)
+    
+                    else:
+                        st.error("Face not recognized. Please try again.")
+                        st.session_state.student_present = False
+                        st.session_state.timer_running = False
+    
         with right:
             if st.session_state.timer_running:
                 stop_button = st.button("Stop")
@@ -345,10 +349,9 @@ def main():
         if df.empty:
             st.info("No attendance marked today.")
         else:
-            df['CapturedImage'] = df['CapturedImagePath'].apply(lambda x: Image.open(x))
-            for index, row in df.iterrows():
-                st.image(row['CapturedImage'], caption=f"{row['Start time']} - {row['Stop time']}")
-            st.table(df.drop(columns=['CapturedImage']))
+            # Thumbnails only, the full capture is loaded when it is clicked
+            show_image_log([(row['CapturedImagePath'], f"{row['Start time']} - {row['Stop time']}") for _, row in df.iterrows()], "attendance_log")
+            st.table(df)
         
         # Display today's routine
         st.write("### Today's Routine")
@@ -358,7 +361,6 @@ def main():
         
         # Clean up and release webcam
         cv2.destroyAllWindows()
-        conn.close()
 
 
     elif page == "Calendar":
@@ -1,16 +1,27 @@
 import cv2
 from PIL import Image
 import numpy as np
-import dlib
 import os
 import streamlit as st
-import sqlite3
 import time
 import json
+import uuid
 import pandas as pd
 from datetime import datetime
 from streamlit.components.v1 import html
 from geopy.distance import geodesic
+from Face.Models import get_face_models
+from Face.Gallery import get_gallery
+from Face.Detection import detector_for_camera, format_timings
+from Face.Camera import get_camera
+from Face.Quality import select_best_frame
+from Media.Thumbnails import save_thumbnail
+from Media.ImageLog import show_image_log
+from Face.Presence import get_presence_monitor, save_presence_samples, attended_fraction
+from config import db_path, quality_burst_frames, attendance_min_fraction
+from Database.Connection import get_connection
+from Database.Migrations import ensure_schema
+from Database.Journal import save_attendance
 
 # Set the page config
 st.set_page_config(page_title="Time Tracker", page_icon=":alarm_clock:", layout="wide")
@@ -29,18 +40,19 @@ if 'student_present' not in st.session_state:
 
 
 # Database setup
-db_path = 'F:/MCA PROJECT/Final/Data/university.db'
 if not os.path.exists(db_path):
     st.error("Database not found. Terminating the program.")
     st.stop()
 
-conn = sqlite3.connect(db_path)
+# This page also runs on its own, without main.py, so it brings the schema up to date itself
+# (PresenceSamples, which the presence checks below write to, is created by a migration)
+ensure_schema()
+conn = get_connection()
 cursor = conn.cursor()
 
-# Load face recognition models
-detector = dlib.get_frontal_face_detector()
-sp = dlib.shape_predictor("F:/MCA PROJECT/Final/Data/shape_predictor_68_face_landmarks.dat")
-facerec = dlib.face_recognition_model_v1("F:/MCA PROJECT/Final/Data/dlib_face_recognition_resnet_model_v1.dat")
+# Load face recognition models (shared by every session in this process)
+detector, sp, facerec = get_face_models()
+face_detector = detector_for_camera(0)
 
 # Function definitions
 def start_timer():
@@ -48,23 +60,35 @@ def start_timer():
     st.session_state.start_time = time.time()
     st.session_state.start_time_str = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
+def get_class_id():
+    return f"{st.session_state.selected_routine_id}{datetime.now().strftime('%Y%m%d')}"
+
+def get_presence_key():
+    # Identifies this browser session to the presence monitor
+    if 'presence_key' not in st.session_state:
+        st.session_state.presence_key = uuid.uuid4().hex
+    return st.session_state.presence_key
+
 def stop_timer():
     st.session_state.timer_running = False
     elapsed_time = (time.time() - st.session_state.start_time) / 60
     stop_time_str = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    presence = get_presence_monitor().stop(get_presence_key())
     
-    routine = get_student_routine(st.session_state.selected_student)
+    routines = get_student_routine(st.session_state.selected_student)
+    routine = get_current_routine(routines) or (routines[0] if routines else None)
     if routine:
-        class_start = routine[0][0]
-        class_end = routine[0][1]
-        attendance_status, attendance_percentage = calculate_attendance(class_start, class_end, elapsed_time)
+        class_start = routine[0]
+        class_end = routine[1]
+        attendance_status, attendance_percentage = calculate_attendance(class_start, class_end, get_class_id())
     else:
         attendance_status = "Unknown"
         attendance_percentage = 0
+    presence_log = f", presence checks passed: {presence.present}/{presence.checks}" if presence is not None else ""
     
     data_entry = {
         "StudentId": st.session_state.selected_student,
-        "ClassID": f"{st.session_state.selected_routine_id}{datetime.now().strftime('%Y%m%d')}",
+        "ClassID": get_class_id(),
         "CourseID": st.session_state.selected_course_id,
         "Date": datetime.now().strftime('%Y-%m-%d'),
         "Out": stop_time_str,
@@ -72,7 +96,7 @@ def stop_timer():
         "Room": st.session_state.selected_classroom,
         "Duration": round(elapsed_time, 2),
         "Attendance": attendance_status,
-        "Logs": f"Started at: {st.session_state.start_time_str}, Stopped at: {stop_time_str}",
+        "Logs": f"Started at: {st.session_state.start_time_str}, Stopped at: {stop_time_str}{presence_log}",
         "InTime": st.session_state.start_time_str,
         "CapturedImagePath": st.session_state.captured_image_path,
         "AttendancePercentage": f"{attendance_percentage:.2f}%"
@@ -85,21 +109,14 @@ def stop_timer():
     if attendance_status == "Present":
         st.success("Attendance marked as Present")
     else:
-        st.warning(f"Attendance marked as Absent. Duration attended: {elapsed_time:.2f} minutes ({attendance_percentage:.2f}%)")
+        st.warning(f"Attendance marked as Absent. Timer ran {elapsed_time:.2f} minutes, present for {attendance_percentage:.2f}% of the class")
 
+# Attendance rows are journalled to disk first and written to the table in the background
 def save_to_database(data_entry):
     try:
-        cursor.execute("""
-            INSERT INTO StudentAttendance (ClassID, CourseID, StudentId, Date, Out, SubjectTopic, Room, Duration, Attendance, Logs, InTime) 
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            data_entry["ClassID"], data_entry["CourseID"], data_entry["StudentId"], data_entry["Date"],
-            data_entry["Out"], data_entry["SubjectTopic"], data_entry["Room"], data_entry["Duration"],
-            data_entry["Attendance"], data_entry["Logs"], data_entry["InTime"]
-        ))
-        conn.commit()
+        save_attendance("StudentAttendance", data_entry)
     except Exception as e:
-        st.error(f"Error saving to database: {e}")
+        st.error(f"Error saving attendance: {e}")
 
 def get_student_routine(student_id):
     try:
@@ -134,19 +151,13 @@ def get_students():
         st.error(f"Error fetching students: {e}")
         return []
 
-def capture_image():
-    cap = cv2.VideoCapture(0)
-    if not cap.isOpened():
-        st.error("Error: No input device found. Please check your webcam.")
-        return None
-
-    ret, frame = cap.read()
-    if not ret:
-        st.error("Error: Could not read frame.")
-        return None
-
-    cap.release()
-    return frame
+def capture_frames():
+    # The shared camera service keeps the webcam open, take its last few frames so the best one can be used
+    camera = get_camera(0)
+    frames = camera.recent_frames(quality_burst_frames)
+    if not frames:
+        st.error(camera.error or "Error: Could not read frame.")
+    return frames
 
 def save_image(image, student_id):
     save_directory = "F:/MCA PROJECT/Final/Data/AttenImages"
@@ -155,25 +166,13 @@ def save_image(image, student_id):
         
     img_path = f"{save_directory}/{student_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg"
     cv2.imwrite(img_path, image)
+    save_thumbnail(image, img_path)
     return img_path
 
 def verify_student_face(face_encoding, student_id):
-    saved_faces_directory = 'F:/MCA PROJECT/Final/Data/SavedFaces'
-    student_face_path = os.path.join(saved_faces_directory, f"{student_id}.jpg")
-    if not os.path.exists(student_face_path):
-        return False
-    
-    student_img = dlib.load_rgb_image(student_face_path)
-    student_dets = detector(student_img, 1)
-    if len(student_dets) == 0:
-        return False
-    
-    student_shape = sp(student_img, student_dets[0])
-    student_face_descriptor = facerec.compute_face_descriptor(student_img, student_shape)
-    student_face_encoding = np.array(student_face_descriptor)
-    
-    distance = np.linalg.norm(student_face_encoding - face_encoding)
-    return distance < 0.6
+    # Compare against the student's enrolled descriptors from the face index, the reference
+    # photo itself is only encoded once at enrollment. Returns (distance, verified).
+    return get_gallery().snapshot().verify(face_encoding, student_id)
 
 def verify_location(student_lat, student_lon, teacher_lat=23.391131, teacher_lon=85.300583, max_distance_km=1):
     student_coords = (student_lat, student_lon)
@@ -182,11 +181,16 @@ def verify_location(student_lat, student_lon, teacher_lat=23.391131, teacher_lon
     distance = geodesic(student_coords, teacher_coords).km
     return distance <= max_distance_km
 
-def calculate_attendance(class_start, class_end, student_duration):
-    class_duration = (datetime.strptime(class_end, '%H:%M') - datetime.strptime(class_start, '%H:%M')).total_seconds() / 60
-    attendance_percentage = (student_duration / class_duration) * 100
+def calculate_attendance(class_start, class_end, class_id):
+    # The share of the routine slot in which the student passed a presence check, so snapping in and
+    # walking out no longer counts as a full class
+    today = datetime.now().strftime('%Y-%m-%d')
+    slot_start = datetime.strptime(f"{today} {class_start}", '%Y-%m-%d %H:%M').timestamp()
+    slot_end = datetime.strptime(f"{today} {class_end}", '%Y-%m-%d %H:%M').timestamp()
+    fraction, present, total = attended_fraction(conn, st.session_state.selected_student, class_id, slot_start, slot_end)
+    attendance_percentage = fraction * 100
     
-    if attendance_percentage >= 66.67:
+    if fraction >= attendance_min_fraction:
         return "Present", attendance_percentage
     else:
         return "Absent", attendance_percentage
@@ -242,27 +246,32 @@ if 'captured_image' not in st.session_state:
 
 
 if snap_button:
-    st.session_state.captured_image = capture_image()
-    if st.session_state.captured_image is not None:
-        image_pil = Image.fromarray(cv2.cvtColor(st.session_state.captured_image, cv2.COLOR_BGR2RGB))
-        st.image(image_pil, caption='Captured Image')
+    frames = capture_frames()
+    if frames:
+        # Pick the best frame of the burst, blurry, dark, tiny or turned faces never reach the descriptor
+        selection = select_best_frame([cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) for frame in frames], face_detector, sp)
+        st.session_state.captured_image = frames[selection.index]
+        img_rgb = selection.image
+        st.image(Image.fromarray(img_rgb), caption='Captured Image')
         
         st.session_state.captured_image_path = save_image(st.session_state.captured_image, st.session_state.selected_student)
         
-        img_rgb = cv2.cvtColor(st.session_state.captured_image, cv2.COLOR_BGR2RGB)
-        dets = detector(img_rgb, 1)
-        if len(dets) == 0:
-            st.error("No face detected. Please try again.")
+        st.caption(f"Detection: {format_timings(selection.timings)}")
+        if not selection.ok:
+            st.error(f"Photo not usable ({', '.join(selection.reasons)}). Please try again.")
         else:
-            shape = sp(img_rgb, dets[0])
-            face_descriptor = facerec.compute_face_descriptor(img_rgb, shape)
+            face_descriptor = facerec.compute_face_descriptor(img_rgb, selection.shapes[0])
             face_encoding = np.array(face_descriptor)
 
-            if verify_student_face(face_encoding, st.session_state.selected_student):
+            distance, verified = verify_student_face(face_encoding, st.session_state.selected_student)
+            if verified:
                 st.success(f"Face recognized: {st.session_state.selected_student}")
                 st.session_state.student_present = True
                 st.session_state.timer_running = True
                 start_timer()
+                # The snap counts as the first presence check, the monitor keeps re-checking while the timer runs
+                save_presence_samples([(st.session_state.selected_student, get_class_id(), time.time(), True, distance)])
+                get_presence_monitor().start(get_presence_key(), st.session_state.selected_student, get_class_id())
                 
                 location_script = """
                 <script>
@@ -316,7 +325,10 @@ if snap_button:
                 
                 html(location_script, height=100)
             else:
-                st.error("Face not recognized or doesn't match selected student. Please try again.")
+                if distance is None:
+                    st.error("No enrolled photo found for the selected student.")
+                else:
+                    st.error(f"Face not recognized or doesn't match selected student (distance {distance:.2f}). Please try again.")
                 st.session_state.student_present = False
                 st.session_state.timer_running = False
 
@@ -338,6 +350,9 @@ location_verified = handle_location_data()
 
 with right:
     if st.session_state.timer_running:
+        presence = get_presence_monitor().session(get_presence_key())
+        if presence is not None:
+            st.caption(f"Presence checks passed: {presence.present}/{presence.checks}")
         stop_button = st.button("Stop")
         if stop_button:
             stop_timer()
@@ -366,9 +381,8 @@ else:
                                                       f"End Time: {row['Out Time']}\n"
                                                       f"{row['Logs']}", axis=1)
     
-    # Display images
-    for index, row in df_display.iterrows():
-        st.image(row['Captured Image Path'], caption=f"{row['In Time']} - {row['Out Time']}")
+    # Display thumbnails, the full capture is loaded when it is clicked
+    show_image_log([(row['Captured Image Path'], f"{row['In Time']} - {row['Out Time']}") for _, row in df_display.iterrows()], "attendance_log")
     
     # Display table with all columns, including CapturedImagePath
     st.table(df_display)
@@ -378,7 +392,6 @@ st.table(routine_df)
 
 # Clean up
 cv2.destroyAllWindows()
-conn.close()
 
 
 
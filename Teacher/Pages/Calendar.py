@@ -2,21 +2,17 @@ import pandas as pd
 import streamlit as st
 from datetime import datetime, timedelta
 import calendar
-import sqlite3
-from sqlalchemy import create_engine
 from io import BytesIO
-from config import db_path
+from Database.Connection import get_connection, query_df, transaction
 
 # st.set_page_config(page_title="Calendar", layout="wide")
 def main():
     # Database connection
     
-    engine = create_engine(f'sqlite:///{db_path}')
     
     def load_data():
         query = "SELECT EventId, EventName, EventType, StartDate, EndDate, Description FROM EventCalendar"
-        with engine.connect() as conn:
-            df = pd.read_sql(query, conn)
+        df = query_df(query)
         return df
     
     events_data = load_data()
@@ -40,7 +36,7 @@ def main():
         # Save events to the database
         def save_events(events):
             df = pd.DataFrame(events)
-            with engine.connect() as conn:
+            with transaction() as conn:
                 df.to_sql('EventCalendar', conn, if_exists='replace', index=False)
     
         # Initial event list
@@ -219,7 +215,7 @@ def main():
     
     
     with rout:
-        conn = sqlite3.connect(db_path)
+        conn = get_connection()
         def fetch_data(table_name):
             query = f"SELECT * FROM {table_name}"
             df = pd.read_sql(query, conn)
@@ -301,6 +297,4 @@ def main():
             else:
                 st.dataframe(list_day_routine)
         
-        # Close the database connection
-    conn.close()
     
\ No newline at end of file
@@ -0,0 +1,153 @@
+import sqlite3
+import hashlib
+import cv2
+import numpy as np
+import pandas as pd
+import streamlit as st
+from datetime import datetime
+from concurrent.futures import TimeoutError
+from config import saved_faces_directory1
+from Database.Connection import get_connection
+from Database.Attendance import routine_teacher_name
+from Database.Writer import get_writer
+from Face.Models import get_face_models
+from Face.Gallery import get_gallery
+from Face.Recognition import recognise_faces, best_match_per_student
+
+
+def main():
+    st.header("Class Attendance")
+
+    # Function to fetch today's routine slots of the teacher
+    def get_teacher_routine(teacher_name):
+        try:
+            c = get_connection().cursor()
+            c.execute("""
+                SELECT RoutineID, CourseID, Subject, Classroom, StartTime, EndTime
+                FROM Routine
+                WHERE TeacherName = ? AND DayOfWeek = ?
+                ORDER BY StartTime
+            """, (teacher_name, datetime.now().strftime('%A')))
+            return c.fetchall()
+        except sqlite3.Error as e:
+            st.error(f"Error fetching routine: {e}")
+            return []
+
+    # Function to fetch the ids of the students enrolled in a course
+    def get_course_students(course_id):
+        try:
+            c = get_connection().cursor()
+            c.execute("SELECT StudentID FROM Students WHERE CourseID = ?", (course_id,))
+            return {row[0] for row in c.fetchall()}
+        except sqlite3.Error as e:
+            st.error(f"Error fetching students: {e}")
+            return set()
+
+    # Function to write one attendance row per recognised student in a single write on the shared writer.
+    # Students already marked for this class today are skipped so a second photo does not duplicate rows.
+    def save_class_attendance(routine, matches, teacher_name):
+        routine_id, course_id, subject, classroom, start_time, end_time = routine
+        now = datetime.now()
+        class_id = f"{routine_id}{now.strftime('%Y%m%d')}"
+        date_str = now.strftime('%Y-%m-%d')
+        in_time = now.strftime('%Y-%m-%d %H:%M:%S')
+        out_time = f"{date_str} {end_time}:00"
+        duration = max(0.0, (datetime.strptime(out_time, '%Y-%m-%d %H:%M:%S') - now).total_seconds() / 60)
+
+        def write(conn):
+            c = conn.cursor()
+            c.execute("SELECT StudentId FROM StudentAttendance WHERE ClassID = ? AND Date = ?", (class_id, date_str))
+            already_marked = {row[0] for row in c.fetchall()}
+            rows = [
+                (class_id, course_id, student_id, date_str, out_time, subject, classroom, round(duration, 2), "Present",
+                 f"Marked from class photo by {teacher_name} at {in_time} (distance {match.distance:.3f})", in_time)
+                for student_id, (rect, match) in matches.items()
+                if student_id not in already_marked
+            ]
+            c.executemany("""
+                INSERT INTO StudentAttendance (ClassID, CourseID, StudentId, Date, Out, SubjectTopic, Room, Duration, Attendance, Logs, InTime)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+            return len(rows), len(already_marked & set(matches))
+
+        return get_writer().write(write)
+
+    # Function to draw the detected faces, green for recognised students and red for unknown faces
+    def annotate(img_rgb, results):
+        annotated = img_rgb.copy()
+        for rect, match in results:
+            color = (0, 200, 0) if match is not None else (220, 0, 0)
+            cv2.rectangle(annotated, (rect.left(), rect.top()), (rect.right(), rect.bottom()), color, 2)
+            label = match.name if match is not None else "Unknown"
+            cv2.putText(annotated, label, (rect.left(), max(0, rect.top() - 6)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+        return annotated
+
+    # The routine names teachers by full name, the login is the TeacherID
+    teacher_name = routine_teacher_name(st.session_state.user_id)
+    routines = get_teacher_routine(teacher_name)
+    if not routines:
+        st.info("No classes scheduled for you today.")
+        return
+
+    routine_labels = [f"{r[4]} - {r[5]} | {r[2]} | {r[3]}" for r in routines]
+    selected_index = st.selectbox("Class", range(len(routines)), format_func=lambda i: routine_labels[i])
+    routine = routines[selected_index]
+
+    source = st.radio("Photo source", ["Camera", "Upload"], horizontal=True)
+    if source == "Camera":
+        photo = st.camera_input("Take a photo of the class")
+    else:
+        photo = st.file_uploader("Upload a photo of the class", type=["jpg", "jpeg", "png"])
+
+    if photo is None:
+        return
+
+    img_bgr = cv2.imdecode(np.frombuffer(photo.getvalue(), dtype=np.uint8), cv2.IMREAD_COLOR)
+    if img_bgr is None:
+        st.error("Could not read the image. Please try another photo.")
+        return
+    img_rgb = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
+
+    # Detection, descriptors and matching run once per photo. The result is kept in the session so the
+    # rerun of "Mark Attendance" saves exactly the matches shown, without recognising the photo again.
+    photo_key = hashlib.sha1(photo.getvalue()).hexdigest()
+    cached = st.session_state.get("class_photo")
+    if cached is not None and cached[0] == photo_key:
+        results, matches = cached[1], cached[2]
+    else:
+        detector, sp, facerec = get_face_models()
+        gallery = get_gallery(saved_faces_directory1).snapshot()
+        with st.spinner("Recognising faces..."):
+            results = recognise_faces(img_rgb, gallery, detector, sp, facerec)
+        matches = best_match_per_student(results)
+        st.session_state.class_photo = (photo_key, results, matches)
+
+    st.image(annotate(img_rgb, results), caption=f"{len(results)} faces detected, {len(matches)} students recognised")
+
+    # Only students of the class's course get attendance for it
+    enrolled = get_course_students(routine[1])
+    other_course = sorted(student_id for student_id in matches if student_id not in enrolled)
+    matches = {student_id: match for student_id, match in matches.items() if student_id in enrolled}
+    if other_course:
+        st.info(f"Not enrolled in this course, not marked: {', '.join(other_course)}")
+    if not matches:
+        st.warning("No students of this course were recognised in this photo.")
+        return
+
+    recognised_df = pd.DataFrame(
+        [(student_id, round(match.distance, 3), round(match.margin, 3)) for student_id, (rect, match) in matches.items()],
+        columns=["StudentId", "Distance", "Margin"]
+    )
+    st.table(recognised_df)
+
+    if st.button("Mark Attendance"):
+        try:
+            inserted, skipped = save_class_attendance(routine, matches, teacher_name)
+            st.success(f"Attendance marked for {inserted} students.")
+            if skipped:
+                st.info(f"{skipped} students were already marked for this class.")
+        except sqlite3.Error as e:
+            st.error(f"Error saving attendance: {e}")
+        except TimeoutError:
+            # The write may still go through, pressing the button again does not mark anyone twice
+            st.error("The database is busy and attendance could not be confirmed. Please press Mark Attendance again.")
@@ -1,10 +1,13 @@
 import streamlit as st
 import sqlite3
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, date, timedelta
 import matplotlib.pyplot as plt
 import numpy as np
-from config import db_path
+from config import analytics_dashboard_days
+from Database.Connection import get_connection
+from Database.Analytics import get_analytics
+from Database.Attendance import routine_teacher_name
 # st.set_page_config(page_title="Teacher Time Tracker", page_icon=":alarm_clock:", layout="wide")
 
 
@@ -12,7 +15,7 @@ from config import db_path
 def main():
     st.header("Dashboard")
     def create_connection():
-        conn = sqlite3.connect(db_path)
+        conn = get_connection()
         return conn
     
     # Function to fetch data from a table
@@ -20,7 +23,6 @@ def main():
         conn = create_connection()
         query = f"SELECT * FROM {table_name}"
         df = pd.read_sql(query, conn)
-        conn.close()
         return df
     
     # Function to fetch departments
@@ -29,7 +31,6 @@ def main():
         c = conn.cursor()
         c.execute('SELECT DepartmentID, Name FROM Departments')
         departments = c.fetchall()
-        conn.close()
         return {d[1]: d[0] for d in departments}
     
     # Function to fetch pending students based on department
@@ -41,7 +42,6 @@ def main():
             WHERE DepartmentID = ? AND approval_status = 'pending'
         '''
         df = pd.read_sql(query, conn, params=(department_id,))
-        conn.close()
         return df
     
     # Function to accept a student
@@ -73,10 +73,8 @@ def main():
             ''', (student_id,))
             
             conn.commit()
-            conn.close()
             return True
         else:
-            conn.close()
             return False
     
     # Function to reject a student
@@ -85,7 +83,6 @@ def main():
         c = conn.cursor()
         c.execute('DELETE FROM StudentLogin WHERE StudentID = ?', (student_id,))
         conn.commit()
-        conn.close()
     
     
     
@@ -102,6 +99,17 @@ def main():
     # Create a DataFrame
     df = pd.DataFrame(data)
     
+    # Classes taken, delayed and scheduled per course, computed by the analytics engine. The sample data
+    # above is only shown when duckdb is not available or nothing is recorded in the range yet.
+    date_range = st.date_input("Date range", [date.today() - timedelta(days=analytics_dashboard_days), date.today()])
+    analytics = get_analytics()
+    if analytics is not None and len(date_range) == 2:
+        # Routine rows name the teacher, not the login id
+        teacher_name = routine_teacher_name(st.session_state.user_id)
+        class_df = analytics.teacher_classes(st.session_state.user_id, teacher_name, *date_range)
+        if not class_df.empty:
+            df = class_df
+    
     # Streamlit app
     
     #  # Table
@@ -1,28 +1,30 @@
-import sqlite3
 import streamlit as st
 from PIL import Image
 import io
-from config import db_path
+from Database.Connection import get_connection
+from Media.Store import get_image, set_profile_image
 
 # st.set_page_config(page_title="Profile Setting ", layout="wide")
 # Function to load teacher data from the database
 def main():
 
     def load_teacher_data(teacher_id):
-        conn = sqlite3.connect(db_path)
+        conn = get_connection()
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM Teachers WHERE TeacherID = ?", (teacher_id,))
+        cursor.execute("""
+            SELECT TeacherID, ImageID, FirstName, MiddleName, LastName, Qualification, Gender, Phone, Email,
+                   JoiningDate, Status, NameInHindi, Caste, DOB, FatherName, MotherName
+            FROM Teachers WHERE TeacherID = ?
+        """, (teacher_id,))
         teacher_data = cursor.fetchone()
-        conn.close()
         return teacher_data
     
     # Function to update teacher data in the database
     def update_teacher_data(teacher_id, field, value):
-        conn = sqlite3.connect(db_path)
+        conn = get_connection()
         cursor = conn.cursor()
         cursor.execute(f"UPDATE Teachers SET {field} = ? WHERE TeacherID = ?", (value, teacher_id))
         conn.commit()
-        conn.close()
     
     # Function to reload the page to refresh data
     def reload_page():
@@ -34,11 +36,10 @@ def main():
         reload_page()
     
     # Connect to the database and fetch teacher IDs for the select box
-    conn = sqlite3.connect(db_path)
+    conn = get_connection()
     cursor = conn.cursor()
     cursor.execute("SELECT TeacherID FROM Teachers")
     teacher_ids = [row[0] for row in cursor.fetchall()]
-    conn.close()
     
     # Select box to choose teacher ID
     selected_teacher_id = st.session_state.user_id
@@ -52,7 +53,7 @@ def main():
         teacher_data = load_teacher_data(st.session_state.user_id)
         st.session_state.update(
             teacher_id = teacher_data[0],
-            image_blob = teacher_data[1],
+            image_id = teacher_data[1],
             first_name = teacher_data[2],
             middle_name = teacher_data[3],
             last_name = teacher_data[4],
@@ -72,7 +73,7 @@ def main():
     
     # Unpack teacher data
     teacher_id = st.session_state.teacher_id
-    image_blob = st.session_state.image_blob
+    image_blob = get_image(st.session_state.image_id)
     first_name = st.session_state.first_name
     middle_name = st.session_state.middle_name
     last_name = st.session_state.last_name
@@ -187,7 +188,7 @@ def main():
     
             if uploaded_image:
                 image_bytes = uploaded_image.read()
-                update_teacher_data(teacher_id, "Image", image_bytes)
+                set_profile_image("Teachers", teacher_id, image_bytes)
     
             st.success("Profile updated successfully!")
             st.session_state.edit_mode = False
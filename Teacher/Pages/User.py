@@ -4,6 +4,8 @@ import streamlit as st
 import datetime
 from datetime import date
 from config import db_path
+from Database.Connection import get_connection
+from Database.Attendance import attendance_range, show_attendance_pages
 
 
 # st.set_page_config(page_title="Teacher ", layout="wide")
@@ -12,22 +14,6 @@ from config import db_path
 
 
 
-# Function to load data from the SQLite database
-def load_data_from_db(db_path):
-    # Connect to the database
-    conn = sqlite3.connect(db_path)
-    
-    # SQL query to select data from TeacherAttendance table
-    query = "SELECT * FROM TeacherAttendance"
-    
-    # Read the data into a DataFrame
-    df = pd.read_sql_query(query, conn)
-    
-    # Close the connection
-    conn.close()
-    
-    return df
-
 # Function to generate the monthly summary
 def generate_summary(df, start_date, end_date):
     df['Date'] = pd.to_datetime(df['Date'])
@@ -72,9 +58,6 @@ def generate_summary(df, start_date, end_date):
 # Streamlit app
 def main():
     st.title('Monthly Attendance Summary')
-
-    # Load the data from the database
-    df = load_data_from_db(db_path)
     
     # Get the current date and set the minimum date
     today = datetime.date.today()
@@ -91,6 +74,15 @@ def main():
     
     if len(date_range) == 2:
         start_date, end_date = date_range
+        # Load only this teacher's rows in the selected range, and only the columns the summary uses
+        df, truncated = attendance_range("TeacherAttendance", st.session_state.user_id, start_date, end_date)
+        if truncated:
+            # The rows stop part way through the range, the days after them would show as Absent
+            # The day before the last returned row is the last complete one, never before the chosen start
+            end_date = max(start_date, pd.to_datetime(df['Date'].iloc[-1]).date() - datetime.timedelta(days=1))
+            st.warning(f"The selected range has more than {len(df)} attendance records, the summary stops at "
+                       f"{end_date.strftime('%B %d, %Y')}. Select a shorter range to see the rest.")
+        
         # Generate the summary
         summary_df = generate_summary(df, start_date, end_date)
         
@@ -112,40 +104,15 @@ if __name__ == "__main__":
     with tab2:
       
       
-      # Function to load data from the SQLite database
-      def load_data_from_db(db_path):
-          # Connect to the database
-          conn = sqlite3.connect(db_path)
-          
-          # SQL query to select data from TeacherAttendance table
-          query = "SELECT * FROM TeacherAttendance"
-          
-          # Read the data into a DataFrame
-          df = pd.read_sql_query(query, conn)
-          
-          # Close the connection
-          conn.close()
-          
-          return df
-      
       with st.container():
-          # Load the data
-          df = load_data_from_db(db_path)
-          
-          # Ensure the 'Date' column is in datetime format
-          df['Date'] = pd.to_datetime(df['Date'])
-          
           # Display a date picker
           selected_date = st.date_input("Select a date")
           
           # Display the selected date with day name and date
           st.header(selected_date.strftime("%A, %B %d, %Y"))
           
-          # Filter the DataFrame based on the selected date
-          filtered_df = df[df['Date'].dt.date == selected_date]
-          
-          # Display the filtered dataframe
-          st.dataframe(filtered_df, width=10000)
+          # Display the day's attendance a page at a time
+          show_attendance_pages("TeacherAttendance", st.session_state.user_id, selected_date, key="teacher_detail")
       
       
       
@@ -162,16 +129,11 @@ if __name__ == "__main__":
         def create_connection(db_path):
             conn = None
             try:
-                conn = sqlite3.connect(db_path)
+                conn = get_connection(db_path)
             except sqlite3.Error as e:
                 st.error(f"Error connecting to database: {e}")
             return conn
         
-        # Function to load Teachers data
-        def load_Teachers(conn):
-            query = "SELECT TeacherID, FirstName || ' ' || LastName AS Name FROM Teachers"
-            return pd.read_sql_query(query, conn)
-        
         # Function to save leave application data
         def save_leave_application(conn, data):
             query = """
@@ -223,9 +185,6 @@ if __name__ == "__main__":
         if conn is None:
             st.stop()
         
-        # Load Teachers data
-        Teachers_df = load_Teachers(conn)
-        
         # Teacher selection box
         Teacher_id = st.session_state.user_id
 
@@ -376,8 +335,6 @@ if __name__ == "__main__":
                                 st.session_state.edit_application_id = None
                                 st.experimental_rerun()
         
-        # Close the database connection
-        conn.close()
         
         
         
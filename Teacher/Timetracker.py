@@ -1,10 +1,10 @@
 import streamlit as st
-import sqlite3
 import time
 import json
 import pandas as pd
 from datetime import datetime
-from config import db_path
+from Database.Connection import get_connection
+from Database.Journal import save_attendance
 from config import sp_path
 from config import facerec_path
 from config import save_directory1
@@ -12,11 +12,11 @@ from config import saved_faces_directory1
 from config import class_state
 
 
-from .Pages import Calendar, Dashboard, Notification, User,Profile
+from .Pages import Calendar, Dashboard, Notification, User,Profile, ClassAttendance
 def main():
 
     
-    page = st.sidebar.radio("", ["Time Tracker","Calendar", "Dashboard", "Notifications", "User", "Profile Settings"])
+    page = st.sidebar.radio("", ["Time Tracker","Class Attendance","Calendar", "Dashboard", "Notifications", "User", "Profile Settings"])
     if page == "Time Teracker":
         
         # Initialize session state for the timer and data storage
@@ -29,7 +29,7 @@ def main():
             st.session_state.teacher_present = False
         
         # Connect to SQLite database
-        conn = sqlite3.connect(db_path)
+        conn = get_connection()
         cursor = conn.cursor()
         
         # Define timer functions
@@ -70,17 +70,9 @@ def main():
         
         def save_to_database(data_entry):
             try:
-                cursor.execute("""
-                    INSERT INTO TeacherAttendance (AttendanceID, ClassID, CourseID, TeacherId, Date, Out, SubjectTopic, Room, Duration, Attendance, Logs, InTime) 
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    data_entry["AttendanceID"], data_entry["ClassID"], data_entry["CourseID"], data_entry["TeacherId"], data_entry["Date"],
-                    data_entry["Out"], data_entry["SubjectTopic"], data_entry["Room"], data_entry["Duration"],
-                    data_entry["Attendance"], data_entry["Logs"], data_entry["InTime"]
-                ))
-                conn.commit()
+                save_attendance("TeacherAttendance", data_entry)
             except Exception as e:
-                st.error(f"Error saving to database: {e}")
+                st.error(f"Error saving attendance: {e}")
         
         def get_teacher_routine(teacher_name):
             try:
@@ -197,15 +189,15 @@ def main():
         # else:
         #     st.write("No data for today")
         
-        # Close the database connection
-        conn.close()
     
 
 
 
 
 
-    if page == "Calendar":
+    if page == "Class Attendance":
+        ClassAttendance.main()
+    elif page == "Calendar":
         Calendar.main()
     elif page == "Dashboard":
         Dashboard.main()
@@ -5,3 +5,93 @@ facerec_path="F:/MCA PROJECT/Final/Data/dlib_face_recognition_resnet_model_v1.da
 save_directory1 = "F:/MCA PROJECT/Final/Data/AttenImages"
 class_state="F:/MCA PROJECT/Final/Data/class_state.json"
 saved_faces_directory1 = 'F:/MCA PROJECT/Final/Data/SavedFaces'
+face_index_path = "F:/MCA PROJECT/Final/Data/face_index.npz"
+face_index_refresh_seconds = 5
+face_match_threshold = 0.6
+face_ann_backend = "ivf"
+face_ann_min_gallery = 10000
+# Face detection tuning: frames wider than detect_max_width are downscaled for the first HOG pass,
+# detect_roi is (left, top, right, bottom) as fractions of the frame, None uses the whole frame.
+# camera_detect_settings overrides any of these per camera index, e.g. {0: {"max_width": 480}}
+detect_max_width = 640
+detect_upsample = 0
+detect_retry_upsample = 1
+detect_roi = None
+camera_detect_settings = {}
+camera_buffer_size = 8
+camera_idle_timeout = 60
+camera_warmup_frames = 5
+# Frames older than this many seconds are never handed out, a stalled or failed camera gives no frame
+camera_max_frame_age = 2.0
+# Frame quality gate applied before face descriptors are computed
+quality_min_sharpness = 60.0
+quality_min_brightness = 50
+quality_max_brightness = 210
+quality_min_face_size = 80
+quality_max_yaw = 0.35
+quality_max_roll_degrees = 20
+quality_burst_frames = 5
+# Recognition worker pool used by the snapshot pages
+recognition_workers = 2
+recognition_queue_size = 8
+recognition_job_timeout = 15
+recognition_result_ttl = 300
+# Precision of the in-memory face gallery: "float32", "float16" or "int8".
+# With float16/int8 the full-precision vectors stay on disk and only the top candidates are re-ranked with them.
+# int8 is the smaller and faster of the two, run python -m Face.EmbeddingStore to see the effect on your gallery.
+face_embedding_precision = "float32"
+face_rerank_candidates = 32
+# Attendance log thumbnails, written next to the captured images in a thumbs folder
+thumbnail_width = 160
+thumbnail_cache_size = 256
+image_log_page_size = 12
+image_log_columns = 4
+# Recorded lecture attendance (python -m Face.Video)
+video_sample_fps = 2
+video_keyframe_interval = 4
+video_tracker_min_confidence = 7.0
+video_recognition_attempts = 3
+video_merge_gap_seconds = 10
+# Presence re-verification while a student's timer runs. Keep the interval below camera_idle_timeout
+# so the camera stays open between checks.
+presence_interval_seconds = 45
+presence_max_minutes = 180
+attendance_min_fraction = 0.6667
+# SQLite connection pool (Database/Connection.py)
+db_cache_size_kib = 16384
+db_cached_statements = 256
+db_pool_size = 8
+# SQLite writes: how long a locked database is waited for, and the group commit writer (Database/Writer.py)
+db_busy_timeout_ms = 5000
+db_group_commit_size = 128
+db_group_commit_wait_ms = 5
+db_write_retries = 3
+db_write_timeout = 30
+# Attendance write-behind journal (Database/Journal.py): rows are fsynced here first and
+# moved to the attendance tables every journal_flush_seconds, or as soon as journal_batch_size are waiting
+attendance_journal_path = "F:/MCA PROJECT/Final/Data/attendance_journal.jsonl"
+journal_flush_seconds = 2
+journal_batch_size = 200
+# Attendance pages (Database/Attendance.py): rows per page in the detailed views and the most rows a summary loads
+attendance_page_size = 25
+attendance_max_rows = 5000
+# DuckDB analytics for the dashboards (Database/Analytics.py). The dashboard tables are copied into a columnar
+# snapshot that is refreshed when older than analytics_snapshot_seconds, 0 reads university.db live instead.
+analytics_snapshot_seconds = 300
+analytics_threads = 4
+# Seconds before the analytics engine is tried again after it failed to start (e.g. INSTALL sqlite without network)
+analytics_retry_seconds = 300
+# Days before today the analytics date range on the admin and teacher dashboards starts at
+analytics_dashboard_days = 180
+# A class that starts more than this many minutes after its routine start time counts as delayed
+class_late_minutes = 5
+# Parquet archive of attendance (Database/Archive.py): months before the last archive_after_months are moved
+# out of the attendance tables into archive_directory, partitioned by year, month and department
+archive_directory = "F:/MCA PROJECT/Final/Data/Archive"
+archive_after_months = 6
+archive_compression = "zstd"
+# Profile photos (Media/Store.py): how many full photos stay decoded in memory, the thumbnail size the
+# student and teacher lists show, and how many rows those lists show per page
+profile_image_cache_size = 64
+profile_thumbnail_size = 100
+profile_list_page_size = 25
@@ -1,6 +1,8 @@
 import streamlit as st
 from Login import Login1
 from Student import Timetracker as StudentTimetracker
+from Database.Migrations import ensure_schema
+from Database.Journal import get_journal
 # from Teacher import Timetracker as TeacherTimetracker
 # from Admin import dashboard as AdminDashboard
 
@@ -14,6 +16,10 @@ PAGES = {
 }
 
 def main():
+    # Apply pending schema migrations and replay attendance journalled by an earlier run,
+    # both only do work on the first run of the process
+    ensure_schema()
+    get_journal()
    
     if 'authenticated' not in st.session_state:
         st.session_state.authenticated = False